@@ -0,0 +1,90 @@
+"""Environments allocated per iteration of typical counter loops.
+
+    python benchmarks/alloc_bench.py [--iterations N] [--engine E ...]
+
+Every environment an engine creates while running the loop is counted,
+along with the time per iteration. The python engine keeps variables in
+Python locals and never allocates environments, so it is not measured.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import fluff
+from parse_bench import Quiet
+
+loops = {
+    # No declarations: the body runs in the enclosing scope.
+    'counter': """
+        int64 i = 0
+        while i < {n}: {{ i += 1 }}
+    """,
+    # Declares in the body: one frame is reused for every iteration.
+    'accumulate': """
+        int64 i = 0
+        int64 total = 0
+        while i < {n}: {{
+            t := i * 2
+            int64 u = t + 1
+            total += u
+            i += 1
+        }}
+    """,
+    'nested': """
+        int64 i = 0
+        int64 total = 0
+        while i < {n} / 10: {{
+            int64 j = 0
+            while j < 10: {{ k := j total += k j += 1 }}
+            i += 1
+        }}
+    """,
+}
+
+engines = ['tree', 'vm', 'closure']
+
+
+def counting(base):
+    class Counting(base):
+        created = 0
+
+        def __init__(self, enclosing=None, size=0):
+            Counting.created += 1
+            super().__init__(enclosing, size)
+    return Counting
+
+
+def measure(source: bytes, engine: str):
+    statements  = fluff.Parser(Quiet(), fluff.Scanner(source, Quiet()).scanTokens()).parse()
+    interpreter = {'tree': fluff.Interpreter, 'vm': fluff.VM, 'closure': fluff.ClosureInterpreter}[engine](Quiet(), "native")
+    fluff.Resolver(Quiet(), interpreter).resolve(statements)
+
+    # Engines create nested environments with type(enclosing), so swapping
+    # the class of the globals counts every one of them.
+    environment = counting(type(interpreter.globals))
+    interpreter.globals.__class__ = environment
+
+    start = time.perf_counter()
+    interpreter.interpret(statements)
+    return environment.created, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--engine', nargs='+', choices=engines, default=engines)
+    args = parser.parse_args()
+
+    print(f"{'loop':<12}{'engine':<10}{'envs/iter':>11}{'us/iter':>10}")
+    for name, template in loops.items():
+        source = template.format(n=args.iterations).encode('utf-8')
+        for engine in args.engine:
+            created, elapsed = measure(source, engine)
+            print(f"{name:<12}{engine:<10}{created / args.iterations:>11.3f}{elapsed / args.iterations * 1e6:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Counting matching lines of a large log file with lines().
+
+    python benchmarks/lines_bench.py [--megabytes M] [--engine E ...]
+
+Writes a web server log of about M megabytes to a temporary directory and
+runs a Fluff program counting the requests that failed with one status
+line. Every engine runs in its own process, so the peak memory reported
+is that engine's alone; it should not grow with the size of the file.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import fluff
+
+program = """
+int log = open("{path}")
+int matches = 0
+for line in lines(log): {{
+  if line == "GET /api/items 500": matches += 1
+}}
+print(matches)
+"""
+
+requests = ["GET /index.html 200", "GET /api/items 200", "POST /api/items 201", "GET /missing 404", "GET /api/items 500"]
+
+engines = ['tree', 'vm', 'closure', 'python']
+
+
+def write_log(path: str, megabytes: int):
+    rng = random.Random(1)
+    with open(path, 'w') as f:
+        while f.tell() < megabytes << 20:
+            f.write("\n".join(rng.choice(requests) for _ in range(10000)) + "\n")
+
+
+def measure(path: str, engine: str) -> dict:
+    output = io.StringIO()
+    start  = time.perf_counter()
+    fluff.FluffInterpreter(fluff.Output(output)).run_file(program.format(path=path).encode('utf-8'), engine)
+    return {
+        'seconds': round(time.perf_counter() - start, 3),
+        'matches': output.getvalue().strip(),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--megabytes', type=int, default=256)
+    parser.add_argument('--engine', nargs='+', choices=engines, default=engines)
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        json.dump(measure(*args.child), sys.stdout)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'access.log')
+        write_log(path, args.megabytes)
+        size = os.path.getsize(path)
+
+        print(f"{'engine':<10}{'matches':>10}{'seconds':>10}{'MB/s':>8}{'peak MB':>10}")
+        for engine in args.engine:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', path, engine],
+                                    check=True, stdout=subprocess.PIPE)
+            result = json.loads(output.stdout)
+            print(f"{engine:<10}{result['matches']:>10}{result['seconds']:>10.3f}{size / result['seconds'] / (1 << 20):>8.1f}{result['peak_rss_kb'] / 1024:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
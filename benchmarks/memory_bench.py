@@ -0,0 +1,62 @@
+"""Memory held by the token list and the parsed tree of a large program.
+
+    python benchmarks/memory_bench.py [--statements N]
+
+Reports bytes per token and bytes per AST node, measured with tracemalloc.
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import fluff
+from fluff.expr import Expr
+from fluff.stmt import Stmt
+from parse_bench import Quiet, generate
+
+
+def fields(node):
+    slots = getattr(type(node), '__slots__', None)
+    if slots:
+        return [getattr(node, name) for name in slots]
+    return list(vars(node).values())
+
+
+def count_nodes(node) -> int:
+    if isinstance(node, list):
+        return sum(count_nodes(child) for child in node)
+    if isinstance(node, (Expr, Stmt)):
+        return 1 + sum(count_nodes(child) for child in fields(node))
+    return 0
+
+
+def measure(function):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function()
+    after  = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--statements', type=int, default=20000)
+    args = parser.parse_args()
+
+    source = generate(args.statements)
+
+    tokens, token_bytes = measure(lambda: fluff.Scanner(source, Quiet()).scanTokens())
+    tree, tree_bytes    = measure(lambda: fluff.Parser(Quiet(), tokens).parse())
+    nodes = count_nodes(tree)
+
+    print(f"source: {len(source)} bytes")
+    print(f"tokens: {len(tokens)}, {token_bytes} bytes, {token_bytes / len(tokens):.1f} bytes/token")
+    print(f"nodes:  {nodes}, {tree_bytes} bytes, {tree_bytes / nodes:.1f} bytes/node")
+    print(f"total:  {(token_bytes + tree_bytes) / len(source):.1f}x source size")
+
+
+if __name__ == '__main__':
+    main()
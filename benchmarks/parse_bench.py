@@ -0,0 +1,74 @@
+"""Parse throughput on a large generated program.
+
+    python benchmarks/parse_bench.py [--statements N] [--repeat R]
+
+Tokens are scanned once up front so only Parser.parse is timed.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import fluff
+
+
+class Quiet:
+    def error(self, line, message):
+        raise SystemExit(f"[line {line}] {message}")
+
+    def error_t(self, token, message):
+        raise SystemExit(f"[line {token.line}] at '{token.lexeme}': {message}")
+
+
+def expression(rng: random.Random, depth: int) -> str:
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice(["a", "b", "c", "1", "2.5", "(a)", "clock()"])
+    operator = rng.choice(["+", "-", "*", "/", "<", ">=", "==", "!=", "and", "or"])
+    left     = expression(rng, depth - 1)
+    right    = expression(rng, depth - 1)
+    if rng.random() < 0.2:
+        return f"-({left} {operator} {right})"
+    return f"{left} {operator} {right}"
+
+
+def generate(statements: int, seed: int = 0) -> bytes:
+    rng   = random.Random(seed)
+    lines = ["int64 a = 1", "double b = 2.5", "int32 c = 3"]
+    for i in range(statements):
+        kind = i % 4
+        if kind == 0:
+            lines.append(f"a = {expression(rng, 4)}")
+        elif kind == 1:
+            lines.append(f"if {expression(rng, 3)}: {{ b += {expression(rng, 2)} }}")
+        elif kind == 2:
+            lines.append(f"while a < {i}: {{ a += 1 c := {expression(rng, 3)} }}")
+        else:
+            lines.append(f"print({expression(rng, 4)})")
+    return "\n".join(lines).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--statements', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    source = generate(args.statements)
+    tokens = fluff.Scanner(source, Quiet()).scanTokens()
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        fluff.Parser(Quiet(), tokens).parse()
+        best = min(best, time.perf_counter() - start)
+
+    print(f"source:     {len(source) / 1e6:.2f} MB, {len(tokens)} tokens")
+    print(f"parse:      {best:.3f} s (best of {args.repeat})")
+    print(f"throughput: {len(tokens) / best / 1e6:.2f} M tokens/s")
+
+
+if __name__ == '__main__':
+    main()
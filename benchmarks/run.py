@@ -0,0 +1,207 @@
+"""Benchmark suite runner.
+
+    python benchmarks/run.py [--engine E] [--repeat N] [--output FILE]
+                             [--baseline FILE] [--save-baseline] [--tolerance T]
+
+Runs every program in benchmarks/programs plus a large generated source.
+Scanning, parsing, resolving and interpreting are timed separately.
+Each benchmark runs in its own process so peak RSS is per benchmark.
+Results are written as JSON. The run exits with status 1 when a phase is
+slower (or peak memory higher) than the baseline by more than the
+tolerance, or when a benchmark has no baseline entry.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+
+import fluff
+from fluff.fluff_interpreter import FluffInterpreter, engines
+from fluff.output import Output
+
+programs_dir      = os.path.join(here, 'programs')
+default_baseline  = os.path.join(here, 'baseline.json')
+phases            = ['scan', 'parse', 'resolve', 'interpret']
+generated_sources = {'large_source': 20000}
+
+# Phases shorter than this are dominated by timer and scheduling noise and
+# are never reported as regressions.
+min_delta = 0.005
+
+
+def generate(statements: int, seed: int = 0) -> bytes:
+    rng   = random.Random(seed)
+    lines = ["int64 a = 1", "int64 b = 2", "double c = 0.5", "str s = \"\""]
+    names = ["a", "b"]
+
+    def expression(depth):
+        if depth == 0 or rng.random() < 0.3:
+            return rng.choice(names + ["1", "2", "3.5", "(a - b)"])
+        return f"{expression(depth - 1)} {rng.choice(['+', '-', '*'])} {expression(depth - 1)}"
+
+    for i in range(statements):
+        kind = i % 5
+        if kind == 0:
+            lines.append(f"a = {expression(3)} - a")
+        elif kind == 1:
+            lines.append(f"c = c * 0.5 + {expression(2)}")
+        elif kind == 2:
+            lines.append(f"if a > b: {{ int64 t{i} = {expression(2)} b = t{i} - b }} else b = b + 1")
+        elif kind == 3:
+            lines.append(f"{{ x := {expression(2)} {{ y := x + 1 a = a - y + x }} }}")
+        else:
+            lines.append(f"s = \"item\" + \"{i}\"")
+    lines.append("print(a)")
+    return "\n".join(lines).encode('utf-8')
+
+
+def benchmark_names():
+    names = sorted(name[:-3] for name in os.listdir(programs_dir) if name.endswith('.ff'))
+    return names + sorted(generated_sources)
+
+
+def load_source(name: str) -> bytes:
+    if name in generated_sources:
+        return generate(generated_sources[name])
+    with open(os.path.join(programs_dir, name + '.ff'), 'rb') as f:
+        return f.read()
+
+
+def measure(name: str, engine: str, repeat: int) -> dict:
+    source = load_source(name)
+    best   = {phase: float('inf') for phase in phases}
+    tokens = 0
+
+    with open(os.devnull, 'w') as devnull:
+        for _ in range(repeat):
+            reporter = FluffInterpreter(Output(devnull))
+            reporter.hadError = False
+            reporter.hadRuntimeError = False
+
+            start      = time.perf_counter()
+            token_list = fluff.Scanner(source, reporter).scanTokens()
+            scanned    = time.perf_counter()
+            statements = fluff.Parser(reporter, token_list).parse()
+            parsed     = time.perf_counter()
+
+            if reporter.hadError:
+                raise SystemExit(f"{name}: program has syntax errors")
+
+            interpreter = engines[engine](reporter, "native")
+            fluff.Resolver(reporter, interpreter).resolve(statements)
+            resolved = time.perf_counter()
+            interpreter.interpret(statements)
+            finished = time.perf_counter()
+
+            if reporter.hadRuntimeError:
+                raise SystemExit(f"{name}: program raised a runtime error")
+
+            tokens = len(token_list)
+            for phase, elapsed in zip(phases, [scanned - start, parsed - scanned, resolved - parsed, finished - resolved]):
+                best[phase] = min(best[phase], elapsed)
+
+    result = {phase: round(best[phase], 6) for phase in phases}
+    result['tokens'] = tokens
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def run_isolated(name: str, engine: str, repeat: int) -> dict:
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--engine', engine, '--repeat', str(repeat), '--child', name],
+                            check=True, stdout=subprocess.PIPE)
+    return json.loads(output.stdout)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline['benchmarks'].get(name)
+        if previous is None:
+            # A benchmark nobody recorded could hide any slowdown.
+            regressions.append(f"{name}: not in the baseline, record one with --save-baseline")
+            continue
+        for phase in phases:
+            if current[phase] > previous[phase] * (1 + tolerance) and current[phase] - previous[phase] > min_delta:
+                regressions.append(f"{name}.{phase}: {previous[phase]:.4f}s -> {current[phase]:.4f}s")
+        if current['peak_rss_kb'] > previous['peak_rss_kb'] * (1 + tolerance):
+            regressions.append(f"{name}.peak_rss_kb: {previous['peak_rss_kb']} -> {current['peak_rss_kb']}")
+    return regressions
+
+
+def report(results: dict, baseline):
+    print(f"{'benchmark':<18}" + "".join(f"{phase:>11}" for phase in phases) + f"{'peak MB':>10}")
+    for name, current in results['benchmarks'].items():
+        row = f"{name:<18}" + "".join(f"{current[phase]:>11.4f}" for phase in phases) + f"{current['peak_rss_kb'] / 1024:>10.1f}"
+        previous = baseline['benchmarks'].get(name) if baseline else None
+        if previous is not None:
+            total_now  = sum(current[phase] for phase in phases)
+            total_then = sum(previous[phase] for phase in phases)
+            row += f"   {(total_now / total_then - 1) * 100:+.1f}% vs baseline"
+        elif baseline is not None:
+            row += "   no baseline"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Fluff benchmark suite')
+    parser.add_argument('--engine', choices=engines.keys(), default='tree')
+    parser.add_argument('--repeat', help='Runs per benchmark; the fastest time per phase is kept', type=int, default=5)
+    parser.add_argument('--only', help='Run only the named benchmarks', nargs='+', choices=benchmark_names(), metavar='NAME')
+    parser.add_argument('--output', help='Write results as JSON to this file', metavar='FILE')
+    parser.add_argument('--baseline', help='Baseline JSON to compare against', default=default_baseline, metavar='FILE')
+    parser.add_argument('--save-baseline', help='Store these results as the new baseline instead of comparing', action='store_true')
+    parser.add_argument('--tolerance', help='Allowed slowdown before a phase counts as a regression', type=float, default=0.25)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        json.dump(measure(args.child, args.engine, args.repeat), sys.stdout)
+        return 0
+
+    results = {
+        'fluff': fluff.__version__,
+        'python': platform.python_version(),
+        'engine': args.engine,
+        'benchmarks': {name: run_isolated(name, args.engine, args.repeat) for name in args.only or benchmark_names()},
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        report(results, None)
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['engine'] != args.engine:
+            print(f"baseline was recorded with --engine={baseline['engine']}, not comparing")
+            baseline = None
+
+    report(results, baseline)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nregressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import tempfile
+
+# Deliberately does not import fluff: the point of the client is to skip
+# that start-up cost and let a `main.py serve` daemon do the work.
+
+frame_header = struct.Struct('!cI')
+
+def default_socket_path() -> str:
+    return os.environ.get("FLUFF_SOCKET") or os.path.join(tempfile.gettempdir(), f"fluff-{os.getuid()}.sock")
+
+def receive(connection: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("daemon closed the connection")
+        data += chunk
+    return bytes(data)
+
+def run(args) -> int:
+    request = {
+        "engine": args.engine,
+        "numeric": args.numeric,
+        "optimize": args.optimize,
+        "use_cache": args.use_cache,
+        "typecheck": args.typecheck,
+        "path": None,
+        "length": 0,
+    }
+
+    if args.file == '-':
+        source = sys.stdin.buffer.read()
+        request["length"] = len(source)
+    else:
+        source = b""
+        request["path"] = os.path.abspath(args.file)
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(args.socket)
+    except OSError as e:
+        print(f"client.py: can't connect to {args.socket}: {e.strerror} (is `main.py serve` running?)", file=sys.stderr)
+        return 2
+
+    with connection:
+        connection.sendall(json.dumps(request).encode('utf-8') + b"\n" + source)
+
+        while True:
+            channel, size = frame_header.unpack(receive(connection, frame_header.size))
+            payload = receive(connection, size)
+
+            if channel == b'o':
+                sys.stdout.buffer.write(payload)
+                sys.stdout.buffer.flush()
+            elif channel == b'e':
+                sys.stderr.buffer.write(payload)
+                sys.stderr.buffer.flush()
+            else:
+                return struct.unpack('!i', payload)[0]
+
+parser = argparse.ArgumentParser(description='Run a Fluff program on a warm `main.py serve` daemon')
+parser.add_argument('file', help="File to execute, or '-' to send standard input")
+parser.add_argument('--socket', help='Unix socket the daemon listens on', default=default_socket_path())
+parser.add_argument('--engine', help='Execution engine to run the program with', choices=['tree', 'vm', 'closure', 'python'], default='tree')
+parser.add_argument('--numeric', help='Runtime representation of numbers', choices=['native', 'decimal'], default='native')
+parser.add_argument('-O', dest='optimize', help='Fold constants and remove dead branches before running', action='store_true')
+parser.add_argument('--no-cache', dest='use_cache', help='Always re-parse instead of reusing the cached tree', action='store_false')
+parser.add_argument('--typecheck', help='Check types before running; programs that pass run without runtime type checks', action='store_true')
+
+sys.exit(run(parser.parse_args()))
@@ -1,13 +1,44 @@
+__version__ = "0.2.0"
+
 from .scanner import Scanner
 from .token import Token, TokenType
 from .parser import Parser
 from .ast_printer import AstPrinter
 from .interpreter import Interpreter
+from .resolver import Resolver
+from .type_checker import TypeChecker
+from .optimizer import Optimizer
+from .compiler import Compiler
+from .vm import VM
+from .closure_compiler import ClosureInterpreter
+from .transpile import Transpiler, PythonInterpreter
 from .runtime_error import RuntimeError
+from .fluff_function import FluffFunction
+from .fluff_array import FluffArray, ArrayType
+from .fluff_interpreter import FluffInterpreter
+from .output import Output
+from .program import Program, CompileError, compile
+from . import cache, parallel, batch
 
 Scanner = Scanner
 Token = Token
 TokenType = TokenType
 AstPrinter = AstPrinter
 Parser = Parser
-Interpreter = Interpreter
\ No newline at end of file
+Interpreter = Interpreter
+Resolver = Resolver
+TypeChecker = TypeChecker
+Optimizer = Optimizer
+Compiler = Compiler
+VM = VM
+ClosureInterpreter = ClosureInterpreter
+Transpiler = Transpiler
+PythonInterpreter = PythonInterpreter
+FluffFunction = FluffFunction
+FluffArray = FluffArray
+ArrayType = ArrayType
+FluffInterpreter = FluffInterpreter
+Output = Output
+Program = Program
+CompileError = CompileError
+compile = compile
@@ -1,40 +1,117 @@
 from .expr import *
+from .stmt import *
 from .token import Token, TokenType as tt
 from typing import List
 
-class AstPrinter(Visitor):
+class AstPrinter(Visitor, VisitorStmt):
     def __init__(self):
         pass
-    
+
     def print(self, expr: Expr):
         return expr.accept(self)
-    
+
+    def printProgram(self, statements: List[Stmt]):
+        return "\n".join(stmt.accept(self) for stmt in statements)
+
     def visitBinaryExpr(self, expr: BinaryExpr):
         return self.parenthesize(expr.operator.lexeme, [expr.left, expr.right])
 
     def visitGroupingExpr(self, expr: GroupingExpr):
         return self.parenthesize('group', [expr.expression])
-    
+
     def visitLiteralExpr(self, expr: LiteralExpr):
         if expr.value == None:
             return 'nil'
+        elif type(expr.value) == str:
+            return repr(expr.value)
         else:
             return str(expr.value)
 
     def visitUnaryExpr(self, expr: UnaryExpr):
         return self.parenthesize(expr.operator.lexeme, [expr.right])
-    
+
+    def visitVarExpr(self, expr: VarExpr):
+        return expr.name.lexeme
+
+    def visitAssignExpr(self, expr: AssignExpr):
+        return self.parenthesize(f"{':=' if expr.assign else '='} {expr.name.lexeme}", [expr.value])
+
+    def visitAssignUpdateExpr(self, expr: AssignUpdateExpr):
+        return self.parenthesize(f"{expr.operator.lexeme} {expr.name.lexeme}", [expr.value])
+
+    def visitLogicalExpr(self, expr: LogicalExpr):
+        return self.parenthesize(expr.operator.lexeme, [expr.left, expr.right])
+
+    def visitFunctionExpr(self, expr: FunctionExpr):
+        return self.parenthesize('call', [expr.callee] + expr.arguments)
+
+    def visitArrayExpr(self, expr: ArrayExpr):
+        return self.parenthesize('array', expr.elements)
+
+    def visitIndexExpr(self, expr: IndexExpr):
+        return self.parenthesize('index', [expr.object, expr.index])
+
+    def visitSetIndexExpr(self, expr: SetIndexExpr):
+        return self.parenthesize('set-index', [expr.object, expr.index, expr.value])
+
+    def visitRangeExpr(self, expr: RangeExpr):
+        bounds = [expr.start, expr.end] + ([expr.step] if expr.step is not None else [])
+        return self.parenthesize('range', bounds)
+
+    def visitParallelExpr(self, expr: ParallelExpr):
+        return self.parenthesize(f"parallel {expr.reduction.lexeme} {expr.name.lexeme}", [expr.iterable, expr.body])
+
+    def visitExpressionStmt(self, stmt: ExpressionStmt):
+        return stmt.expr.accept(self)
+
+    def typeName(self, var_type):
+        # Arrays print as their declaration, e.g. double[].
+        return var_type.name.lower() if type(var_type) == tt else str(var_type)
+
+    def visitVarStmt(self, stmt: VarStmt):
+        var_type = self.typeName(stmt.var_type)
+        if stmt.initializer is None:
+            return f"(var {var_type} {stmt.name.lexeme})"
+        return f"(var {var_type} {stmt.name.lexeme} {stmt.initializer.accept(self)})"
+
+    def visitBlockStmt(self, stmt: BlockStmt):
+        return self.parenthesize('block', stmt.statements)
+
+    def visitIfStmt(self, stmt: IfStmt):
+        branches = [stmt.condition, stmt.thenBranch]
+        if stmt.elseBranch is not None:
+            branches.append(stmt.elseBranch)
+        return self.parenthesize('if', branches)
+
+    def visitWhileStmt(self, stmt: WhileStmt):
+        return self.parenthesize('while', [stmt.condition, stmt.body])
+
+    def visitForStmt(self, stmt: ForStmt):
+        return self.parenthesize(f"for {stmt.name.lexeme}", [stmt.iterable, stmt.body])
+
+    def visitFunctionStmt(self, stmt: FunctionStmt):
+        params = " ".join(self.visitVarStmt(param) for param in stmt.params)
+        name   = f"fn {self.typeName(stmt.result.var_type)} {stmt.name.lexeme}" if stmt.result is not None else f"fn {stmt.name.lexeme}"
+        if stmt.memo is not None:
+            name = f"memo {stmt.memo} {name}"
+        return self.parenthesize(f"{name} ({params})", stmt.body)
+
+    def visitReturnStmt(self, stmt: ReturnStmt):
+        return self.parenthesize('return', [stmt.value] if stmt.value is not None else [])
+
     def parenthesize(self, name: str, exprs: List[Expr]):
+        if len(exprs) == 0:
+            return f"({name})"
         subexprs = " ".join(expr.accept(self) for expr in exprs)
         return f"({name} {subexprs})"
-    
+
     def ___test(self):
         expr = BinaryExpr(
             UnaryExpr(
-                Token(tt.MINUS, "-", None, 1), 
+                Token(tt.MINUS, "-", None, 1),
                 LiteralExpr(123)
-            ), 
-            Token(tt.STAR, "*", None, 1), 
+            ),
+            Token(tt.STAR, "*", None, 1),
             GroupingExpr(LiteralExpr(45.67))
             )
         print(self.print(expr))
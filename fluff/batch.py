@@ -0,0 +1,102 @@
+import contextlib
+import io
+import os
+import sys
+import time
+import traceback
+
+from .fluff_interpreter import FluffInterpreter
+from .output import Output
+from . import parallel
+
+# Runs many independent programs on a pool of worker processes, as
+# 'main.py a.ff b.ff ... -j N' does. Workers are started once and take
+# script after script, so the interpreter is imported once per worker
+# rather than once per script; every script still gets a FluffInterpreter
+# of its own, and what it prints is kept apart from the others'.
+
+# Exit status of a script, as in sysexits.h.
+OK            = 0
+INTERNAL      = 1
+CANT_OPEN     = 2
+SYNTAX_ERROR  = 65
+RUNTIME_ERROR = 70
+
+# The exit status of a program FluffInterpreter fluff_i has run.
+def exit_status(fluff_i: FluffInterpreter) -> int:
+    if fluff_i.hadError:
+        return SYNTAX_ERROR
+    if fluff_i.hadRuntimeError:
+        return RUNTIME_ERROR
+    return OK
+
+# Reads a manifest: one script per line, relative to the manifest's
+# directory; blank lines and lines starting with '#' are skipped.
+def read_manifest(path: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    return [os.path.join(directory, line) for line in lines if line and not line.startswith("#")]
+
+def start_worker():
+    # A parallel expression in a script runs serially: the scripts are
+    # already spread over the cores, and pool workers cannot fork pools.
+    parallel.in_worker = True
+
+# Runs the script at path with the run_file options given and returns its
+# entry for the summary.
+def run_script(path: str, options: dict) -> dict:
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    status = OK
+    start  = time.perf_counter()
+
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            with open(path, 'rb') as f:
+                source = f.read()
+            fluff_i = FluffInterpreter(Output(stdout, "exit"))
+            fluff_i.run_file(source, path=path, **options)
+            status = exit_status(fluff_i)
+        except OSError as e:
+            print(f"can't open '{path}': {e.strerror}", file=stderr)
+            status = CANT_OPEN
+        except Exception:
+            traceback.print_exc()
+            status = INTERNAL
+
+    return {
+        "file": path,
+        "status": status,
+        "seconds": round(time.perf_counter() - start, 6),
+        "worker": os.getpid(),
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+    }
+
+# Runs every script in paths on jobs workers and returns the summary, with
+# the scripts in the order given.
+def run_batch(paths, jobs: int, options: dict) -> dict:
+    start = time.perf_counter()
+
+    if jobs <= 1:
+        scripts = [run_script(path, options) for path in paths]
+    else:
+        # Imported here so single programs do not pay for loading them.
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Forked workers start with the interpreter already imported.
+        context = multiprocessing.get_context("fork") if parallel.forkable() else None
+        sys.stdout.flush()
+        sys.stderr.flush()
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths)) or 1, mp_context=context, initializer=start_worker) as pool:
+            scripts = list(pool.map(run_script, paths, [options] * len(paths)))
+
+    return {
+        "scripts": scripts,
+        "total": len(scripts),
+        "failed": sum(1 for script in scripts if script["status"] != OK),
+        "workers": len(set(script["worker"] for script in scripts)),
+        "seconds": round(time.perf_counter() - start, 6),
+    }
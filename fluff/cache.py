@@ -0,0 +1,83 @@
+import gc
+import hashlib
+import os
+import pickle
+import tempfile
+
+CACHE_DIR = "__fluffcache__"
+
+# Bump whenever the shape of Token or of any Expr/Stmt class changes, so
+# trees pickled by an older interpreter are never loaded.
+MAGIC = 8
+
+def cache_key(source: bytes, version: str, numeric: str, optimize: bool) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{version}:{MAGIC}:{numeric}:{int(optimize)}\0".encode('utf-8'))
+    digest.update(source)
+    return digest.hexdigest()
+
+def cache_path(script: str, version: str, numeric: str, optimize: bool) -> str:
+    directory, name = os.path.split(os.path.abspath(script))
+    tag = f"fluff-{version}-{numeric}{'-O' if optimize else ''}"
+    return os.path.join(directory, CACHE_DIR, f"{name}.{tag}.pickle")
+
+# Unpickling can run arbitrary code, so only entries written by the
+# current user, in a directory they own, are ever unpickled.
+def owned(stat: os.stat_result) -> bool:
+    getuid = getattr(os, 'getuid', None)
+    return getuid is None or stat.st_uid == getuid()
+
+# An entry is its key, which cache_key() always makes 64 hex digits long,
+# followed by the pickled tree. The key is compared before anything is
+# unpickled.
+def load(path: str, key: str):
+    header = key.encode('ascii')
+    try:
+        with open(path, 'rb') as f:
+            if not owned(os.fstat(f.fileno())) or not owned(os.stat(os.path.dirname(path))):
+                return None
+            if f.read(len(header)) != header:
+                return None
+
+            # A cached tree is hundreds of thousands of small objects, all
+            # of which survive; letting the collector scan them while they
+            # are created costs more than the unpickling itself.
+            enabled = gc.isenabled()
+            gc.disable()
+            try:
+                return pickle.load(f)
+            finally:
+                if enabled:
+                    gc.enable()
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError, TypeError):
+        return None
+
+def store(path: str, key: str, statements) -> bool:
+    # Each writer pickles into its own temporary file and renames it into
+    # place, so concurrent runs never observe a partially written entry.
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if not owned(os.stat(directory)):
+            return False
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".pickle")
+    except OSError:
+        return False
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key.encode('ascii'))
+            pickle.dump(statements, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)
+        return True
+    except (OSError, pickle.PicklingError, RecursionError):
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        return False
+    finally:
+        if enabled:
+            gc.enable()
@@ -0,0 +1,487 @@
+from .expr import *
+from .stmt import *
+from .token import TokenType as tt
+from .environment import Environment, UncheckedEnvironment, UNDEFINED
+from .runtime_error import RuntimeError
+from .output import stdout
+from .fluff_callable import FluffCallable, CallError, Clock, Print, Len, Range, Open, Lines, ReadBytes
+from .files import Files
+from .fluff_function import FluffFunction, Return, bind_arguments, convert_result
+from .numeric import number_types
+from .fluff_array import FluffArray, literal, get_index, set_index, binary as array_binary
+from .rope import flatten
+from .ranges import make_range, iterate, sample
+from .parallel import run_parallel
+from typing import List
+import operator
+
+binary_functions = {
+    tt.MINUS: operator.sub,
+    tt.STAR: operator.mul,
+    tt.SLASH: operator.truediv,
+    tt.GREATER: operator.gt,
+    tt.GREATER_EQUAL: operator.ge,
+    tt.LESS: operator.lt,
+    tt.LESS_EQUAL: operator.le,
+    tt.EQUAL_EQUAL: operator.eq,
+    tt.NOT_EQUAL: operator.ne,
+}
+
+class ClosureCompiler(Visitor, VisitorStmt):
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.depth = 0
+
+    def compile(self, statements: List[Stmt]):
+        return [self.compileStmt(stmt) for stmt in statements]
+
+    def compileStmt(self, stmt: Stmt):
+        return stmt.accept(self)
+
+    def compileExpr(self, expr: Expr):
+        return expr.accept(self)
+
+    def visitLiteralExpr(self, expr: LiteralExpr):
+        value = expr.value
+        return lambda env: value
+
+    def visitGroupingExpr(self, expr: GroupingExpr):
+        return self.compileExpr(expr.expression)
+
+    def visitUnaryExpr(self, expr: UnaryExpr):
+        right = self.compileExpr(expr.right)
+
+        if expr.operator.type == tt.MINUS:
+            return lambda env: -right(env)
+        elif expr.operator.type == tt.NOT:
+            return lambda env: not right(env)
+
+    def visitBinaryExpr(self, expr: BinaryExpr):
+        left  = self.compileExpr(expr.left)
+        right = self.compileExpr(expr.right)
+
+        token = expr.operator
+
+        if expr.operator.type == tt.PLUS:
+            def plus(env):
+                a = left(env)
+                b = right(env)
+                if type(a) in number_types and type(b) in number_types or type(a) == str and type(b) == str:
+                    return a + b
+                if type(a) is FluffArray or type(b) is FluffArray:
+                    return array_binary(token, a, b)
+                raise RuntimeError(token, "Operands must be two numbers or two strings")
+            return plus
+
+        function = binary_functions[expr.operator.type]
+
+        # Python raises TypeError for array operands fluff rejects (lengths
+        # that differ, ordering); those become errors at the operator.
+        if type(expr.right) == LiteralExpr:
+            constant = expr.right.value
+
+            def binary_constant_right(env):
+                a = left(env)
+                try:
+                    return function(a, constant)
+                except TypeError:
+                    if type(a) is FluffArray:
+                        return array_binary(token, a, constant)
+                    raise
+            return binary_constant_right
+
+        if type(expr.left) == LiteralExpr:
+            constant = expr.left.value
+
+            def binary_constant_left(env):
+                b = right(env)
+                try:
+                    return function(constant, b)
+                except TypeError:
+                    if type(b) is FluffArray:
+                        return array_binary(token, constant, b)
+                    raise
+            return binary_constant_left
+
+        def binary(env):
+            a = left(env)
+            b = right(env)
+            try:
+                return function(a, b)
+            except TypeError:
+                if type(a) is FluffArray or type(b) is FluffArray:
+                    return array_binary(token, a, b)
+                raise
+        return binary
+
+    def visitLogicalExpr(self, expr: LogicalExpr):
+        left  = self.compileExpr(expr.left)
+        right = self.compileExpr(expr.right)
+
+        if expr.operator.type == tt.OR:
+            return lambda env: left(env) or right(env)
+        else:
+            return lambda env: left(env) and right(env)
+
+    def visitVarExpr(self, expr: VarExpr):
+        name  = expr.name
+        depth = expr.depth
+        slot  = expr.slot
+
+        if expr.rope:
+            def rope_var(env):
+                value = env.frames[depth][slot]
+                if value is UNDEFINED:
+                    raise RuntimeError(name, f"Undefined variable '{name.lexeme}'")
+                return flatten(value)
+            return rope_var
+
+        if depth == 0:
+            values = self.interpreter.globals.values
+
+            def global_var(env):
+                value = values[slot]
+                if value is UNDEFINED:
+                    raise RuntimeError(name, f"Undefined variable '{name.lexeme}'")
+                return value
+            return global_var
+
+        if depth == self.depth:
+            def local_var(env):
+                value = env.values[slot]
+                if value is UNDEFINED:
+                    raise RuntimeError(name, f"Undefined variable '{name.lexeme}'")
+                return value
+            return local_var
+
+        def enclosing_var(env):
+            value = env.frames[depth][slot]
+            if value is UNDEFINED:
+                raise RuntimeError(name, f"Undefined variable '{name.lexeme}'")
+            return value
+        return enclosing_var
+
+    def visitAssignExpr(self, expr: AssignExpr):
+        if expr.append:
+            return self.compileAppend(expr)
+
+        value = self.compileExpr(expr.value)
+        name  = expr.name
+        depth = expr.depth
+        slot  = expr.slot
+
+        if expr.assign:
+            def assign(env):
+                result = value(env)
+                env.assign(slot, name, result)
+                return result
+            return assign
+
+        def update(env):
+            result = value(env)
+            env.update(depth, slot, name, result)
+            return result
+        return update
+
+    def compileAppend(self, expr: AssignExpr):
+        left     = expr.value.left
+        value    = self.compileExpr(expr.value.right)
+        name     = expr.name
+        operator = expr.value.operator
+        depth    = expr.depth
+        slot     = expr.slot
+
+        def append(env):
+            if env.frames[depth][slot] is UNDEFINED:
+                raise RuntimeError(left.name, f"Undefined variable '{left.name.lexeme}'")
+            env.append(depth, slot, name, operator, value(env))
+        return append
+
+    def visitAssignUpdateExpr(self, expr: AssignUpdateExpr):
+        value    = self.compileExpr(expr.value)
+        name     = expr.name
+        operator = expr.operator
+        depth    = expr.depth
+        slot     = expr.slot
+
+        def update_in_place(env):
+            result = value(env)
+            env.update_in_place(depth, slot, name, operator, result)
+            return result
+        return update_in_place
+
+    def visitFunctionExpr(self, expr: FunctionExpr):
+        callee      = self.compileExpr(expr.callee)
+        arguments   = [self.compileExpr(argument) for argument in expr.arguments]
+        paren       = expr.paren
+        interpreter = self.interpreter
+
+        def call(env):
+            function = callee(env)
+            values   = [argument(env) for argument in arguments]
+
+            if not isinstance(function, FluffCallable):
+                raise RuntimeError(paren, "Can only call functions and classes")
+
+            if len(values) != function.arity():
+                raise RuntimeError(paren, f"Expected {function.arity()} arguments but got {len(values)}")
+
+            try:
+                return function.call(interpreter, values)
+            except CallError as error:
+                raise RuntimeError(paren, str(error))
+        return call
+
+    def visitArrayExpr(self, expr: ArrayExpr):
+        elements = [self.compileExpr(element) for element in expr.elements]
+        bracket  = expr.bracket
+        return lambda env: literal(bracket, [element(env) for element in elements])
+
+    def visitIndexExpr(self, expr: IndexExpr):
+        target  = self.compileExpr(expr.object)
+        index   = self.compileExpr(expr.index)
+        bracket = expr.bracket
+        return lambda env: get_index(bracket, target(env), index(env))
+
+    def visitSetIndexExpr(self, expr: SetIndexExpr):
+        target  = self.compileExpr(expr.object)
+        index   = self.compileExpr(expr.index)
+        value   = self.compileExpr(expr.value)
+        bracket = expr.bracket
+
+        def set_item(env):
+            array = target(env)
+            i     = index(env)
+            return set_index(bracket, array, i, value(env))
+        return set_item
+
+    def visitRangeExpr(self, expr: RangeExpr):
+        start    = self.compileExpr(expr.start)
+        end      = self.compileExpr(expr.end)
+        step     = self.compileExpr(expr.step) if expr.step is not None else (lambda env: 1)
+        operator = expr.operator
+        return lambda env: make_range(operator, start(env), end(env), step(env))
+
+    def visitParallelExpr(self, expr: ParallelExpr):
+        iterable = self.compileExpr(expr.iterable)
+
+        self.depth += 1
+        try:
+            body = self.compileExpr(expr.body)
+        finally:
+            self.depth -= 1
+
+        keyword   = expr.keyword
+        reduction = expr.reduction
+        name      = expr.name
+        slot      = expr.slot
+        size      = expr.size
+
+        def parallel(env):
+            def iteration(value):
+                inner = type(env)(env, size)
+                inner.assign(slot, name, value)
+                return body(inner)
+            return run_parallel(reduction, iterate(keyword, iterable(env)), iteration)
+        return parallel
+
+    def visitExpressionStmt(self, stmt: ExpressionStmt):
+        return self.compileExpr(stmt.expr)
+
+    def visitVarStmt(self, stmt: VarStmt):
+        slot = stmt.slot
+
+        if stmt.initializer is None:
+            return lambda env: env.define(slot, stmt, None)
+
+        initializer = self.compileExpr(stmt.initializer)
+        return lambda env: env.define(slot, stmt, initializer(env))
+
+    def visitBlockStmt(self, stmt: BlockStmt):
+        statements = self.compileBlock(stmt)
+        size       = stmt.size
+
+        if size == 0:
+            def inline_block(env):
+                for statement in statements:
+                    statement(env)
+            return inline_block
+
+        def block(env):
+            inner = type(env)(env, size)
+            for statement in statements:
+                statement(inner)
+        return block
+
+    def compileBlock(self, stmt: BlockStmt):
+        if stmt.size == 0:
+            return self.compile(stmt.statements)
+
+        self.depth += 1
+        try:
+            return self.compile(stmt.statements)
+        finally:
+            self.depth -= 1
+
+    def visitIfStmt(self, stmt: IfStmt):
+        condition   = self.compileExpr(stmt.condition)
+        then_branch = self.compileStmt(stmt.thenBranch)
+
+        if stmt.elseBranch is None:
+            def if_then(env):
+                value = condition(env)
+                if value == 'true' or value and value != 'false':
+                    then_branch(env)
+            return if_then
+
+        else_branch = self.compileStmt(stmt.elseBranch)
+
+        def if_else(env):
+            value = condition(env)
+            if value == 'true' or value and value != 'false':
+                then_branch(env)
+            else:
+                else_branch(env)
+        return if_else
+
+    def visitWhileStmt(self, stmt: WhileStmt):
+        return self.compileLoop(stmt.condition, stmt.body)
+
+    def visitForStmt(self, stmt: ForStmt):
+        iterable = self.compileExpr(stmt.iterable)
+
+        self.depth += 1
+        try:
+            body = self.compileStmt(stmt.body)
+        finally:
+            self.depth -= 1
+
+        keyword = stmt.keyword
+        name    = stmt.name
+        slot    = stmt.slot
+        size    = stmt.size
+
+        if stmt.captured:
+            def captured_loop(env):
+                for value in iterate(keyword, iterable(env)):
+                    inner = type(env)(env, size)
+                    inner.assign(slot, name, value)
+                    body(inner)
+            return captured_loop
+
+        # Every iteration runs in the same frame, emptied first, with the
+        # loop variable stored straight into its slot.
+        blank = [UNDEFINED] * size
+
+        def for_loop(env):
+            values = iterate(keyword, iterable(env))
+            inner  = type(env)(env, size)
+            slots  = inner.values
+            first  = sample(values)
+            if first is not None:
+                inner.og_types[slot] = inner.getTokenType(first)
+            for value in values:
+                slots[:] = blank
+                slots[slot] = value
+                body(inner)
+        return for_loop
+
+    def compileLoop(self, condition: Expr, body: Stmt):
+        condition = self.compileExpr(condition)
+
+        if type(body) != BlockStmt or body.size == 0 or body.captured:
+            body = self.compileStmt(body)
+
+            def loop(env):
+                while condition(env):
+                    body(env)
+            return loop
+
+        # Every iteration runs in the same frame, emptied first, instead of
+        # a new environment.
+        statements = self.compileBlock(body)
+        size       = body.size
+        blank      = [UNDEFINED] * size
+
+        def frame_loop(env):
+            inner  = type(env)(env, size)
+            values = inner.values
+            while condition(env):
+                values[:] = blank
+                for statement in statements:
+                    statement(inner)
+        return frame_loop
+
+    def visitFunctionStmt(self, stmt: FunctionStmt):
+        self.depth += 1
+        try:
+            statements = self.compile(stmt.body)
+        finally:
+            self.depth -= 1
+
+        slot        = stmt.slot
+        size        = stmt.size
+        interpreter = self.interpreter
+
+        def declare(env):
+            def invoke(*arguments):
+                inner = type(env)(env, size)
+                bind_arguments(stmt, inner, arguments)
+                try:
+                    for statement in statements:
+                        statement(inner)
+                except Return as returned:
+                    return convert_result(stmt, inner, returned.value)
+                return convert_result(stmt, inner, None)
+
+            function = FluffFunction(stmt.name, len(stmt.params), invoke, stmt.memo)
+            if stmt.memo is not None:
+                interpreter.memoized.append(function)
+            env.define(slot, stmt, function)
+        return declare
+
+    def visitReturnStmt(self, stmt: ReturnStmt):
+        if stmt.value is None:
+            def return_nil(env):
+                raise Return(None)
+            return return_nil
+
+        value = self.compileExpr(stmt.value)
+
+        def return_value(env):
+            raise Return(value(env))
+        return return_value
+
+class ClosureInterpreter:
+    def __init__(self, fluff_instance, numeric: str = "native", checked: bool = True):
+        self.fluff_instance = fluff_instance
+        self.global_slots = dict()
+        self.globals = Environment() if checked else UncheckedEnvironment()
+        self.environment = self.globals
+        self.memoized = []
+        self.files = Files()
+        self.output = getattr(fluff_instance, "output", stdout)
+        self.defineGlobal("clock", Clock(numeric))
+        self.defineGlobal("print", Print(self.output))
+        self.defineGlobal("len", Len())
+        self.defineGlobal("range", Range())
+        self.defineGlobal("open", Open(self.files))
+        self.defineGlobal("lines", Lines(self.files))
+        self.defineGlobal("read_bytes", ReadBytes(self.files))
+
+    def defineGlobal(self, name: str, value):
+        slot = self.global_slots.setdefault(name, len(self.global_slots))
+        self.globals.grow(len(self.global_slots))
+        self.globals.define(slot, name, value)
+
+    def interpret(self, statements: List[Stmt]):
+        self.globals.grow(len(self.global_slots))
+        program = ClosureCompiler(self).compile(statements)
+        try:
+            for statement in program:
+                statement(self.globals)
+        except RuntimeError as e:
+            self.fluff_instance.runtimeError(e)
+        finally:
+            self.output.flush()
+            self.files.close()
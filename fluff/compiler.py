@@ -0,0 +1,431 @@
+from .expr import *
+from .stmt import *
+from .token import TokenType as tt
+from .environment import UNDEFINED
+from .resolver import declares_locally
+from decimal import Decimal
+from enum import IntEnum
+from typing import List
+
+class OpCode(IntEnum):
+    LOAD_CONST  = 0
+    LOAD_VAR    = 1
+    STORE_VAR   = 2
+    DEFINE_VAR  = 3
+    ASSIGN_VAR  = 4
+    UPDATE_VAR  = 5
+    POP         = 6
+
+    ADD = 7
+    SUB = 8
+    MUL = 9
+    DIV = 10
+    GT  = 11
+    GE  = 12
+    LT  = 13
+    LE  = 14
+    EQ  = 15
+    NE  = 16
+    NEG = 17
+    NOT = 18
+
+    JUMP                 = 19
+    JUMP_IF_FALSE        = 20
+    JUMP_IF_NOT_TRUE     = 21
+    JUMP_IF_FALSE_OR_POP = 22
+    JUMP_IF_TRUE_OR_POP  = 23
+
+    CALL        = 24
+    PUSH_SCOPE  = 25
+    POP_SCOPE   = 26
+    HALT        = 27
+    RESET_SCOPE = 28
+
+    DEFINE_FUNCTION = 29
+    RETURN          = 30
+
+    BUILD_ARRAY = 31
+    INDEX       = 32
+    SET_INDEX   = 33
+
+    LOAD_ROPE   = 34
+    APPEND_VAR  = 35
+
+    BUILD_RANGE = 36
+    PARALLEL    = 37
+
+    GET_ITER    = 38
+    FOR_ITER    = 39
+    FOR_NEXT    = 40
+
+# Number of operand words that follow each opcode in Chunk.code.
+operand_counts = {
+    OpCode.LOAD_CONST: 1,
+    OpCode.LOAD_VAR: 3,
+    OpCode.STORE_VAR: 3,
+    OpCode.DEFINE_VAR: 2,
+    OpCode.ASSIGN_VAR: 2,
+    OpCode.UPDATE_VAR: 4,
+    OpCode.ADD: 1,
+    OpCode.SUB: 1,
+    OpCode.MUL: 1,
+    OpCode.DIV: 1,
+    OpCode.GT: 1,
+    OpCode.GE: 1,
+    OpCode.LT: 1,
+    OpCode.LE: 1,
+    OpCode.EQ: 1,
+    OpCode.NE: 1,
+    OpCode.JUMP: 1,
+    OpCode.JUMP_IF_FALSE: 1,
+    OpCode.JUMP_IF_NOT_TRUE: 1,
+    OpCode.JUMP_IF_FALSE_OR_POP: 1,
+    OpCode.JUMP_IF_TRUE_OR_POP: 1,
+    OpCode.CALL: 2,
+    OpCode.PUSH_SCOPE: 1,
+    OpCode.RESET_SCOPE: 1,
+    OpCode.DEFINE_FUNCTION: 2,
+    OpCode.BUILD_ARRAY: 2,
+    OpCode.INDEX: 1,
+    OpCode.SET_INDEX: 1,
+    OpCode.LOAD_ROPE: 3,
+    OpCode.APPEND_VAR: 4,
+    OpCode.BUILD_RANGE: 1,
+    OpCode.PARALLEL: 1,
+    OpCode.GET_ITER: 1,
+    OpCode.FOR_ITER: 3,
+    OpCode.FOR_NEXT: 1,
+}
+
+binary_opcodes = {
+    tt.PLUS: OpCode.ADD,
+    tt.MINUS: OpCode.SUB,
+    tt.STAR: OpCode.MUL,
+    tt.SLASH: OpCode.DIV,
+    tt.GREATER: OpCode.GT,
+    tt.GREATER_EQUAL: OpCode.GE,
+    tt.LESS: OpCode.LT,
+    tt.LESS_EQUAL: OpCode.LE,
+    tt.EQUAL_EQUAL: OpCode.EQ,
+    tt.NOT_EQUAL: OpCode.NE,
+}
+
+class Chunk:
+    def __init__(self):
+        self.code      = []
+        self.lines     = []
+        self.constants = []
+        self.constant_index = dict()
+
+    def write(self, word: int, line: int):
+        self.code.append(int(word))
+        self.lines.append(line)
+
+    def addConstant(self, value) -> int:
+        if value is None or type(value) in (bool, str, int, float, Decimal):
+            key = (type(value), repr(value))
+        else:
+            key = id(value)
+
+        if key not in self.constant_index:
+            self.constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return self.constant_index[key]
+
+    def disassemble(self) -> str:
+        lines = []
+        ip = 0
+        while ip < len(self.code):
+            op = OpCode(self.code[ip])
+            operands = self.code[ip + 1:ip + 1 + operand_counts.get(op, 0)]
+            text = f"{ip:04} {self.lines[ip]:4} {op.name:<20} {' '.join(str(o) for o in operands)}"
+            if op == OpCode.LOAD_CONST:
+                text += f" ({self.constants[operands[0]]!r})"
+            lines.append(text.rstrip())
+            ip += 1 + len(operands)
+        return "\n".join(lines)
+
+# The body of a 'fn' declaration, compiled into a chunk of its own that
+# ends in RETURN.
+class FunctionCode:
+    def __init__(self, declaration: FunctionStmt, chunk: Chunk):
+        self.declaration = declaration
+        self.chunk       = chunk
+
+    def __repr__(self):
+        return f"<code {self.declaration.name.lexeme}>"
+
+# The body of a 'parallel' expression, compiled into a chunk of its own
+# that ends in RETURN.
+class ParallelCode:
+    def __init__(self, expression: ParallelExpr, chunk: Chunk):
+        self.expression = expression
+        self.chunk      = chunk
+
+    def __repr__(self):
+        return f"<code parallel {self.expression.reduction.lexeme}>"
+
+class Compiler(Visitor, VisitorStmt):
+    def __init__(self):
+        self.chunk = Chunk()
+        self.line  = 0
+
+    def compile(self, statements: List[Stmt]) -> Chunk:
+        for stmt in statements:
+            self.compileStmt(stmt)
+        self.emit(OpCode.HALT)
+        return self.chunk
+
+    def compileStmt(self, stmt: Stmt):
+        stmt.accept(self)
+
+    def compileExpr(self, expr: Expr):
+        expr.accept(self)
+
+    def emit(self, op: OpCode, *operands):
+        self.chunk.write(op, self.line)
+        for operand in operands:
+            self.chunk.write(operand, self.line)
+
+    def emitJump(self, op: OpCode) -> int:
+        self.emit(op, 0)
+        return len(self.chunk.code) - 1
+
+    def patchJump(self, offset: int):
+        self.chunk.code[offset] = len(self.chunk.code)
+
+    def constant(self, value) -> int:
+        return self.chunk.addConstant(value)
+
+    def visitLiteralExpr(self, expr: LiteralExpr):
+        self.emit(OpCode.LOAD_CONST, self.constant(expr.value))
+
+    def visitGroupingExpr(self, expr: GroupingExpr):
+        self.compileExpr(expr.expression)
+
+    def visitUnaryExpr(self, expr: UnaryExpr):
+        self.compileExpr(expr.right)
+        self.line = expr.operator.line
+
+        if expr.operator.type == tt.MINUS:
+            self.emit(OpCode.NEG)
+        elif expr.operator.type == tt.NOT:
+            self.emit(OpCode.NOT)
+
+    def visitBinaryExpr(self, expr: BinaryExpr):
+        self.compileExpr(expr.left)
+        self.compileExpr(expr.right)
+        self.line = expr.operator.line
+
+        # The operator token is kept for the errors the VM reports.
+        self.emit(binary_opcodes[expr.operator.type], self.constant(expr.operator))
+
+    def visitLogicalExpr(self, expr: LogicalExpr):
+        self.compileExpr(expr.left)
+
+        if expr.operator.type == tt.OR:
+            end = self.emitJump(OpCode.JUMP_IF_TRUE_OR_POP)
+        else:
+            end = self.emitJump(OpCode.JUMP_IF_FALSE_OR_POP)
+
+        self.compileExpr(expr.right)
+        self.patchJump(end)
+
+    def visitVarExpr(self, expr: VarExpr):
+        self.line = expr.name.line
+        self.emit(OpCode.LOAD_ROPE if expr.rope else OpCode.LOAD_VAR, expr.depth, expr.slot, self.constant(expr.name))
+
+    def visitAssignExpr(self, expr: AssignExpr):
+        if expr.append:
+            # Loading the variable first keeps its "Undefined variable"
+            # ahead of any error in the appended value.
+            left = expr.value.left
+            self.line = left.name.line
+            self.emit(OpCode.LOAD_VAR, left.depth, left.slot, self.constant(left.name))
+            self.emit(OpCode.POP)
+            self.compileExpr(expr.value.right)
+            self.line = expr.name.line
+            self.emit(OpCode.APPEND_VAR, expr.depth, expr.slot, self.constant(expr.name), self.constant(expr.value.operator))
+            return
+
+        self.compileExpr(expr.value)
+        self.line = expr.name.line
+
+        if expr.assign:
+            self.emit(OpCode.ASSIGN_VAR, expr.slot, self.constant(expr.name))
+        else:
+            self.emit(OpCode.STORE_VAR, expr.depth, expr.slot, self.constant(expr.name))
+
+    def visitAssignUpdateExpr(self, expr: AssignUpdateExpr):
+        self.compileExpr(expr.value)
+        self.line = expr.name.line
+        self.emit(OpCode.UPDATE_VAR, expr.depth, expr.slot, self.constant(expr.name), self.constant(expr.operator))
+
+    def visitFunctionExpr(self, expr: FunctionExpr):
+        self.compileExpr(expr.callee)
+
+        for argument in expr.arguments:
+            self.compileExpr(argument)
+
+        self.line = expr.paren.line
+        self.emit(OpCode.CALL, len(expr.arguments), self.constant(expr.paren))
+
+    def visitArrayExpr(self, expr: ArrayExpr):
+        for element in expr.elements:
+            self.compileExpr(element)
+
+        self.line = expr.bracket.line
+        self.emit(OpCode.BUILD_ARRAY, len(expr.elements), self.constant(expr.bracket))
+
+    def visitIndexExpr(self, expr: IndexExpr):
+        self.compileExpr(expr.object)
+        self.compileExpr(expr.index)
+        self.line = expr.bracket.line
+        self.emit(OpCode.INDEX, self.constant(expr.bracket))
+
+    def visitSetIndexExpr(self, expr: SetIndexExpr):
+        self.compileExpr(expr.object)
+        self.compileExpr(expr.index)
+        self.compileExpr(expr.value)
+        self.line = expr.bracket.line
+        self.emit(OpCode.SET_INDEX, self.constant(expr.bracket))
+
+    def visitRangeExpr(self, expr: RangeExpr):
+        self.compileExpr(expr.start)
+        self.compileExpr(expr.end)
+        if expr.step is not None:
+            self.compileExpr(expr.step)
+        else:
+            self.emit(OpCode.LOAD_CONST, self.constant(1))
+        self.line = expr.operator.line
+        self.emit(OpCode.BUILD_RANGE, self.constant(expr.operator))
+
+    def visitParallelExpr(self, expr: ParallelExpr):
+        self.compileExpr(expr.iterable)
+
+        compiler = Compiler()
+        compiler.compileExpr(expr.body)
+        compiler.emit(OpCode.RETURN)
+
+        self.line = expr.keyword.line
+        self.emit(OpCode.PARALLEL, self.constant(ParallelCode(expr, compiler.chunk)))
+
+    def visitExpressionStmt(self, stmt: ExpressionStmt):
+        self.compileExpr(stmt.expr)
+        self.emit(OpCode.POP)
+
+    def visitVarStmt(self, stmt: VarStmt):
+        if stmt.initializer is not None:
+            self.compileExpr(stmt.initializer)
+        else:
+            self.emit(OpCode.LOAD_CONST, self.constant(None))
+
+        self.line = stmt.name.line
+        self.emit(OpCode.DEFINE_VAR, stmt.slot, self.constant(stmt))
+
+    def visitBlockStmt(self, stmt: BlockStmt):
+        if stmt.size == 0:
+            for statement in stmt.statements:
+                self.compileStmt(statement)
+            return
+
+        self.emit(OpCode.PUSH_SCOPE, stmt.size)
+        for statement in stmt.statements:
+            self.compileStmt(statement)
+        self.emit(OpCode.POP_SCOPE)
+
+    def visitIfStmt(self, stmt: IfStmt):
+        self.compileExpr(stmt.condition)
+        else_jump = self.emitJump(OpCode.JUMP_IF_NOT_TRUE)
+        self.compileStmt(stmt.thenBranch)
+
+        if stmt.elseBranch is not None:
+            end_jump = self.emitJump(OpCode.JUMP)
+            self.patchJump(else_jump)
+            self.compileStmt(stmt.elseBranch)
+            self.patchJump(end_jump)
+        else:
+            self.patchJump(else_jump)
+
+    def visitWhileStmt(self, stmt: WhileStmt):
+        self.compileLoop(stmt.condition, stmt.body)
+
+    def visitForStmt(self, stmt: ForStmt):
+        # The iterator stays on the stack for the whole loop. It is
+        # evaluated before the loop's scope is pushed, where a ':=' in it
+        # declares.
+        self.compileExpr(stmt.iterable)
+        self.line = stmt.keyword.line
+        self.emit(OpCode.GET_ITER, self.constant(stmt.keyword))
+
+        if stmt.captured:
+            # A new frame for every iteration, which functions declared in
+            # the body keep.
+            start     = len(self.chunk.code)
+            exit_jump = self.emitJump(OpCode.FOR_NEXT)
+            self.emit(OpCode.PUSH_SCOPE, stmt.size)
+            self.emit(OpCode.ASSIGN_VAR, stmt.slot, self.constant(stmt.name))
+            self.emit(OpCode.POP)
+            self.compileStmt(stmt.body)
+            self.emit(OpCode.POP_SCOPE)
+            self.emit(OpCode.JUMP, start)
+            self.patchJump(exit_jump)
+            return
+
+        # FOR_ITER empties the frame and stores the next value straight
+        # into the loop variable's slot.
+        self.emit(OpCode.PUSH_SCOPE, stmt.size)
+        start = len(self.chunk.code)
+        self.emit(OpCode.FOR_ITER, stmt.slot, 0, self.constant((UNDEFINED,) * stmt.size))
+        exit_jump = len(self.chunk.code) - 2
+        self.compileStmt(stmt.body)
+        self.emit(OpCode.JUMP, start)
+        self.patchJump(exit_jump)
+        self.emit(OpCode.POP_SCOPE)
+
+    def compileLoop(self, condition: Expr, body: Stmt):
+        if type(body) == BlockStmt and body.size > 0 and not body.captured and not declares_locally(condition):
+            self.compileFrameLoop(condition, body)
+            return
+
+        start = len(self.chunk.code)
+        self.compileExpr(condition)
+        exit_jump = self.emitJump(OpCode.JUMP_IF_FALSE)
+        self.compileStmt(body)
+        self.emit(OpCode.JUMP, start)
+        self.patchJump(exit_jump)
+
+    def compileFrameLoop(self, condition: Expr, body: BlockStmt):
+        # Every iteration runs in the same frame, emptied by RESET_SCOPE,
+        # instead of pushing a new one. Variables are addressed by absolute
+        # depth, so the condition can be evaluated inside the frame too.
+        self.emit(OpCode.PUSH_SCOPE, body.size)
+        start = len(self.chunk.code)
+        self.compileExpr(condition)
+        exit_jump = self.emitJump(OpCode.JUMP_IF_FALSE)
+        self.emit(OpCode.RESET_SCOPE, self.constant((UNDEFINED,) * body.size))
+        for statement in body.statements:
+            self.compileStmt(statement)
+        self.emit(OpCode.JUMP, start)
+        self.patchJump(exit_jump)
+        self.emit(OpCode.POP_SCOPE)
+
+    def visitFunctionStmt(self, stmt: FunctionStmt):
+        compiler = Compiler()
+        for statement in stmt.body:
+            compiler.compileStmt(statement)
+        compiler.line = stmt.line
+        compiler.emit(OpCode.LOAD_CONST, compiler.constant(None))
+        compiler.emit(OpCode.RETURN)
+
+        self.line = stmt.name.line
+        self.emit(OpCode.DEFINE_FUNCTION, stmt.slot, self.constant(FunctionCode(stmt, compiler.chunk)))
+
+    def visitReturnStmt(self, stmt: ReturnStmt):
+        if stmt.value is not None:
+            self.compileExpr(stmt.value)
+        else:
+            self.emit(OpCode.LOAD_CONST, self.constant(None))
+
+        self.line = stmt.keyword.line
+        self.emit(OpCode.RETURN)
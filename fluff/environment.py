@@ -1,66 +1,100 @@
-from .token import Token, numeric_types, TokenType
+from .token import Token, numeric_types, TokenType, tt_to_str
 from .stmt import *
 from .runtime_error import RuntimeError
 from .fluff_callable import FluffCallable
-from decimal import Decimal
+from .numeric import number_types, coercions
+from .fluff_array import ArrayType, FluffArray, convert, update as update_array, binary as array_binary
+from .rope import Rope, concat, flatten
 
 tt = TokenType
 
+tt_to_name = {token_type: name for name, token_type in tt_to_str.items()}
+# The type of a number stored with ':=' (see getTokenType).
+tt_to_name[tt.NUMBER] = "numeric"
+
+UNDEFINED = object()
+
 class Environment:
-    def __init__(self, enclosing=None):
+    def __init__(self, enclosing=None, size=0):
         self.enclosing = enclosing
-        self.values    = dict()
-        self.og_types  = dict()
+        self.values    = [UNDEFINED] * size
+        self.og_types  = [None] * size
+
+        if enclosing is not None:
+            self.frames      = enclosing.frames + (self.values,)
+            self.type_frames = enclosing.type_frames + (self.og_types,)
+        else:
+            self.frames      = (self.values,)
+            self.type_frames = (self.og_types,)
+
+    def grow(self, size):
+        if size > len(self.values):
+            missing = size - len(self.values)
+            self.values.extend([UNDEFINED] * missing)
+            self.og_types.extend([None] * missing)
 
-    def define(self, name, value):
+    def define(self, slot, name, value):
         if isinstance(value, FluffCallable):
-            self.values[name]   = value
-            self.og_types[name] = tt.FN
+            self.values[slot]   = value
+            self.og_types[slot] = tt.FN
         elif name.var_type in numeric_types:
-            if type(value) == Decimal:
-                self.values[name.name.lexeme]   = value
-                self.og_types[name.name.lexeme] = self.getTokenType(value)
+            if type(value) in number_types:
+                self.values[slot]   = coercions[name.var_type](value, name.name)
+                self.og_types[slot] = name.var_type
             elif value is None:
-                self.values[name.name.lexeme]   = None
-                self.og_types[name.name.lexeme] = self.getTokenType(Decimal(0))
+                self.values[slot]   = None
+                self.og_types[slot] = name.var_type
             else:
                 raise RuntimeError(name.name, f"Type error: expected numeric, had {self.getFluffNameFromPython(value)}")
         elif name.var_type == tt.STR:
             if type(value) == str:
-                self.values[name.name.lexeme]   = value
-                self.og_types[name.name.lexeme] = self.getTokenType(value)
+                self.values[slot]   = value
+                self.og_types[slot] = self.getTokenType(value)
             elif value is None:
-                self.values[name.name.lexeme]   = None
-                self.og_types[name.name.lexeme] = self.getTokenType("")
+                self.values[slot]   = None
+                self.og_types[slot] = self.getTokenType("")
             else:
                 raise RuntimeError(name.name, f"Type error: expected str, had {self.getFluffNameFromPython(value)}")
         elif name.var_type == tt.BOOL:
             if type(value) == bool:
-                self.values[name.name.lexeme]   = value
-                self.og_types[name.name.lexeme] = self.getTokenType(value)
+                self.values[slot]   = value
+                self.og_types[slot] = self.getTokenType(value)
             elif value is None:
-                self.values[name.name.lexeme]   = None
-                self.og_types[name.name.lexeme] = self.getTokenType(False)
+                self.values[slot]   = None
+                self.og_types[slot] = self.getTokenType(False)
             else:
                 raise RuntimeError(name.name, f"Type error: expected bool, had {self.getFluffNameFromPython(value)}")
-                
+        elif type(name.var_type) == ArrayType:
+            if type(value) == FluffArray:
+                self.values[slot]   = convert(value, name.var_type.element, name.name)
+                self.og_types[slot] = name.var_type
+            elif value is None:
+                self.values[slot]   = None
+                self.og_types[slot] = name.var_type
+            else:
+                raise RuntimeError(name.name, f"Type error: expected {name.var_type}, had {self.getFluffNameFromPython(value)}")
+
 
     def getFluffNameFromPython(self, var):
         name = type(var).__name__
 
-        if name in ["bool", "str"]:
+        if name in ["bool", "str", "int"]:
             return name
-        if name == "Decimal":
+        if name in ["Decimal", "float"]:
             return "double"
-    
+        if name == "FluffArray":
+            return str(var.type)
+        if name == "FileLines":
+            return "lines"
+
     def getFluffNameFromToken(self, token_type):
-        if token_type == tt.BOOL:
-            return 'bool'
-        if token_type == tt.STR:
-            return 'str'
-        if token_type == tt.DOUBLE:
-            return 'double'
-    
+        if type(token_type) == ArrayType:
+            return str(token_type)
+        return tt_to_name.get(token_type)
+
+    # The type ':=' gives a variable from its first value. Numbers get
+    # NUMBER, which takes any number and keeps it as it is: only declared
+    # types convert, so 'acc := 0' followed by 'acc += 0.5' is not truncated.
     def getTokenType(self, var):
         name = type(var).__name__
 
@@ -68,78 +102,148 @@ class Environment:
             return tt.BOOL
         if name == "str":
             return tt.STR
-        if name == "Decimal":
-            return tt.DOUBLE
-    
-    def assign(self, name: Token, value):
-        if name.lexeme not in self.values.keys():
-            self.og_types[name.lexeme] = self.getTokenType(value)
-            self.values[name.lexeme] = value
-        elif self.enclosing != None:
-            self.enclosing.assign(name, value)
+        if name in ["int", "Decimal", "float"]:
+            return tt.NUMBER
+        if name == "FluffArray":
+            return var.type
+
+    def assign(self, slot, name: Token, value):
+        if self.values[slot] is UNDEFINED:
+            self.og_types[slot] = self.getTokenType(value)
+            self.values[slot]   = value
         else:
             raise RuntimeError(name, f"Declaring existing variable '{name.lexeme}'")
-    
-    def update_in_place(self, name: Token, operator: Token, value):
-        if name.lexeme not in self.values.keys() and self.enclosing and self.enclosing.exists(name.lexeme):
-            if self.enclosing.recursive_og_type(name.lexeme) == self.getTokenType(value):
-                self.enclosing.update_in_place(name, operator, value)
-            else:
-                raise RuntimeError(name, f"Assigning '{self.getFluffNameFromPython(value)}' to variable with type '{self.getFluffNameFromToken(self.enclosing.recursive_og_type(name.lexeme))}'")
-        elif name.lexeme in self.values.keys():
-            if self.og_types[name.lexeme] == self.getTokenType(value):
-                if operator.type == tt.PLUS_EQUAL:
-                    self.values[name.lexeme] += value
-                elif operator.type == tt.MINUS_EQUAL:
-                    self.values[name.lexeme] -= value
-                elif operator.type == tt.STAR_EQUAL:
-                    self.values[name.lexeme] *= value
-                elif operator.type == tt.SLASH_EQUAL:
-                    self.values[name.lexeme] /= value
-                elif operator.type == tt.PERCENT_EQUAL:
-                    self.values[name.lexeme] %= value
-                else:
-                    raise RuntimeError(name, f"Operator type not recognized")
+
+    def update_in_place(self, depth, slot, name: Token, operator: Token, value):
+        values = self.frames[depth]
+
+        if values[slot] is UNDEFINED:
+            raise RuntimeError(name, f"Assigning to undefined variable '{name.lexeme}'")
+
+        og_type = self.type_frames[depth][slot]
+        coerce  = coercions.get(og_type)
+
+        if type(og_type) == ArrayType:
+            update_array(name, operator, values[slot], value)
+        elif operator.type == tt.PLUS_EQUAL and type(value) == str and type(values[slot]) in [str, Rope]:
+            values[slot] = concat(values[slot], value)
+        elif type(value) in number_types if coerce is not None else og_type == self.getTokenType(value):
+            if operator.type == tt.PLUS_EQUAL:
+                values[slot] += value
+            elif operator.type == tt.MINUS_EQUAL:
+                values[slot] -= value
+            elif operator.type == tt.STAR_EQUAL:
+                values[slot] *= value
+            elif operator.type == tt.SLASH_EQUAL:
+                values[slot] /= value
+            elif operator.type == tt.PERCENT_EQUAL:
+                values[slot] %= value
             else:
-                raise RuntimeError(name, f"Assigning '{self.getFluffNameFromPython(value)}' to variable with type '{self.getFluffNameFromToken(self.og_types[name.lexeme])}'")         
+                raise RuntimeError(name, f"Operator type not recognized")
+
+            if coerce is not None:
+                values[slot] = coerce(values[slot], name)
         else:
+            raise RuntimeError(name, f"Assigning '{self.getFluffNameFromPython(value)}' to variable with type '{self.getFluffNameFromToken(og_type)}'")
+
+    def update(self, depth, slot, name: Token, value):
+        values = self.frames[depth]
+
+        if values[slot] is UNDEFINED:
             raise RuntimeError(name, f"Assigning to undefined variable '{name.lexeme}'")
-    
-    def exists(self, var_name):
-        if var_name in self.values.keys():
-            return True
-        elif self.enclosing:
-            return self.enclosing.exists(var_name)
+
+        og_type = self.type_frames[depth][slot]
+        coerce  = coercions.get(og_type)
+
+        if coerce is not None and type(value) in number_types:
+            values[slot] = coerce(value, name)
+        elif type(og_type) == ArrayType and type(value) == FluffArray:
+            values[slot] = convert(value, og_type.element, name)
+        elif og_type == self.getTokenType(value):
+            values[slot] = value
         else:
-            return False
-    
-    def recursive_og_type(self, var_name):
-        if var_name in self.og_types.keys():
-            return self.og_types[var_name]
-        elif self.enclosing:
-            return self.enclosing.recursive_og_type(var_name)
+            raise RuntimeError(name, f"Assigning '{self.getFluffNameFromPython(value)}' to variable with type '{self.getFluffNameFromToken(og_type)}'")
+
+    # The statement 'name = name + value' (see Resolver). The engines have
+    # checked that name is defined before evaluating value.
+    def append(self, depth, slot, name: Token, operator: Token, value):
+        values  = self.frames[depth]
+        current = values[slot]
+
+        if type(value) == str and type(current) in [str, Rope]:
+            values[slot] = concat(current, value)
+            return
+
+        current = flatten(current)
+        if type(current) in number_types and type(value) in number_types:
+            result = current + value
+        elif type(current) is FluffArray or type(value) is FluffArray:
+            result = array_binary(operator, current, value)
         else:
-            return False
+            raise RuntimeError(operator, "Operands must be two numbers or two strings")
+        self.update(depth, slot, name, result)
 
-    
-    def update(self, name: Token, value):
-        if name.lexeme not in self.values.keys() and self.enclosing and self.enclosing.exists(name.lexeme):
-            if self.enclosing.recursive_og_type(name.lexeme) == self.getTokenType(value):
-                self.enclosing.update(name, value)
-            else:
-                raise RuntimeError(name, f"Assigning '{self.getFluffNameFromPython(value)}' to variable with type '{self.getFluffNameFromToken(self.enclosing.recursive_og_type(name.lexeme))}'")
-        elif name.lexeme in self.values.keys():
-            if self.og_types[name.lexeme] == self.getTokenType(value):
-                self.values[name.lexeme] = value
-            else:
-                raise RuntimeError(name, f"Assigning '{self.getFluffNameFromPython(value)}' to variable with type '{self.getFluffNameFromToken(self.og_types[name.lexeme])}'")         
+    def get(self, depth, slot, name: Token):
+        value = self.frames[depth][slot]
+
+        if value is UNDEFINED:
+            raise RuntimeError(name, f"Undefined variable '{name.lexeme}'")
+
+        return flatten(value)
+
+# Used for programs the TypeChecker accepted: every value stored here is
+# already known to have the variable's type, so only the numeric
+# conversions and the checks on undefined slots are left.
+class UncheckedEnvironment(Environment):
+    def define(self, slot, name, value):
+        if isinstance(value, FluffCallable):
+            return super().define(slot, name, value)
+
+        coerce = coercions.get(name.var_type)
+        if type(value) == FluffArray:
+            self.values[slot] = convert(value, name.var_type.element, name.name) if type(name.var_type) == ArrayType else value
         else:
+            self.values[slot] = coerce(value, name.name) if coerce is not None and value is not None else value
+        self.og_types[slot] = name.var_type
+
+    def update_in_place(self, depth, slot, name: Token, operator: Token, value):
+        values = self.frames[depth]
+
+        if values[slot] is UNDEFINED:
+            raise RuntimeError(name, f"Assigning to undefined variable '{name.lexeme}'")
+
+        if type(values[slot]) == FluffArray:
+            update_array(name, operator, values[slot], value)
+            return
+
+        if operator.type == tt.PLUS_EQUAL and type(value) == str and type(values[slot]) in [str, Rope]:
+            values[slot] = concat(values[slot], value)
+            return
+
+        if operator.type == tt.PLUS_EQUAL:
+            values[slot] += value
+        elif operator.type == tt.MINUS_EQUAL:
+            values[slot] -= value
+        elif operator.type == tt.STAR_EQUAL:
+            values[slot] *= value
+        elif operator.type == tt.SLASH_EQUAL:
+            values[slot] /= value
+        elif operator.type == tt.PERCENT_EQUAL:
+            values[slot] %= value
+
+        coerce = coercions.get(self.type_frames[depth][slot])
+        if coerce is not None:
+            values[slot] = coerce(values[slot], name)
+
+    def update(self, depth, slot, name: Token, value):
+        values = self.frames[depth]
+
+        if values[slot] is UNDEFINED:
             raise RuntimeError(name, f"Assigning to undefined variable '{name.lexeme}'")
 
-    def get(self, name: Token):
-        if name.lexeme in self.values.keys():
-            return self.values[name.lexeme]
-        elif self.enclosing != None:
-            return self.enclosing.get(name)
+        og_type = self.type_frames[depth][slot]
+        if type(og_type) == ArrayType:
+            values[slot] = convert(value, og_type.element, name) if value is not None else value
         else:
-            raise RuntimeError(name, f"Undefined variable '{name.lexeme}'")
\ No newline at end of file
+            coerce = coercions.get(og_type)
+            values[slot] = coerce(value, name) if coerce is not None else value
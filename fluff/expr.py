@@ -2,8 +2,12 @@ from .token import Token
 from abc import ABC, abstractmethod
 from typing import List
 
+# Runs before the tree interpreter specializes a node; see specialize.py.
+WARMUP = 8
 
 class Expr(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def __init__(self):
         pass
@@ -13,15 +17,25 @@ class Expr(ABC):
         pass
     
 class BinaryExpr(Expr):
+    __slots__ = ('left', 'operator', 'right', 'quick', 'warmup')
+
     def __init__(self, left: Expr, operator: Token, right: Expr):
         self.left     = left
         self.operator = operator
         self.right    = right
+        self.quick    = None
+        self.warmup   = WARMUP
     
     def accept(self, visitor):
         return visitor.visitBinaryExpr(self)
 
+    def __getstate__(self):
+        # The inline cache belongs to one run; a copied tree starts cold.
+        return None, {'left': self.left, 'operator': self.operator, 'right': self.right, 'quick': None, 'warmup': WARMUP}
+
 class GroupingExpr(Expr):
+    __slots__ = ('expression',)
+
     def __init__(self, expression: Expr):
         self.expression = expression
     
@@ -29,6 +43,8 @@ class GroupingExpr(Expr):
         return visitor.visitGroupingExpr(self)
 
 class LiteralExpr(Expr):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -39,6 +55,8 @@ class LiteralExpr(Expr):
         return f"{self.value}"
 
 class UnaryExpr(Expr):
+    __slots__ = ('operator', 'right')
+
     def __init__(self, operator: Token, right: Expr):
         self.operator = operator
         self.right    = right
@@ -47,8 +65,14 @@ class UnaryExpr(Expr):
         return visitor.visitUnaryExpr(self)
 
 class VarExpr(Expr):
+    __slots__ = ('name', 'depth', 'slot', 'rope')
+
     def __init__(self, name: Token):
-        self.name = name
+        self.name  = name
+        self.depth = None
+        self.slot  = None
+        # Set by the resolver when the variable may hold a Rope.
+        self.rope  = False
     
     def accept(self, visitor):
         return visitor.visitVarExpr(self)
@@ -57,10 +81,17 @@ class VarExpr(Expr):
         return f"{self.name}"
 
 class AssignExpr(Expr):
+    __slots__ = ('name', 'value', 'assign', 'depth', 'slot', 'append')
+
     def __init__(self, name: Token, value: Expr, assign=False):
         self.name = name
         self.value = value
         self.assign = assign
+        self.depth = None
+        self.slot = None
+        # Set by the resolver for the statement 'name = name + x', which
+        # appends to the string in place.
+        self.append = False
     
     def accept(self, visitor):
         return visitor.visitAssignExpr(self)
@@ -69,18 +100,30 @@ class AssignExpr(Expr):
         return f"{self.name} = {self.value}"
 
 class AssignUpdateExpr(Expr):
+    __slots__ = ('name', 'value', 'operator', 'depth', 'slot', 'quick', 'warmup')
+
     def __init__(self, name: Token, value: Expr, operator: Token):
         self.name = name
         self.value = value
         self.operator = operator
+        self.depth = None
+        self.slot = None
+        self.quick = None
+        self.warmup = WARMUP
 
     def accept(self, visitor):
         return visitor.visitAssignUpdateExpr(self)
+
+    def __getstate__(self):
+        return None, {'name': self.name, 'value': self.value, 'operator': self.operator, 'depth': self.depth,
+                      'slot': self.slot, 'quick': None, 'warmup': WARMUP}
     
     def __str__(self):
         return f"{self.name} = {self.value}"
 
 class LogicalExpr(Expr):
+    __slots__ = ('left', 'operator', 'right')
+
     def __init__(self, left: Expr, operator: Token, right: Expr):
         self.left     = left
         self.operator = operator
@@ -90,6 +133,8 @@ class LogicalExpr(Expr):
         return visitor.visitLogicalExpr(self)
 
 class FunctionExpr(Expr):
+    __slots__ = ('callee', 'paren', 'arguments')
+
     def __init__(self, callee: Expr, paren: Token, arguments: List[Expr]):
         self.callee    = callee
         self.paren     = paren
@@ -98,6 +143,71 @@ class FunctionExpr(Expr):
     def accept(self, visitor):
         return visitor.visitFunctionExpr(self)
 
+class ArrayExpr(Expr):
+    __slots__ = ('bracket', 'elements')
+
+    def __init__(self, bracket: Token, elements: List[Expr]):
+        self.bracket  = bracket
+        self.elements = elements
+
+    def accept(self, visitor):
+        return visitor.visitArrayExpr(self)
+
+class IndexExpr(Expr):
+    __slots__ = ('object', 'bracket', 'index')
+
+    def __init__(self, object: Expr, bracket: Token, index: Expr):
+        self.object  = object
+        self.bracket = bracket
+        self.index   = index
+
+    def accept(self, visitor):
+        return visitor.visitIndexExpr(self)
+
+class SetIndexExpr(Expr):
+    __slots__ = ('object', 'bracket', 'index', 'value')
+
+    def __init__(self, object: Expr, bracket: Token, index: Expr, value: Expr):
+        self.object  = object
+        self.bracket = bracket
+        self.index   = index
+        self.value   = value
+
+    def accept(self, visitor):
+        return visitor.visitSetIndexExpr(self)
+
+# 'start..end' or 'start..end..step', the ints from start up to but not
+# including end. Only written as what a loop iterates over.
+class RangeExpr(Expr):
+    __slots__ = ('start', 'operator', 'end', 'step')
+
+    def __init__(self, start: Expr, operator: Token, end: Expr, step: Expr = None):
+        self.start    = start
+        self.operator = operator
+        self.end      = end
+        self.step     = step
+
+    def accept(self, visitor):
+        return visitor.visitRangeExpr(self)
+
+# 'parallel sum for name in iterable: body', where the reduction is one of
+# sum, min, max or collect. Every iteration evaluates body in a scope of
+# its own holding name; the resolver sets its slot and size.
+class ParallelExpr(Expr):
+    __slots__ = ('keyword', 'reduction', 'name', 'iterable', 'body', 'slot', 'size')
+
+    def __init__(self, keyword: Token, reduction: Token, name: Token, iterable: Expr, body: Expr):
+        self.keyword   = keyword
+        self.reduction = reduction
+        self.name      = name
+        self.iterable  = iterable
+        self.body      = body
+        self.slot      = None
+        self.size      = 0
+
+    def accept(self, visitor):
+        return visitor.visitParallelExpr(self)
+
     
 class Visitor(ABC):
     @abstractmethod
@@ -134,4 +244,24 @@ class Visitor(ABC):
     
     @abstractmethod
     def visitFunctionExpr(self, expr: FunctionExpr):
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def visitArrayExpr(self, expr: ArrayExpr):
+        pass
+
+    @abstractmethod
+    def visitIndexExpr(self, expr: IndexExpr):
+        pass
+
+    @abstractmethod
+    def visitSetIndexExpr(self, expr: SetIndexExpr):
+        pass
+
+    @abstractmethod
+    def visitRangeExpr(self, expr: RangeExpr):
+        pass
+
+    @abstractmethod
+    def visitParallelExpr(self, expr: ParallelExpr):
+        pass
@@ -0,0 +1,76 @@
+import mmap
+
+from .numeric import whole
+
+# Files opened by a program. open() maps the whole file into memory and
+# hands out an int handle, so a file fits in the variables Fluff already
+# has; lines() and read_bytes() read through the mapping, which lets the
+# operating system page the file in and out instead of the program
+# holding a copy of it. The engine closes every file when the program
+# ends.
+
+class Files:
+    def __init__(self):
+        self.maps = []
+
+    def open(self, path: str) -> int:
+        with open(path, 'rb') as f:
+            # An empty file cannot be mapped, and has nothing to read.
+            if f.seek(0, 2) == 0:
+                data = b""
+            else:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if hasattr(data, "madvise"):
+                    data.madvise(mmap.MADV_SEQUENTIAL)
+        self.maps.append(data)
+        return len(self.maps) - 1
+
+    # The mapping of handle, or None if it is not a handle of an open file.
+    def get(self, handle):
+        handle = whole(handle)
+        if handle is None or not 0 <= handle < len(self.maps):
+            return None
+        return self.maps[handle]
+
+    def close(self):
+        for data in self.maps:
+            if type(data) is mmap.mmap:
+                data.close()
+        self.maps.clear()
+
+# Pages of a mapping that were read stay in the memory of the process
+# until they are given back; lines() gives them back every RELEASE bytes.
+RELEASE = 16 << 20
+
+# The lines of a mapped file, without their line endings. Lines are found
+# and decoded one at a time as a loop asks for them, so only the current
+# line is ever copied out of the file.
+class FileLines:
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __iter__(self):
+        data     = self.data
+        find     = data.find
+        start    = 0
+        end      = len(data)
+        released = 0
+        release  = hasattr(data, "madvise")
+        while start < end:
+            newline = find(b"\n", start)
+            if newline < 0:
+                newline = end
+            stop = newline
+            if stop > start and data[stop - 1] == 13:
+                stop -= 1
+            yield data[start:stop].decode('utf-8', 'replace')
+            start = newline + 1
+
+            if release and start - released >= RELEASE:
+                # The pages are still in the page cache; reading them
+                # again only maps them back in.
+                upto = start - start % mmap.PAGESIZE
+                data.madvise(mmap.MADV_DONTNEED, released, upto - released)
+                released = upto
@@ -0,0 +1,305 @@
+from .token import Token, TokenType as tt, tt_to_str
+from .runtime_error import RuntimeError
+from .numeric import number_types, coercions, float_types
+from .files import FileLines
+from array import array
+from decimal import Decimal
+from itertools import repeat
+import operator
+
+# NumPy is optional: arrays are always stored in array.array, and NumPy
+# only runs the elementwise operations when it is installed. It is
+# imported by the first operation that can use it, so programs that never
+# touch a long array do not pay for loading it.
+numpy        = None
+numpy_loaded = False
+
+def load_numpy():
+    global numpy, numpy_loaded
+    if not numpy_loaded:
+        numpy_loaded = True
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+    return numpy
+
+type_names = {token_type: name for name, token_type in tt_to_str.items()}
+
+# Both float types are stored as doubles, as float variables are.
+typecodes = {
+    tt.INT: 'q',
+    tt.INT8: 'b',
+    tt.INT16: 'h',
+    tt.INT32: 'i',
+    tt.INT64: 'q',
+    tt.UINT8: 'B',
+    tt.UINT16: 'H',
+    tt.UINT32: 'I',
+    tt.UINT64: 'Q',
+    tt.FLOAT: 'd',
+    tt.DOUBLE: 'd',
+}
+
+# Below this length the per-call overhead of NumPy outweighs its speed.
+numpy_threshold = 64
+
+operators = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+}
+
+in_place_operators = {'+=': '+', '-=': '-', '*=': '*', '/=': '/'}
+
+# The declared type of an array variable, e.g. double[].
+class ArrayType:
+    __slots__ = ('element',)
+
+    def __init__(self, element: tt):
+        self.element = element
+
+    def __eq__(self, other):
+        return type(other) is ArrayType and other.element == self.element
+
+    def __hash__(self):
+        return hash((ArrayType, self.element))
+
+    def __str__(self):
+        return f"{type_names[self.element]}[]"
+
+    __repr__ = __str__
+
+# A fixed-length array of numbers of one element type. Elements are
+# converted to the element type on the way in, with the same wrapping
+# and truncation as typed variables. The arithmetic operators work
+# elementwise, between two arrays of the same length or an array and a
+# number; ints keep the element type of the array on the left (or of the
+# only array), anything involving a float or '/' gives a double[].
+class FluffArray:
+    __slots__ = ('element', 'values')
+
+    def __init__(self, element: tt, values: array):
+        self.element = element
+        self.values  = values
+
+    @property
+    def type(self):
+        return ArrayType(self.element)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __str__(self):
+        return "[" + ", ".join(str(value) for value in self.values) + "]"
+
+    def __eq__(self, other):
+        return type(other) is FluffArray and len(self.values) == len(other.values) and \
+               all(a == b for a, b in zip(self.values, other.values))
+
+    def __ne__(self, other):
+        return not self == other
+
+    # Arrays are mutable, so they are never used as keys (e.g. by @memo).
+    __hash__ = None
+
+    def __add__(self, other):
+        return elementwise('+', self, other)
+
+    def __radd__(self, other):
+        return elementwise('+', other, self)
+
+    def __sub__(self, other):
+        return elementwise('-', self, other)
+
+    def __rsub__(self, other):
+        return elementwise('-', other, self)
+
+    def __mul__(self, other):
+        return elementwise('*', self, other)
+
+    def __rmul__(self, other):
+        return elementwise('*', other, self)
+
+    def __truediv__(self, other):
+        return elementwise('/', self, other)
+
+    def __rtruediv__(self, other):
+        return elementwise('/', other, self)
+
+    def __neg__(self):
+        return elementwise('-', 0, self)
+
+    def __iadd__(self, other):
+        return self.update('+', other)
+
+    def __isub__(self, other):
+        return self.update('-', other)
+
+    def __imul__(self, other):
+        return self.update('*', other)
+
+    def __itruediv__(self, other):
+        return self.update('/', other)
+
+    def update(self, symbol: str, other, name: Token = None):
+        result = elementwise(symbol, self, other)
+        if result is NotImplemented:
+            return result
+        self.values[:] = convert(result, self.element, name).values
+        return self
+
+def build(element: tt, values, name: Token = None) -> FluffArray:
+    # values is a list of numbers; out-of-range ints and floats in int
+    # arrays are converted one by one only when the fast path fails. name
+    # is where a value the element type cannot hold is reported.
+    try:
+        return FluffArray(element, array(typecodes[element], values))
+    except (OverflowError, TypeError):
+        coerce = coercions[element]
+        return FluffArray(element, array(typecodes[element], [coerce(value, name) for value in values]))
+
+def convert(value: FluffArray, element: tt, name: Token = None) -> FluffArray:
+    if value.element == element:
+        return value
+    return build(element, value.values.tolist(), name)
+
+def literal(bracket: Token, values: list) -> FluffArray:
+    # Literals hold int64 values unless one of them is a float.
+    element = tt.INT64
+    for value in values:
+        if type(value) not in number_types:
+            raise RuntimeError(bracket, f"Arrays can only hold numbers, had {describe(value)}")
+        if type(value) is Decimal:
+            raise RuntimeError(bracket, "Arrays hold machine numbers and are not supported with --numeric=decimal")
+        if type(value) is float:
+            element = tt.DOUBLE
+    return build(element, values)
+
+def describe(value) -> str:
+    if type(value) is FluffArray:
+        return str(value.type)
+    if value is None:
+        return "nil"
+    if type(value) in [float, Decimal]:
+        return "double"
+    if type(value) is FileLines:
+        return "lines"
+    return type(value).__name__
+
+def check_index(bracket: Token, target, index) -> int:
+    if type(target) is not FluffArray:
+        raise RuntimeError(bracket, f"Only arrays can be indexed, had {describe(target)}")
+    if type(index) is not int:
+        raise RuntimeError(bracket, f"Array index must be an int, had {describe(index)}")
+    if not 0 <= index < len(target.values):
+        raise RuntimeError(bracket, f"Index {index} out of range for array of length {len(target.values)}")
+    return index
+
+def get_index(bracket: Token, target, index):
+    index = check_index(bracket, target, index)
+    return target.values[index]
+
+def set_index(bracket: Token, target, index, value):
+    index = check_index(bracket, target, index)
+    if type(value) not in number_types or type(value) is Decimal:
+        raise RuntimeError(bracket, f"Type error: expected numeric, had {describe(value)}")
+    try:
+        target.values[index] = value
+    except (OverflowError, TypeError):
+        target.values[index] = coercions[target.element](value, bracket)
+    return value
+
+def result_element(symbol: str, left, right) -> tt:
+    arrays = [operand.element for operand in (left, right) if type(operand) is FluffArray]
+    if symbol == '/' or any(element in float_types for element in arrays) or float in (type(left), type(right)):
+        return tt.DOUBLE
+    return arrays[0]
+
+def elementwise(symbol: str, left, right):
+    # NotImplemented makes Python raise TypeError, which the engines turn
+    # into a runtime error with the operator's line (see explain).
+    for operand in (left, right):
+        if type(operand) is not FluffArray and (type(operand) not in number_types or type(operand) is Decimal):
+            return NotImplemented
+    if type(left) is FluffArray and type(right) is FluffArray and len(left.values) != len(right.values):
+        return NotImplemented
+
+    element = result_element(symbol, left, right)
+    length  = len(left.values) if type(left) is FluffArray else len(right.values)
+
+    if length >= numpy_threshold and load_numpy() is not None:
+        return numpy_elementwise(symbol, left, right, element)
+
+    function = operators[symbol]
+    if type(left) is FluffArray and type(right) is FluffArray:
+        values = list(map(function, left.values, right.values))
+    elif type(left) is FluffArray:
+        values = list(map(function, left.values, repeat(right)))
+    else:
+        values = list(map(function, repeat(left), right.values))
+    return build(element, values)
+
+def numpy_operand(operand, floating: bool):
+    if type(operand) is not FluffArray:
+        # Ints are computed modulo 2**64, which wraps the same way as
+        # converting the exact result to the element type.
+        return float(operand) if floating else numpy.int64(coercions[tt.INT64](operand))
+    values = numpy.frombuffer(operand.values, dtype=numpy.dtype(operand.values.typecode))
+    return values.astype(numpy.float64 if floating else numpy.int64)
+
+def numpy_elementwise(symbol: str, left, right, element: tt) -> FluffArray:
+    floating = element in float_types
+    a = numpy_operand(left, floating)
+    b = numpy_operand(right, floating)
+
+    if symbol == '/' and not numpy.all(b):
+        raise ZeroDivisionError("division by zero")
+
+    with numpy.errstate(over='ignore'):
+        if symbol == '+':
+            result = numpy.add(a, b)
+        elif symbol == '-':
+            result = numpy.subtract(a, b)
+        elif symbol == '*':
+            result = numpy.multiply(a, b)
+        else:
+            result = numpy.true_divide(a, b)
+
+    values = array(typecodes[element])
+    values.frombytes(result.astype(numpy.dtype(typecodes[element])).tobytes())
+    return FluffArray(element, values)
+
+def explain(token: Token, left, right):
+    # Reports why an operator Python rejected is not defined on these
+    # operands, at least one of which is an array.
+    symbol = in_place_operators.get(token.lexeme, token.lexeme)
+    if symbol not in operators:
+        raise RuntimeError(token, f"Operator '{token.lexeme}' is not supported on arrays")
+    if type(left) is FluffArray and type(right) is FluffArray:
+        raise RuntimeError(token, f"Array lengths differ: {len(left.values)} and {len(right.values)}")
+    raise RuntimeError(token, f"Operands must be arrays or numbers, had {describe(left)} and {describe(right)}")
+
+def binary(token: Token, left, right):
+    # The generic path for an operator applied to at least one array.
+    if token.lexeme in operators:
+        result = elementwise(token.lexeme, left, right)
+        if result is not NotImplemented:
+            return result
+    elif token.lexeme == "==":
+        return left == right
+    elif token.lexeme == "!=":
+        return left != right
+    explain(token, left, right)
+
+def update(name: Token, operator: Token, current, value):
+    # 'a += x' on an array variable updates the array in place.
+    symbol = in_place_operators.get(operator.lexeme)
+    if type(current) is not FluffArray:
+        raise RuntimeError(name, f"Assigning to nil variable '{name.lexeme}'")
+    if symbol is None:
+        raise RuntimeError(operator, f"Operator '{operator.lexeme}' is not supported on arrays")
+    if current.update(symbol, value, name) is NotImplemented:
+        explain(operator, current, value)
+    return current
@@ -1,6 +1,15 @@
 from abc import ABC, abstractmethod
 import time
 from decimal import Decimal
+from .fluff_array import FluffArray, describe
+from array import array
+from .token import TokenType as tt
+from .files import FileLines
+from .numeric import whole
+
+# Raised by builtins for bad arguments; the engines report it at the call.
+class CallError(Exception):
+    pass
 
 class FluffCallable(ABC):
     @abstractmethod
@@ -12,15 +21,93 @@ class FluffCallable(ABC):
         pass
 
 class Clock(FluffCallable):
+    def __init__(self, numeric: str = "native"):
+        self.numeric = numeric
+
     def call(self, interpreter, arguments):
-        return Decimal(time.monotonic())
+        if self.numeric == "decimal":
+            return Decimal(time.monotonic())
+        return time.monotonic()
     
     def arity(self):
         return 0
 
 class Print(FluffCallable):
+    def __init__(self, output):
+        self.output = output
+
     def call(self, interpreter, arguments):
-        print(arguments[0])
+        self.output.print(arguments[0])
     
     def arity(self):
-        return 1
\ No newline at end of file
+        return 1
+
+class Len(FluffCallable):
+    def call(self, interpreter, arguments):
+        value = arguments[0]
+        if type(value) not in [FluffArray, str]:
+            raise CallError(f"len() expects an array or str, had {describe(value)}")
+        return len(value)
+
+    def arity(self):
+        return 1
+
+# range(n) is the int64[] holding 0 through n - 1.
+class Range(FluffCallable):
+    def call(self, interpreter, arguments):
+        count = arguments[0]
+        if type(count) is not int or count < 0:
+            raise CallError(f"range() expects a non-negative int, had {describe(count)}")
+        return FluffArray(tt.INT64, array('q', range(count)))
+
+    def arity(self):
+        return 1
+
+# open(path) maps a file for reading and returns its handle (see files.py).
+class Open(FluffCallable):
+    def __init__(self, files):
+        self.files = files
+
+    def call(self, interpreter, arguments):
+        path = arguments[0]
+        if type(path) is not str:
+            raise CallError(f"open() expects a str path, had {describe(path)}")
+        try:
+            return self.files.open(path)
+        except OSError as e:
+            raise CallError(f"open() could not open '{path}': {e.strerror}")
+
+    def arity(self):
+        return 1
+
+# lines(file) is the lines of an open file, read as a loop goes over them.
+class Lines(FluffCallable):
+    def __init__(self, files):
+        self.files = files
+
+    def call(self, interpreter, arguments):
+        data = self.files.get(arguments[0])
+        if data is None:
+            raise CallError(f"lines() expects a file from open(), had {describe(arguments[0])}")
+        return FileLines(data)
+
+    def arity(self):
+        return 1
+
+# read_bytes(file, offset, count) is the uint8[] of up to count bytes of an
+# open file starting at offset.
+class ReadBytes(FluffCallable):
+    def __init__(self, files):
+        self.files = files
+
+    def call(self, interpreter, arguments):
+        data = self.files.get(arguments[0])
+        if data is None:
+            raise CallError(f"read_bytes() expects a file from open(), had {describe(arguments[0])}")
+        offset, count = whole(arguments[1]), whole(arguments[2])
+        if offset is None or count is None or offset < 0 or count < 0:
+            raise CallError(f"read_bytes() expects a non-negative int offset and count, had {describe(arguments[1])} and {describe(arguments[2])}")
+        return FluffArray(tt.UINT8, array('B', data[offset:offset + count]))
+
+    def arity(self):
+        return 3
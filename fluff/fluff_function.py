@@ -0,0 +1,62 @@
+from .fluff_callable import FluffCallable
+from .environment import Environment
+from .runtime_error import RuntimeError
+from .stmt import FunctionStmt
+from .token import Token
+from .fluff_array import FluffArray
+from functools import lru_cache
+
+# Unwinds the engine's stack from a 'return' to the call that made it.
+class Return(Exception):
+    def __init__(self, value):
+        self.value = value
+
+# A function declared with 'fn'. Every engine compiles the body its own
+# way and hands over invoke(*arguments); '@memo' functions wrap it in an
+# LRU cache keyed by the argument tuple. Keys are typed, so 1 and 1.0 (or
+# 1 and true) are cached separately, as their results may differ.
+class FluffFunction(FluffCallable):
+    def __init__(self, name: Token, params: int, invoke, memo=None):
+        self.name   = name
+        self.params = params
+        self.memo   = memo
+        self.invoke = lru_cache(maxsize=memo, typed=True)(invoke) if memo is not None else invoke
+
+    def call(self, interpreter, arguments):
+        invoke = self.invoke
+        if self.memo is not None and any(type(argument) is FluffArray for argument in arguments):
+            # Arrays are mutable, so calls taking one are never cached.
+            invoke = invoke.__wrapped__
+        try:
+            return invoke(*arguments)
+        except RecursionError:
+            raise RuntimeError(self.name, f"Stack overflow in '{self.name.lexeme}'")
+
+    def arity(self):
+        return self.params
+
+    def cacheInfo(self):
+        return self.invoke.cache_info()
+
+    def __str__(self):
+        return f"<fn {self.name.lexeme}>"
+
+def bind_arguments(declaration: FunctionStmt, environment: Environment, arguments):
+    for param, argument in zip(declaration.params, arguments):
+        if param.var_type == "dynamic":
+            environment.assign(param.slot, param.name, argument)
+        elif argument is None:
+            raise RuntimeError(param.name, f"Type error: expected {environment.getFluffNameFromToken(param.var_type)}, had nil")
+        else:
+            # Arguments are checked even in unchecked environments: calls
+            # through a variable holding a function are not checked statically.
+            Environment.define(environment, param.slot, param, argument)
+
+def convert_result(declaration: FunctionStmt, environment: Environment, value):
+    result = declaration.result
+    if result is None:
+        return value
+    if value is None:
+        raise RuntimeError(declaration.name, f"Type error: '{declaration.name.lexeme}' must return {environment.getFluffNameFromToken(result.var_type)}, had nil")
+    Environment.define(environment, result.slot, result, value)
+    return environment.values[result.slot]
@@ -0,0 +1,120 @@
+import os
+import sys
+
+from .scanner import Scanner
+from .token import Token, TokenType as tt
+from .parser import Parser
+from .ast_printer import AstPrinter
+from .interpreter import Interpreter
+from .resolver import Resolver
+from .optimizer import Optimizer
+from .vm import VM
+from .closure_compiler import ClosureInterpreter
+from .transpile import PythonInterpreter
+from .runtime_error import RuntimeError
+from .profiler import Profiler
+from .type_checker import TypeChecker
+from .output import Output
+from . import __version__, cache
+
+engines = {
+    "tree": Interpreter,
+    "vm": VM,
+    "closure": ClosureInterpreter,
+    "python": PythonInterpreter,
+}
+
+# Every Fluff call takes a dozen or so Python frames in the tree engine.
+recursion_limit = 50000
+
+class FluffInterpreter:
+    # Program output and error reports share the sink, so they come out in
+    # the order they happened.
+    def __init__(self, output: Output = None):
+        self.output = output if output is not None else Output()
+
+    def run_file(self, file_bytes: bytes, engine: str = "tree", dump_python=None, numeric: str = "native", optimize: bool = False, dump_ast=None, path=None, use_cache: bool = True, profile=None, typecheck: bool = False, memo_stats=None):
+        self.hadError = False
+        self.hadRuntimeError = False
+        statements = None
+
+        if path is not None and use_cache:
+            key        = cache.cache_key(file_bytes, __version__, numeric, optimize)
+            cache_file = cache.cache_path(path, __version__, numeric, optimize)
+            statements = cache.load(cache_file, key)
+
+        if statements is None:
+            statements = self.parse(file_bytes, numeric, optimize)
+            if statements is None:
+                return
+            if path is not None and use_cache:
+                cache.store(cache_file, key, statements)
+
+        if dump_ast is not None:
+            dump_ast.write(AstPrinter().printProgram(statements) + "\n")
+            dump_ast.flush()
+
+        # A program that passes the checker cannot fail a type check at
+        # runtime, so the engines can skip them.
+        if typecheck and not TypeChecker(self).check(statements):
+            return
+
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), recursion_limit))
+
+        if dump_python is not None:
+            interpreter = PythonInterpreter(self, numeric, dump_python, checked=not typecheck)
+        else:
+            interpreter = engines[engine](self, numeric, checked=not typecheck)
+        resolver    = Resolver(self, interpreter)
+        resolver.resolve(statements)
+        if self.hadError:
+            return
+
+        if profile is None:
+            interpreter.interpret(statements)
+        else:
+            profiler = Profiler(os.path.basename(path) if path is not None else "<stdin>", file_bytes.decode('utf-8', 'replace'))
+            profiler.start()
+            try:
+                interpreter.interpret(statements)
+            finally:
+                profiler.stop()
+                profile.write("\n".join(profiler.collapsed()) + "\n")
+                profile.flush()
+                print(profiler.hotLines(), file=sys.stderr)
+
+        if memo_stats is not None:
+            for function in interpreter.memoized:
+                info = function.cacheInfo()
+                memo_stats.write(f"{function.name.lexeme} (line {function.name.line}): {info.hits} hits, {info.misses} misses, {info.currsize}/{info.maxsize} cached\n")
+            memo_stats.flush()
+
+    def parse(self, file_bytes: bytes, numeric: str = "native", optimize: bool = False):
+        scanner     = Scanner(file_bytes, self, numeric)
+        parser      = Parser(self, scanner.iterTokens())
+        statements  = parser.parse()
+
+        if self.hadError:
+            return None
+        if optimize:
+            statements = Optimizer(self).optimize(statements)
+        return statements
+    
+    def error(self, line, message):
+        self.report(line, "", message)
+    
+    def runtimeError(self, error: RuntimeError):
+        self.hadRuntimeError = True
+        self.output.write(f"[line {error.token.line}]: {error.message}\n")
+        self.output.flush()
+    
+    def error_t(self, token: Token, message: str):
+        if token.type == tt.EOF:
+            self.report(token.line, "at end", message)
+        else:
+            self.report(token.line, f"at '{token.lexeme}'", message)
+
+    def report(self, line, where, message):
+        self.output.write(f"[line {line}] Error {where}: {message}\n")
+        self.output.flush()
+        self.hadError = True
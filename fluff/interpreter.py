@@ -1,25 +1,53 @@
 from .expr import *
 from .stmt import *
 from .token import TokenType as tt
-from decimal import Decimal
+from .numeric import number_types
 from typing import List
-from .environment import Environment
+from .environment import Environment, UncheckedEnvironment, UNDEFINED
 from .runtime_error import RuntimeError
-from .fluff_callable import FluffCallable, Clock, Print
+from .output import stdout
+from .fluff_callable import FluffCallable, CallError, Clock, Print, Len, Range, Open, Lines, ReadBytes
+from .files import Files
+from .fluff_function import FluffFunction, Return, bind_arguments, convert_result
+from .fluff_array import FluffArray, literal, get_index, set_index, binary as array_binary
+from .specialize import specialize_binary, specialize_update, BACKOFF
+from .rope import flatten
+from .ranges import make_range, iterate, sample
+from .parallel import run_parallel
 
 class Interpreter(Visitor, VisitorStmt):
-    def __init__(self, fluff_instance):
+    def __init__(self, fluff_instance, numeric: str = "native", checked: bool = True):
         self.fluff_instance = fluff_instance
-        self.environment = Environment()
-        self.environment.define("clock", Clock())
-        self.environment.define("print", Print())
+        self.global_slots = dict()
+        self.globals = Environment() if checked else UncheckedEnvironment()
+        self.environment = self.globals
+        self.memoized = []
+        self.files = Files()
+        # Reporters that are only used for parsing have no sink of their own.
+        self.output = getattr(fluff_instance, "output", stdout)
+        self.defineGlobal("clock", Clock(numeric))
+        self.defineGlobal("print", Print(self.output))
+        self.defineGlobal("len", Len())
+        self.defineGlobal("range", Range())
+        self.defineGlobal("open", Open(self.files))
+        self.defineGlobal("lines", Lines(self.files))
+        self.defineGlobal("read_bytes", ReadBytes(self.files))
+
+    def defineGlobal(self, name: str, value):
+        slot = self.global_slots.setdefault(name, len(self.global_slots))
+        self.globals.grow(len(self.global_slots))
+        self.globals.define(slot, name, value)
 
     def interpret(self, statements: List[Stmt]):
+        self.globals.grow(len(self.global_slots))
         try:
             for stmt in statements:
                 self.execute(stmt)
         except RuntimeError as e:
             self.fluff_instance.runtimeError(e)
+        finally:
+            self.output.flush()
+            self.files.close()
     
     def execute(self, stmt: Stmt):
         stmt.accept(self)
@@ -45,32 +73,55 @@ class Interpreter(Visitor, VisitorStmt):
             return self.booleanify(not right)
     
     def visitBinaryExpr(self, expr: BinaryExpr):
+        quick = expr.quick
+        if quick is not None:
+            return quick(self)
+
         left  = self.evaluate(expr.left)
         right = self.evaluate(expr.right)
 
-        if expr.operator.type == tt.MINUS:
-            return left - right
-        elif expr.operator.type == tt.SLASH:
-            return left / right
-        elif expr.operator.type == tt.STAR:
-            return left * right
-        elif expr.operator.type == tt.PLUS:
-            if type(left) == Decimal and type(right) == Decimal:
-                return left + right
-            elif type(left) == str and type(right) == Decimal:
-                return left + right
-        elif expr.operator.type == tt.GREATER_EQUAL:
-            return self.booleanify(left > right)
-        elif expr.operator.type == tt.GREATER:
-            return self.booleanify(left >= right)
-        elif expr.operator.type == tt.LESS_EQUAL:
-            return self.booleanify(left <= right)
-        elif expr.operator.type == tt.LESS:
-            return self.booleanify(left < right)
-        elif expr.operator.type == tt.NOT_EQUAL:
-            return self.booleanify(left != right)
-        elif expr.operator.type == tt.EQUAL_EQUAL:
-            return self.booleanify(left == right)
+        expr.warmup -= 1
+        if expr.warmup == 0:
+            expr.quick = specialize_binary(expr, left, right)
+            if expr.quick is None:
+                expr.warmup = BACKOFF
+
+        return self.binary(expr, left, right)
+
+    def binary(self, expr: BinaryExpr, left, right):
+        try:
+            if expr.operator.type == tt.MINUS:
+                return left - right
+            elif expr.operator.type == tt.SLASH:
+                return left / right
+            elif expr.operator.type == tt.STAR:
+                return left * right
+            elif expr.operator.type == tt.PLUS:
+                if type(left) in number_types and type(right) in number_types:
+                    return left + right
+                elif type(left) == str and type(right) == str:
+                    return left + right
+                elif type(left) is FluffArray or type(right) is FluffArray:
+                    return array_binary(expr.operator, left, right)
+                raise RuntimeError(expr.operator, "Operands must be two numbers or two strings")
+            elif expr.operator.type == tt.GREATER_EQUAL:
+                return self.booleanify(left >= right)
+            elif expr.operator.type == tt.GREATER:
+                return self.booleanify(left > right)
+            elif expr.operator.type == tt.LESS_EQUAL:
+                return self.booleanify(left <= right)
+            elif expr.operator.type == tt.LESS:
+                return self.booleanify(left < right)
+            elif expr.operator.type == tt.NOT_EQUAL:
+                return self.booleanify(left != right)
+            elif expr.operator.type == tt.EQUAL_EQUAL:
+                return self.booleanify(left == right)
+        except TypeError:
+            # Operators on arrays that Python rejects get an error naming
+            # the operator; anything else is not a fluff error.
+            if type(left) is FluffArray or type(right) is FluffArray:
+                return array_binary(expr.operator, left, right)
+            raise
         
     def visitExpressionStmt(self, stmt: ExpressionStmt):
         self.evaluate(stmt.expr)
@@ -79,26 +130,55 @@ class Interpreter(Visitor, VisitorStmt):
         value = None
         if stmt.initializer is not None:
             value = self.evaluate(stmt.initializer)
-        self.environment.define(stmt, value)
+        self.environment.define(stmt.slot, stmt, value)
 
     def visitVarExpr(self, expr: VarExpr):
-        return self.environment.get(expr.name)
+        value = self.environment.frames[expr.depth][expr.slot]
+        if value is UNDEFINED:
+            raise RuntimeError(expr.name, f"Undefined variable '{expr.name.lexeme}'")
+        if expr.rope:
+            return flatten(value)
+        return value
 
     def visitAssignExpr(self, expr: AssignExpr):
+        if expr.append:
+            left = expr.value.left
+            if self.environment.frames[left.depth][left.slot] is UNDEFINED:
+                raise RuntimeError(left.name, f"Undefined variable '{left.name.lexeme}'")
+            self.environment.append(expr.depth, expr.slot, expr.name, expr.value.operator, self.evaluate(expr.value.right))
+            return None
+
         value = self.evaluate(expr.value)
         if expr.assign:
-            self.environment.assign(expr.name, value)
+            self.environment.assign(expr.slot, expr.name, value)
         else:
-            self.environment.update(expr.name, value)
+            self.environment.update(expr.depth, expr.slot, expr.name, value)
         return value
     
-    def visitAssignUpdateExpr(self, expr: AssignExpr):
+    def visitAssignUpdateExpr(self, expr: AssignUpdateExpr):
+        quick = expr.quick
+        if quick is not None:
+            return quick(self)
+
         value = self.evaluate(expr.value)
-        self.environment.update_in_place(expr.name, expr.operator, value)
+
+        expr.warmup -= 1
+        if expr.warmup == 0:
+            current = self.environment.frames[expr.depth][expr.slot]
+            og_type = self.environment.type_frames[expr.depth][expr.slot]
+            expr.quick = specialize_update(expr, current, value, og_type)
+            if expr.quick is None:
+                expr.warmup = BACKOFF
+
+        self.environment.update_in_place(expr.depth, expr.slot, expr.name, expr.operator, value)
         return value
     
     def visitBlockStmt(self, stmt: BlockStmt):
-        self.executeBlock(stmt.statements, Environment(enclosing=self.environment))
+        if stmt.size == 0:
+            for statement in stmt.statements:
+                self.execute(statement)
+            return
+        self.executeBlock(stmt.statements, type(self.environment)(self.environment, stmt.size))
     
     def executeBlock(self, statements: List[Stmt], environment: Environment):
         previous = self.environment
@@ -131,12 +211,54 @@ class Interpreter(Visitor, VisitorStmt):
         return self.evaluate(expr.right)
     
     def visitWhileStmt(self, stmt: WhileStmt):
-        while self.evaluate(stmt.condition):
-            self.execute(stmt.body)
+        self.executeLoop(stmt.condition, stmt.body)
     
-    def visitForStmt(self, stmt: ForStmt): #TODO: implement actual for's
-        while self.evaluate(stmt.expr):
-            self.execute(stmt.body)
+    def visitForStmt(self, stmt: ForStmt):
+        values   = iterate(stmt.keyword, self.evaluate(stmt.iterable))
+        previous = self.environment
+
+        if stmt.captured:
+            for value in values:
+                environment = type(previous)(previous, stmt.size)
+                environment.assign(stmt.slot, stmt.name, value)
+                self.executeBlock([stmt.body], environment)
+            return
+
+        # The loop variable is stored straight into its slot of a frame
+        # reused by every iteration. All values of a range, an array or the
+        # lines of a file have the same type, so it is recorded once.
+        frame  = type(previous)(previous, stmt.size)
+        slots  = frame.values
+        slot   = stmt.slot
+        body   = stmt.body
+        blank  = [UNDEFINED] * stmt.size
+        first  = sample(values)
+        if first is not None:
+            frame.og_types[slot] = frame.getTokenType(first)
+
+        self.environment = frame
+        try:
+            for value in values:
+                slots[:] = blank
+                slots[slot] = value
+                self.execute(body)
+        finally:
+            self.environment = previous
+
+    def executeLoop(self, condition: Expr, body: Stmt):
+        if type(body) != BlockStmt or body.size == 0 or body.captured:
+            while self.evaluate(condition):
+                self.execute(body)
+            return
+
+        # Every iteration runs in the same frame, emptied first, instead of
+        # a new environment.
+        frame  = type(self.environment)(self.environment, body.size)
+        values = frame.values
+        blank  = [UNDEFINED] * body.size
+        while self.evaluate(condition):
+            values[:] = blank
+            self.executeBlock(body.statements, frame)
     
     def visitFunctionExpr(self, expr: FunctionExpr):
         callee = self.evaluate(expr.callee)
@@ -152,4 +274,61 @@ class Interpreter(Visitor, VisitorStmt):
         if len(arguments) != callee.arity():
             raise RuntimeError(expr.paren, f"Expected {callee.arity()} arguments but got {len(arguments)}")
         
-        return callee.call(self, arguments)
\ No newline at end of file
+        try:
+            return callee.call(self, arguments)
+        except CallError as error:
+            raise RuntimeError(expr.paren, str(error))
+
+    def visitFunctionStmt(self, stmt: FunctionStmt):
+        closure = self.environment
+
+        def invoke(*arguments):
+            environment = type(closure)(closure, stmt.size)
+            bind_arguments(stmt, environment, arguments)
+            try:
+                self.executeBlock(stmt.body, environment)
+            except Return as returned:
+                return convert_result(stmt, environment, returned.value)
+            return convert_result(stmt, environment, None)
+
+        function = FluffFunction(stmt.name, len(stmt.params), invoke, stmt.memo)
+        if stmt.memo is not None:
+            self.memoized.append(function)
+        self.environment.define(stmt.slot, stmt, function)
+
+    def visitReturnStmt(self, stmt: ReturnStmt):
+        raise Return(self.evaluate(stmt.value) if stmt.value is not None else None)
+
+    def visitArrayExpr(self, expr: ArrayExpr):
+        return literal(expr.bracket, [self.evaluate(element) for element in expr.elements])
+
+    def visitIndexExpr(self, expr: IndexExpr):
+        return get_index(expr.bracket, self.evaluate(expr.object), self.evaluate(expr.index))
+
+    def visitSetIndexExpr(self, expr: SetIndexExpr):
+        target = self.evaluate(expr.object)
+        index  = self.evaluate(expr.index)
+        return set_index(expr.bracket, target, index, self.evaluate(expr.value))
+
+    def visitRangeExpr(self, expr: RangeExpr):
+        start = self.evaluate(expr.start)
+        end   = self.evaluate(expr.end)
+        step  = self.evaluate(expr.step) if expr.step is not None else 1
+        return make_range(expr.operator, start, end, step)
+
+    def visitParallelExpr(self, expr: ParallelExpr):
+        values  = iterate(expr.keyword, self.evaluate(expr.iterable))
+        closure = self.environment
+
+        def body(value):
+            environment = type(closure)(closure, expr.size)
+            environment.assign(expr.slot, expr.name, value)
+
+            previous = self.environment
+            self.environment = environment
+            try:
+                return self.evaluate(expr.body)
+            finally:
+                self.environment = previous
+
+        return run_parallel(expr.reduction, values, body)
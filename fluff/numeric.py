@@ -0,0 +1,81 @@
+from .token import Token, TokenType as tt, tt_to_str
+from .runtime_error import RuntimeError
+from decimal import Decimal
+
+number_types = frozenset([int, float, Decimal])
+
+float_types = [tt.FLOAT, tt.DOUBLE]
+
+type_names = {var_type: name for name, var_type in tt_to_str.items()}
+
+int_widths = {
+    tt.INT: (64, True),
+    tt.INT8: (8, True),
+    tt.INT16: (16, True),
+    tt.INT32: (32, True),
+    tt.INT64: (64, True),
+    tt.UINT8: (8, False),
+    tt.UINT16: (16, False),
+    tt.UINT32: (32, False),
+    tt.UINT64: (64, False),
+}
+
+int_ranges = dict()
+for var_type, (bits, signed) in int_widths.items():
+    if signed:
+        int_ranges[var_type] = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1)
+    else:
+        int_ranges[var_type] = (0, (1 << bits) - 1)
+
+def parse_literal(text: str, numeric: str):
+    if numeric == "decimal":
+        return Decimal(text)
+    elif '.' in text:
+        return float(text)
+    else:
+        return int(text)
+
+# Coercions take the value and the token of the variable it is stored in,
+# where a value the type cannot hold (inf or nan in an int, an int too large
+# for a double) is reported.
+def make_int_coercion(var_type):
+    low, high = int_ranges[var_type]
+    modulus   = high - low + 1
+
+    def coerce(value, name: Token = None):
+        if type(value) is not int:
+            # Decimal values only appear in --numeric=decimal mode, which
+            # keeps the old arbitrary-precision behaviour.
+            if type(value) is Decimal:
+                return value
+            try:
+                value = int(value)
+            except (OverflowError, ValueError):
+                raise RuntimeError(name, f"Cannot convert {value} to {type_names[var_type]}")
+        if low <= value <= high:
+            return value
+        return (value - low) % modulus + low
+    return coerce
+
+def make_float_coercion(var_type):
+    def coerce(value, name: Token = None):
+        if type(value) is float or type(value) is Decimal:
+            return value
+        try:
+            return float(value)
+        except OverflowError:
+            raise RuntimeError(name, f"Cannot convert an int of {value.bit_length()} bits to {type_names[var_type]}")
+    return coerce
+
+coercions = {var_type: make_int_coercion(var_type) for var_type in int_widths}
+for var_type in float_types:
+    coercions[var_type] = make_float_coercion(var_type)
+
+# value as an int if it is a whole number (an integral Decimal with
+# --numeric=decimal), otherwise None.
+def whole(value):
+    if type(value) is int:
+        return value
+    if type(value) is Decimal and value.is_finite() and value == value.to_integral_value():
+        return int(value)
+    return None
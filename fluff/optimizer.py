@@ -0,0 +1,269 @@
+from .expr import *
+from .stmt import *
+from .token import TokenType as tt
+from .numeric import int_ranges, float_types, number_types
+from .interpreter import Interpreter
+from .runtime_error import RuntimeError
+from typing import List
+
+class Optimizer(Visitor, VisitorStmt):
+    def __init__(self, fluff_instance):
+        self.fluff_instance = fluff_instance
+        # Constant subtrees are folded by running the tree walker on them,
+        # so folded values always match what the program would compute.
+        self.folder = Interpreter(fluff_instance)
+        self.scopes = [dict()]
+
+    def optimize(self, statements: List[Stmt]) -> List[Stmt]:
+        optimized = []
+        for stmt in statements:
+            stmt = self.optimizeStmt(stmt)
+            if stmt is not None:
+                optimized.append(stmt)
+        return optimized
+
+    def optimizeStmt(self, stmt: Stmt):
+        return stmt.accept(self)
+
+    def optimizeExpr(self, expr: Expr) -> Expr:
+        return expr.accept(self)
+
+    def optimizeBranch(self, stmt: Stmt) -> Stmt:
+        optimized = self.optimizeStmt(stmt)
+        return optimized if optimized is not None else BlockStmt([], stmt.line)
+
+    def fold(self, expr: Expr) -> Expr:
+        try:
+            return LiteralExpr(self.folder.evaluate(expr))
+        except (RuntimeError, ArithmeticError, TypeError, ValueError):
+            return expr
+
+    def isLiteral(self, expr: Expr, *values) -> bool:
+        # Only plain ints count: 1.0 or Decimal('1.0') would change the
+        # type or the printed precision of the other operand.
+        return type(expr) == LiteralExpr and type(expr.value) == int and expr.value in values
+
+    def declaredType(self, expr: Expr):
+        if type(expr) != VarExpr:
+            return None
+        for scope in reversed(self.scopes):
+            if expr.name.lexeme in scope:
+                return scope[expr.name.lexeme]
+        return None
+
+    def isNumeric(self, expr: Expr) -> bool:
+        if type(expr) == LiteralExpr:
+            return type(expr.value) in number_types
+        elif type(expr) == VarExpr:
+            declared = self.declaredType(expr)
+            return declared in int_ranges or declared in float_types
+        elif type(expr) == UnaryExpr:
+            return expr.operator.type == tt.MINUS and self.isNumeric(expr.right)
+        elif type(expr) == BinaryExpr:
+            return expr.operator.type in [tt.PLUS, tt.MINUS, tt.STAR, tt.SLASH] and \
+                   self.isNumeric(expr.left) and self.isNumeric(expr.right)
+        return False
+
+    def truthy(self, value, rule: str) -> bool:
+        if rule == "if":
+            return value == 'true' or bool(value and value != 'false')
+        return bool(value)
+
+    def declares(self, node) -> bool:
+        # A ':=' reserves a slot in the enclosing scope even if it never
+        # runs, so statements containing one are never removed.
+        if type(node) == AssignExpr and node.assign:
+            return True
+        if isinstance(node, (Expr, Stmt)):
+            return any(self.declares(getattr(node, field)) for field in type(node).__slots__)
+        if type(node) == list:
+            return any(self.declares(child) for child in node)
+        return False
+
+    def visitLiteralExpr(self, expr: LiteralExpr):
+        return expr
+
+    def visitGroupingExpr(self, expr: GroupingExpr):
+        return self.optimizeExpr(expr.expression)
+
+    def visitUnaryExpr(self, expr: UnaryExpr):
+        expr.right = self.optimizeExpr(expr.right)
+
+        if type(expr.right) == LiteralExpr:
+            return self.fold(expr)
+        return expr
+
+    def visitBinaryExpr(self, expr: BinaryExpr):
+        expr.left  = self.optimizeExpr(expr.left)
+        expr.right = self.optimizeExpr(expr.right)
+
+        if type(expr.left) == LiteralExpr and type(expr.right) == LiteralExpr:
+            return self.fold(expr)
+
+        operator = expr.operator.type
+        left     = self.declaredType(expr.left)
+        right    = self.declaredType(expr.right)
+
+        # x + 0 is only an identity for ints: -0.0 + 0 is 0.0.
+        if left in int_ranges and operator in [tt.PLUS, tt.MINUS] and self.isLiteral(expr.right, 0):
+            return expr.left
+        if right in int_ranges and operator == tt.PLUS and self.isLiteral(expr.left, 0):
+            return expr.right
+        if left in int_ranges or left in float_types:
+            if operator == tt.STAR and self.isLiteral(expr.right, 1):
+                return expr.left
+            # '/' always divides to a double, so x / 1 is only x for doubles.
+            if operator == tt.SLASH and left in float_types and self.isLiteral(expr.right, 1):
+                return expr.left
+            if operator == tt.MINUS and self.isLiteral(expr.right, 0):
+                return expr.left
+        if (right in int_ranges or right in float_types) and operator == tt.STAR and self.isLiteral(expr.left, 1):
+            return expr.right
+
+        return expr
+
+    def visitLogicalExpr(self, expr: LogicalExpr):
+        expr.left  = self.optimizeExpr(expr.left)
+        expr.right = self.optimizeExpr(expr.right)
+
+        if type(expr.left) == LiteralExpr:
+            if expr.operator.type == tt.OR:
+                return expr.left if expr.left.value else expr.right
+            else:
+                return expr.right if expr.left.value else expr.left
+        return expr
+
+    def visitVarExpr(self, expr: VarExpr):
+        return expr
+
+    def visitAssignExpr(self, expr: AssignExpr):
+        expr.value = self.optimizeExpr(expr.value)
+
+        if expr.assign:
+            self.scopes[-1][expr.name.lexeme] = None
+        return expr
+
+    def visitAssignUpdateExpr(self, expr: AssignUpdateExpr):
+        expr.value = self.optimizeExpr(expr.value)
+        return expr
+
+    def visitFunctionExpr(self, expr: FunctionExpr):
+        expr.callee    = self.optimizeExpr(expr.callee)
+        expr.arguments = [self.optimizeExpr(argument) for argument in expr.arguments]
+        return expr
+
+    # Array literals are never folded: each evaluation has to create a
+    # new, separately mutable array.
+    def visitArrayExpr(self, expr: ArrayExpr):
+        expr.elements = [self.optimizeExpr(element) for element in expr.elements]
+        return expr
+
+    def visitIndexExpr(self, expr: IndexExpr):
+        expr.object = self.optimizeExpr(expr.object)
+        expr.index  = self.optimizeExpr(expr.index)
+        return expr
+
+    def visitSetIndexExpr(self, expr: SetIndexExpr):
+        expr.object = self.optimizeExpr(expr.object)
+        expr.index  = self.optimizeExpr(expr.index)
+        expr.value  = self.optimizeExpr(expr.value)
+        return expr
+
+    def visitRangeExpr(self, expr: RangeExpr):
+        expr.start = self.optimizeExpr(expr.start)
+        expr.end   = self.optimizeExpr(expr.end)
+        if expr.step is not None:
+            expr.step = self.optimizeExpr(expr.step)
+        return expr
+
+    def visitParallelExpr(self, expr: ParallelExpr):
+        expr.iterable = self.optimizeExpr(expr.iterable)
+
+        self.scopes.append({expr.name.lexeme: None})
+        try:
+            expr.body = self.optimizeExpr(expr.body)
+        finally:
+            self.scopes.pop()
+        return expr
+
+    def visitExpressionStmt(self, stmt: ExpressionStmt):
+        stmt.expr = self.optimizeExpr(stmt.expr)
+
+        if type(stmt.expr) == LiteralExpr:
+            return None
+        return stmt
+
+    def visitVarStmt(self, stmt: VarStmt):
+        if stmt.initializer is not None:
+            stmt.initializer = self.optimizeExpr(stmt.initializer)
+
+        # Typed variables can be nil until assigned, which makes 'x + 0'
+        # an error rather than an identity, so only track ones that start
+        # out holding a number.
+        if stmt.initializer is not None and self.isNumeric(stmt.initializer):
+            self.scopes[-1][stmt.name.lexeme] = stmt.var_type
+        else:
+            self.scopes[-1][stmt.name.lexeme] = None
+        return stmt
+
+    def visitBlockStmt(self, stmt: BlockStmt):
+        self.scopes.append(dict())
+        try:
+            stmt.statements = self.optimize(stmt.statements)
+        finally:
+            self.scopes.pop()
+        return stmt
+
+    def visitIfStmt(self, stmt: IfStmt):
+        stmt.condition  = self.optimizeExpr(stmt.condition)
+        stmt.thenBranch = self.optimizeBranch(stmt.thenBranch)
+        if stmt.elseBranch is not None:
+            stmt.elseBranch = self.optimizeBranch(stmt.elseBranch)
+
+        if type(stmt.condition) != LiteralExpr:
+            return stmt
+
+        if self.truthy(stmt.condition.value, "if"):
+            taken, dead = stmt.thenBranch, stmt.elseBranch
+        else:
+            taken, dead = stmt.elseBranch, stmt.thenBranch
+
+        if dead is not None and self.declares(dead):
+            return stmt
+        return taken
+
+    def visitWhileStmt(self, stmt: WhileStmt):
+        stmt.condition = self.optimizeExpr(stmt.condition)
+        stmt.body      = self.optimizeBranch(stmt.body)
+
+        if type(stmt.condition) == LiteralExpr and not self.truthy(stmt.condition.value, "while"):
+            if not self.declares(stmt.body):
+                return None
+        return stmt
+
+    def visitForStmt(self, stmt: ForStmt):
+        stmt.iterable = self.optimizeExpr(stmt.iterable)
+
+        self.scopes.append({stmt.name.lexeme: None})
+        try:
+            stmt.body = self.optimizeBranch(stmt.body)
+        finally:
+            self.scopes.pop()
+        return stmt
+
+    def visitFunctionStmt(self, stmt: FunctionStmt):
+        self.scopes[-1][stmt.name.lexeme] = None
+
+        # Typed parameters are never nil, so numeric ones can be tracked
+        # from the start.
+        self.scopes.append({param.name.lexeme: param.var_type for param in stmt.params})
+        try:
+            stmt.body = self.optimize(stmt.body)
+        finally:
+            self.scopes.pop()
+        return stmt
+
+    def visitReturnStmt(self, stmt: ReturnStmt):
+        if stmt.value is not None:
+            stmt.value = self.optimizeExpr(stmt.value)
+        return stmt
@@ -0,0 +1,58 @@
+import sys
+
+# Where print writes to. Calling Python's print for every Fluff print
+# formats and writes each line on its own, a system call per line once
+# stdout is a pipe; the sink collects the lines and writes them out in one
+# piece instead. When it writes out is the policy:
+#   line  after every newline, for output read while the program runs
+#   size  once size characters are waiting
+#   exit  only when flushed, which the engines do when the program ends
+# The stream is any text file, io.StringIO included; None is whatever
+# sys.stdout is when the sink writes out, so redirecting stdout around a
+# run still catches its output.
+policies = ["line", "size", "exit"]
+
+class Output:
+    def __init__(self, stream=None, policy=None, size: int = 1 << 16):
+        if policy is None:
+            policy = "line" if isatty(stream if stream is not None else sys.stdout) else "size"
+        if policy not in policies:
+            raise ValueError(f"Unknown flush policy '{policy}'")
+
+        self.stream  = stream
+        self.policy  = policy
+        self.buffer  = []
+        self.pending = 0
+        self.line    = policy == "line"
+        self.limit   = size if policy == "size" else float("inf")
+
+    def write(self, text: str):
+        self.buffer.append(text)
+        self.pending += len(text)
+        if self.pending >= self.limit or (self.line and "\n" in text):
+            self.flush()
+
+    # Same as write(f"{value}\n"), print being most of what programs do.
+    def print(self, value):
+        text = f"{value}\n"
+        self.buffer.append(text)
+        self.pending += len(text)
+        if self.pending >= self.limit or self.line:
+            self.flush()
+
+    def flush(self):
+        stream = self.stream if self.stream is not None else sys.stdout
+        if self.buffer:
+            stream.write("".join(self.buffer))
+            self.buffer.clear()
+            self.pending = 0
+        stream.flush()
+
+def isatty(stream) -> bool:
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+# The sink of reporters and embedders that do not bring their own.
+stdout = Output()
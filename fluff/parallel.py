@@ -0,0 +1,102 @@
+import os
+import sys
+
+from .token import Token
+from .numeric import number_types
+from .runtime_error import RuntimeError
+from .fluff_array import literal, describe
+from .files import FileLines
+
+# Runs the iterations of a 'parallel' expression on a pool of worker
+# processes. Workers are forked, so they start with a copy of the running
+# program: the body, the environment it closes over and every function it
+# may call are inherited rather than pickled, and only chunk numbers go out
+# and reduced numbers come back. The Resolver has already rejected bodies
+# whose effects would be lost in a copy (assigning outer variables,
+# calling print or open).
+
+# Processes to run a parallel expression on; 1 runs it in this process.
+workers = os.cpu_count() or 1
+
+# The iterations are split into this many chunks whatever the number of
+# workers, and every chunk is reduced on its own before the results are
+# combined, so a sum of doubles adds up in the same order on any machine.
+CHUNKS = 64
+
+# The expression being run, for the forked workers: (reduction, values,
+# body, bounds).
+job       = None
+in_worker = False
+
+def chunk_bounds(count: int):
+    bounds = [(count * index // CHUNKS, count * (index + 1) // CHUNKS) for index in range(CHUNKS)]
+    return [(start, end) for start, end in bounds if start < end]
+
+def reduce_chunk(reduction: Token, results: list):
+    for value in results:
+        if type(value) not in number_types:
+            raise RuntimeError(reduction, f"parallel {reduction.lexeme} needs numbers, had {describe(value)}")
+
+    if reduction.lexeme == "sum":
+        return sum(results)
+    elif reduction.lexeme == "min":
+        return min(results, default=None)
+    elif reduction.lexeme == "max":
+        return max(results, default=None)
+    return results
+
+def combine(reduction: Token, parts: list):
+    if reduction.lexeme == "sum":
+        return sum(parts)
+    elif reduction.lexeme == "collect":
+        return literal(reduction, [value for part in parts for value in part])
+
+    # Empty chunks have no minimum or maximum.
+    parts = [part for part in parts if part is not None]
+    if reduction.lexeme == "min":
+        return min(parts, default=None)
+    return max(parts, default=None)
+
+def run_chunk(index: int):
+    global in_worker
+    # A parallel expression inside the body runs serially in the worker.
+    in_worker = True
+    reduction, values, body, bounds = job
+    start, end = bounds[index]
+    return reduce_chunk(reduction, [body(value) for value in values[start:end]])
+
+def forkable() -> bool:
+    import multiprocessing
+    return "fork" in multiprocessing.get_all_start_methods()
+
+# Calls body on every value (a range, list or array.array) and combines the
+# results with the reduction named by the token.
+def run_parallel(reduction: Token, values, body):
+    global job
+    # The lines of a file are only counted by reading all of them.
+    if type(values) is FileLines:
+        raise RuntimeError(reduction, "parallel cannot split the lines of a file, loop over them with for")
+    bounds = chunk_bounds(len(values))
+
+    if workers <= 1 or in_worker or len(bounds) <= 1 or not forkable():
+        return combine(reduction, [reduce_chunk(reduction, [body(value) for value in values[start:end]]) for start, end in bounds])
+
+    # Imported here so programs without a parallel expression do not pay
+    # for loading them.
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Output still buffered when the workers fork would be written again
+    # by each of them.
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    # A pool is started for every expression: workers only see the state
+    # the program was in when they forked.
+    job = (reduction, values, body, bounds)
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(bounds)), mp_context=multiprocessing.get_context("fork")) as pool:
+            parts = list(pool.map(run_chunk, range(len(bounds))))
+    finally:
+        job = None
+    return combine(reduction, parts)
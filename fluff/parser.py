@@ -1,15 +1,73 @@
-from .token import Token, TokenType, sync_tts, variable_tts, binary_ops
+from .token import Token, TokenType, sync_tts, variable_tts, numeric_types, binary_ops
 from .expr import *
+from .fluff_array import ArrayType
 from .stmt import *
-from typing import List
+from typing import List, Iterable
 
 tt = TokenType
 
+# Binding powers, lowest first.
+NONE, ASSIGNMENT, OR, AND, EQUALITY, COMPARISON, TERM, FACTOR, UNARY, CALL = range(10)
+
+infix_precedence = {
+    tt.EQUAL: ASSIGNMENT,
+    tt.ASSIGN: ASSIGNMENT,
+    tt.MINUS_EQUAL: ASSIGNMENT,
+    tt.PLUS_EQUAL: ASSIGNMENT,
+    tt.SLASH_EQUAL: ASSIGNMENT,
+    tt.STAR_EQUAL: ASSIGNMENT,
+    tt.PERCENT_EQUAL: ASSIGNMENT,
+    tt.OR: OR,
+    tt.AND: AND,
+    tt.NOT_EQUAL: EQUALITY,
+    tt.EQUAL_EQUAL: EQUALITY,
+    tt.GREATER: COMPARISON,
+    tt.GREATER_EQUAL: COMPARISON,
+    tt.LESS: COMPARISON,
+    tt.LESS_EQUAL: COMPARISON,
+    tt.MINUS: TERM,
+    tt.PLUS: TERM,
+    tt.SLASH: FACTOR,
+    tt.STAR: FACTOR,
+    tt.LEFT_PAREN: CALL,
+    tt.LEFT_SQ_BRACKET: CALL,
+}
+
+binary_tts  = frozenset([tt.NOT_EQUAL, tt.EQUAL_EQUAL, tt.GREATER, tt.GREATER_EQUAL, tt.LESS, tt.LESS_EQUAL,
+                         tt.MINUS, tt.PLUS, tt.SLASH, tt.STAR])
+logical_tts = frozenset([tt.OR, tt.AND])
+unary_tts   = frozenset([tt.NOT, tt.MINUS])
+literal_tts = frozenset([tt.NUMBER, tt.STRING])
+comma_tts   = frozenset([tt.COMMA])
+# Types a function can take or return; the rest are not stored by any
+# engine yet.
+signature_tts = numeric_types | {tt.STR, tt.BOOL}
+
+# The ways 'parallel' can combine the values of its iterations.
+reductions = frozenset(["sum", "min", "max", "collect"])
+
+# Results kept per function by a bare '@memo'.
+default_memo_size = 1024
+
+constant_values = {
+    tt.FALSE: False,
+    tt.TRUE: True,
+    tt.NIL: None,
+}
+
 class Parser:
-    def __init__(self, fluff_instance, tokens: List[Token]):
-        self.tokens  = tokens
+    def __init__(self, fluff_instance, tokens: Iterable[Token]):
+        # Tokens can also come from a generator such as
+        # Scanner.iterTokens(), in which case they are pulled on demand.
+        if isinstance(tokens, list):
+            self.tokens  = tokens
+            self.pending = None
+        else:
+            self.pending = iter(tokens)
+            self.tokens  = [next(self.pending)]
         self.fluff_instance = fluff_instance
         self.current = 0
+        self.function_depth = 0
     
     def parse(self) -> List[Stmt]:
         statements = []
@@ -21,25 +79,96 @@ class Parser:
         try:
             if self.match(variable_tts):
                 return self.varDeclaration()
+            elif self.match([tt.AT]):
+                return self.annotatedDeclaration()
+            elif self.match([tt.FN]):
+                return self.function()
             else:
                 return self.statement()
         except Exception:
             self.synchronize()
 
     def varDeclaration(self):
-        var_type = self.previous()
+        token = self.previous()
+        var_type = self.arrayType(token)
         name = self.consume(tt.IDENTIFIER, "Expected variable name")
         initializer = None
 
         if self.match([tt.EQUAL]):
             initializer = self.expression()
         
-        return VarStmt(name, var_type, initializer)
+        return VarStmt(name, var_type, initializer, token.line)
+
+    # 'double[]' after a type name declares an array of that type.
+    def arrayType(self, token: Token):
+        if not self.match([tt.LEFT_SQ_BRACKET]):
+            return token
+        self.consume(tt.RIGHT_SQ_BRACKET, "Expected ']' after '['")
+        if token.type not in numeric_types:
+            self.error(token, "Arrays can only hold numbers")
+        return ArrayType(token.type)
     
 
+    def annotatedDeclaration(self):
+        annotation = self.consume(tt.IDENTIFIER, "Expected annotation name after '@'")
+        if annotation.lexeme != "memo":
+            raise self.error(annotation, f"Unknown annotation '{annotation.lexeme}'")
+
+        size = default_memo_size
+        if self.match([tt.LEFT_PAREN]):
+            literal = self.consume(tt.NUMBER, "Expected cache size")
+            if literal.literal != int(literal.literal) or literal.literal < 1:
+                raise self.error(literal, "Cache size must be a positive integer")
+            size = int(literal.literal)
+            self.consume(tt.RIGHT_PAREN, "Expected ')' after cache size")
+
+        self.consume(tt.FN, "Expected function declaration after annotation")
+        return self.function(memo=size)
+
+    def function(self, memo=None):
+        line = self.previous().line
+        return_type = self.signatureType()
+        name = self.consume(tt.IDENTIFIER, "Expected function name")
+        self.consume(tt.LEFT_PAREN, "Expected '(' after function name")
+
+        params = []
+        if not self.check(tt.RIGHT_PAREN):
+            while True:
+                if len(params) >= 255:
+                    self.error(self.peek(), "Cannot have more than 255 parameters")
+                param_type = self.signatureType()
+                param_name = self.consume(tt.IDENTIFIER, "Expected parameter name")
+                if any(param.name.lexeme == param_name.lexeme for param in params):
+                    self.error(param_name, "Duplicate parameter name")
+                params.append(VarStmt(param_name, param_type, None, param_name.line))
+                if not self.match(comma_tts):
+                    break
+
+        self.consume(tt.RIGHT_PAREN, "Expected ')' after parameters")
+        self.consume(tt.COLON, "Expected ':' after function signature")
+
+        self.function_depth += 1
+        try:
+            body = self.statement()
+        finally:
+            self.function_depth -= 1
+
+        # Parameters and the body's locals share one scope.
+        statements = body.statements if type(body) == BlockStmt else [body]
+        result = VarStmt(name, return_type, None, name.line) if return_type is not None else None
+        return FunctionStmt(name, params, result, statements, memo, line)
+
+    def signatureType(self):
+        if not self.match(variable_tts):
+            return None
+        if self.previous().type not in signature_tts:
+            self.error(self.previous(), f"Functions cannot take or return '{self.previous().lexeme}' values")
+        return self.arrayType(self.previous())
+
     def statement(self):
         if self.match([tt.LEFT_BRACE]):
-            return BlockStmt(self.block())
+            line = self.previous().line
+            return BlockStmt(self.block(), line)
         
         elif self.match([tt.IF]):
             return self.ifStatement()
@@ -50,27 +179,49 @@ class Parser:
         elif self.match([tt.FOR]):
             return self.forStatement()
 
+        elif self.match([tt.RETURN]):
+            return self.returnStatement()
+
         return self.expressionStatement()
     
     def expressionStatement(self):
+        line = self.peek().line
         expr = self.expression()
-        return ExpressionStmt(expr)
+        return ExpressionStmt(expr, line)
     
-    def forStatement(self):
-        expr = self.expression();
-        self.consume(tt.COLON, "Expected ':' after for expression."); 
-        body = self.statement();
+    def returnStatement(self):
+        keyword = self.previous()
+        if self.function_depth == 0:
+            self.error(keyword, "Cannot return from top-level code")
+
+        # Statements are not terminated, so a value has to start on the
+        # same line as 'return'.
+        value = None
+        if not self.check(tt.RIGHT_BRACE) and not self.isAtEnd() and self.peek().line == keyword.line:
+            value = self.expression()
+
+        return ReturnStmt(keyword, value, keyword.line)
 
-        return ForStmt(expr, body)
+    def forStatement(self):
+        keyword  = self.previous()
+        name     = self.consume(tt.IDENTIFIER, "Expected loop variable name after 'for'")
+        self.consume(tt.IN, "Expected 'in' after loop variable")
+        iterable = self.iterable()
+        self.consume(tt.COLON, "Expected ':' after for iterable")
+        body     = self.statement()
+
+        return ForStmt(keyword, name, iterable, body, keyword.line)
     
     def whileStatement(self):
+        line = self.previous().line
         condition = self.expression();
         self.consume(tt.COLON, "Expected ':' after while condition."); 
         body = self.statement();
 
-        return WhileStmt(condition, body)
+        return WhileStmt(condition, body, line)
     
     def ifStatement(self):
+        line = self.previous().line
         condition = self.expression();
         self.consume(tt.COLON, "Expect ':' after if condition."); 
         thenBranch = self.statement();
@@ -79,7 +230,7 @@ class Parser:
         if self.match([tt.ELSE]):
             elseBranch = self.statement() 
         
-        return IfStmt(condition, thenBranch, elseBranch)
+        return IfStmt(condition, thenBranch, elseBranch, line)
 
 
     def block(self):
@@ -92,11 +243,10 @@ class Parser:
 
         return statements
 
-    def match(self, token_types: List[TokenType]) -> bool:
-        for token_type in token_types:
-            if self.check(token_type):
-                self.advance()
-                return True
+    def match(self, token_types) -> bool:
+        if not self.isAtEnd() and self.peek().type in token_types:
+            self.advance()
+            return True
         return False
     
     def check(self, token_type: TokenType) -> bool:
@@ -108,6 +258,8 @@ class Parser:
     def advance(self) -> Token:
         if not self.isAtEnd():
             self.current += 1
+            if self.current == len(self.tokens):
+                self.tokens.append(next(self.pending))
         return self.previous()
     
     def isAtEnd(self) -> bool:
@@ -120,127 +272,109 @@ class Parser:
         return self.tokens[self.current - 1]
 
     def expression(self) -> Expr:
-        return self.assignment()
-
-    def assignment(self) -> Expr:
-        expr = self.update_in_place()
-
-        if self.match([tt.EQUAL]):
-            equals = self.previous()
-            value  = self.assignment()
-
-            if type(expr) == VarExpr:
-                name = expr.name
-                return AssignExpr(name, value)
-            else:
-                self.error(equals, "Invalid assignment target")
-        
-        elif self.match([tt.ASSIGN]):
-            equals = self.previous()
-            value  = self.assignment()
-
-            if type(expr) == VarExpr:
-                name = expr.name
-                return AssignExpr(name, value, assign=True)
-            else:
-                self.error(equals, "Invalid assignment target")
-        
-        return expr
-    
-    def update_in_place(self) -> Expr:
-        expr = self.or_branch()
-
-        if self.match([tt.MINUS_EQUAL, tt.PLUS_EQUAL, tt.SLASH_EQUAL, tt.STAR_EQUAL, tt.PERCENT_EQUAL]):
-            equals = self.previous()
-            value  = self.assignment()
+        return self.parsePrecedence(ASSIGNMENT)
 
-            if type(expr) == VarExpr:
-                name = expr.name
-                return AssignUpdateExpr(name, value, equals)
-            else:
-                self.error(equals, "Invalid assignment target")
-
-        return expr
-    
-    def or_branch(self):
-        expr = self.and_branch()
-
-        while self.match([tt.OR]):
-            operator = self.previous()
-            right    = self.and_branch()
-            expr     = LogicalExpr(expr, operator, right)
-        
-        return expr
-    
-    def and_branch(self):
-        expr = self.equality()
-
-        while self.match([tt.AND]):
-            operator = self.previous()
-            right    = self.equality()
-            expr     = LogicalExpr(expr, operator, right)
-        
-        return expr
-
-    def equality(self) -> Expr:
-        expr = self.comparison()
-
-        while self.match([tt.NOT_EQUAL, tt.EQUAL_EQUAL]):
-            operator = self.previous()
-            right = self.comparison()
-            expr = BinaryExpr(expr, operator, right)
-        
-        return expr
-    
-    def comparison(self) -> Expr:
-        expr = self.addition()
-
-        while self.match([tt.GREATER, tt.GREATER_EQUAL, tt.LESS, tt.LESS_EQUAL]):
-            operator = self.previous()
-            right = self.addition()
-            expr = BinaryExpr(expr, operator, right)
-
-        return expr
-    
-    def addition(self) -> Expr:
-        expr = self.multiplication()
+    def parsePrecedence(self, precedence: int) -> Expr:
+        expr = self.prefix()
 
-        while self.match([tt.MINUS, tt.PLUS]):
-            operator = self.previous()
-            right = self.multiplication()
-            expr = BinaryExpr(expr, operator, right)
+        while True:
+            operator = self.peek()
+            binding  = infix_precedence.get(operator.type, NONE)
+            if binding < precedence:
+                return expr
+            self.advance()
+            expr = self.infix(expr, operator, binding)
 
-        return expr
-    
-    def multiplication(self) -> Expr:
-        expr = self.unary()
+    def prefix(self) -> Expr:
+        token = self.peek()
+        token_type = token.type
 
-        while self.match([tt.SLASH, tt.STAR]):
-            operator = self.previous()
-            right = self.unary()
-            expr = BinaryExpr(expr, operator, right)
+        if token_type in literal_tts:
+            self.advance()
+            return LiteralExpr(token.literal)
+        elif token_type == tt.IDENTIFIER:
+            self.advance()
+            return VarExpr(token)
+        elif token_type in unary_tts:
+            self.advance()
+            return UnaryExpr(token, self.parsePrecedence(UNARY))
+        elif token_type == tt.LEFT_PAREN:
+            self.advance()
+            expr = self.expression()
+            self.consume(tt.RIGHT_PAREN, "Expected ')' after expression")
+            return GroupingExpr(expr)
+        elif token_type in constant_values:
+            self.advance()
+            return LiteralExpr(constant_values[token_type])
+        elif token_type == tt.LEFT_SQ_BRACKET:
+            self.advance()
+            return ArrayExpr(token, self.finishList(tt.RIGHT_SQ_BRACKET, "Expected ']' after array elements"))
+        elif token_type == tt.PARALLEL:
+            self.advance()
+            return self.parallel(token)
 
-        return expr
-    
-    def unary(self):
-        if self.match([tt.NOT, tt.MINUS]):
-            operator = self.previous()
-            right = self.unary()
-            return UnaryExpr(operator, right)
-        
-        return self.call()
-    
-    def call(self):
-        expr = self.primary()
+        elif self.match(binary_ops):
+            self.advance()
+            raise self.error(self.tokens[self.current - 2], "Expected left-hand operand")
 
-        while True:
-            if self.match([tt.LEFT_PAREN]):
-                expr = self.finishCall(expr)
-            else:
-                break
+        else:
+            raise self.error(token, "Expected expression")
+
+    def infix(self, left: Expr, operator: Token, binding: int) -> Expr:
+        token_type = operator.type
+
+        if token_type in binary_tts:
+            return BinaryExpr(left, operator, self.parsePrecedence(binding + 1))
+        elif token_type in logical_tts:
+            return LogicalExpr(left, operator, self.parsePrecedence(binding + 1))
+        elif token_type == tt.LEFT_PAREN:
+            return self.finishCall(left)
+        elif token_type == tt.LEFT_SQ_BRACKET:
+            index = self.expression()
+            self.consume(tt.RIGHT_SQ_BRACKET, "Expected ']' after index")
+            return IndexExpr(left, operator, index)
+
+        # Assignments are right-associative, so the value is parsed at
+        # the same binding power.
+        value = self.parsePrecedence(ASSIGNMENT)
+
+        if type(left) == IndexExpr and token_type == tt.EQUAL:
+            return SetIndexExpr(left.object, left.bracket, left.index, value)
+        elif type(left) != VarExpr:
+            self.error(operator, "Invalid assignment target")
+            return left
+        elif token_type == tt.EQUAL:
+            return AssignExpr(left.name, value)
+        elif token_type == tt.ASSIGN:
+            return AssignExpr(left.name, value, assign=True)
+        else:
+            return AssignUpdateExpr(left.name, value, operator)
+
+    def parallel(self, keyword: Token):
+        reduction = self.consume(tt.IDENTIFIER, "Expected sum, min, max or collect after 'parallel'")
+        if reduction.lexeme not in reductions:
+            raise self.error(reduction, f"Unknown reduction '{reduction.lexeme}', expected sum, min, max or collect")
+        self.consume(tt.FOR, "Expected 'for' after reduction")
+        name = self.consume(tt.IDENTIFIER, "Expected loop variable name")
+        self.consume(tt.IN, "Expected 'in' after loop variable")
+        iterable = self.iterable()
+        self.consume(tt.COLON, "Expected ':' after parallel for iterable")
+
+        # The body is an expression, so it extends as far as an
+        # assignment's value would.
+        body = self.parsePrecedence(ASSIGNMENT)
+        return ParallelExpr(keyword, reduction, name, iterable, body)
+
+    def iterable(self) -> Expr:
+        start = self.expression()
+        if not self.match([tt.DOT_DOT]):
+            return start
+
+        operator = self.previous()
+        end      = self.expression()
+        step     = self.expression() if self.match([tt.DOT_DOT]) else None
+        return RangeExpr(start, operator, end, step)
 
-        return expr
-    
     def finishCall(self, callee: Expr):
         arguments = []
 
@@ -249,37 +383,25 @@ class Parser:
                 if len(arguments) >= 255:
                     self.error(self.peek(), "Cannot have more than 255 arguments")
                 arguments.append(self.expression())
-                if not self.match([tt.COMMA]):
+                if not self.match(comma_tts):
                     break
         
         paren = self.consume(tt.RIGHT_PAREN, "Expected ')' after arguments")
 
         return FunctionExpr(callee, paren, arguments)
-             
-    
-    def primary(self):
-        if self.match([tt.FALSE]):
-            return LiteralExpr(False)
-        elif self.match([tt.TRUE]):
-            return LiteralExpr(True)
-        elif self.match([tt.NIL]):
-            return LiteralExpr(None)
-        elif self.match([tt.NUMBER, tt.STRING]):
-            return LiteralExpr(self.previous().literal)
-        elif self.match([tt.IDENTIFIER]):
-            return VarExpr(self.previous())
-        elif self.match([tt.LEFT_PAREN]):
-            expr = self.expression()
-            self.consume(tt.RIGHT_PAREN, "Expected ')' after expression")
-            return GroupingExpr(expr)
-        
-        elif self.match(binary_ops):
-            self.advance()
-            raise self.error(self.tokens[self.current - 2], "Expected left-hand operand")
-        
-        else:
-            raise self.error(self.peek(), "Expected expression")
-        
+
+    def finishList(self, closing: TokenType, message: str):
+        elements = []
+
+        if not self.check(closing):
+            while True:
+                elements.append(self.expression())
+                if not self.match(comma_tts):
+                    break
+
+        self.consume(closing, message)
+        return elements
+
     def consume(self, token_type: TokenType, message: str) -> Token:
         if self.check(token_type):
             return self.advance()
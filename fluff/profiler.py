@@ -0,0 +1,100 @@
+from .expr import *
+from .stmt import *
+from .interpreter import Interpreter
+from .vm import VM
+from collections import Counter
+from typing import List
+import signal
+
+# Python frames that correspond to a Fluff-level frame.
+execute_code = Interpreter.execute.__code__
+call_code    = Interpreter.visitFunctionExpr.__code__
+vm_code      = VM.run.__code__
+
+# Samples the Fluff stack on a CPU-time timer (SIGPROF). Nothing is
+# recorded between samples, so the cost is one walk over the Python frame
+# stack per interval. Only the tree and vm engines keep enough state in
+# their frames to be sampled, and the vm only reports lines.
+class Profiler:
+    def __init__(self, filename: str = "<script>", source: str = "", interval: float = 0.005):
+        self.filename = filename
+        self.source   = source.splitlines()
+        self.interval = interval
+        self.samples  = Counter()
+        self.previous = None
+
+    def start(self):
+        self.previous = signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self.previous or signal.SIG_DFL)
+
+    def sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            if code is execute_code:
+                stack.append(frame.f_locals['stmt'])
+            elif code is call_code:
+                stack.append(frame.f_locals['expr'])
+            elif code is vm_code:
+                f_locals = frame.f_locals
+                stack.append(f_locals['chunk'].lines[f_locals['ip']])
+            frame = frame.f_back
+
+        if stack:
+            stack.reverse()
+            self.samples[tuple(stack)] += 1
+
+    def line(self, entry) -> int:
+        if type(entry) == int:
+            return entry
+        elif isinstance(entry, FunctionExpr):
+            return entry.paren.line
+        return entry.line
+
+    def describe(self, entry) -> str:
+        if type(entry) == int:
+            what = "line"
+        elif isinstance(entry, FunctionExpr):
+            callee = entry.callee.name.lexeme if type(entry.callee) == VarExpr else "<expr>"
+            what = f"{callee}()"
+        elif isinstance(entry, VarStmt):
+            what = f"var {entry.name.lexeme}"
+        elif isinstance(entry, ExpressionStmt):
+            expr = entry.expr
+            if type(expr) == AssignUpdateExpr:
+                what = f"{expr.name.lexeme} {expr.operator.lexeme}"
+            elif type(expr) == AssignExpr:
+                what = f"{expr.name.lexeme} {':=' if expr.assign else '='}"
+            elif type(expr) == FunctionExpr:
+                what = "call"
+            else:
+                what = "expr"
+        else:
+            what = type(entry).__name__[:-len("Stmt")].lower()
+        return f"{what} ({self.filename}:{self.line(entry)})"
+
+    def collapsed(self) -> List[str]:
+        stacks = Counter()
+        for stack, count in self.samples.items():
+            stacks[";".join(self.describe(entry) for entry in stack)] += count
+        return [f"{stack} {count}" for stack, count in sorted(stacks.items())]
+
+    def hotLines(self, top: int = 10) -> str:
+        own       = Counter()
+        inclusive = Counter()
+        for stack, count in self.samples.items():
+            own[self.line(stack[-1])] += count
+            for line in set(self.line(entry) for entry in stack):
+                inclusive[line] += count
+
+        total = sum(self.samples.values())
+        rows  = [f"{'line':>6} {'self':>7} {'self%':>6} {'total':>7} {'total%':>7}  source"]
+        for line, count in own.most_common(top):
+            text = self.source[line - 1].strip() if 0 < line <= len(self.source) else ""
+            rows.append(f"{line:>6} {count:>7} {count / total:>6.1%} {inclusive[line]:>7} {inclusive[line] / total:>7.1%}  {text}")
+        rows.append(f"{total} samples, {self.interval * 1000:g} ms interval")
+        return "\n".join(rows)
@@ -0,0 +1,152 @@
+import io
+import sys
+from types import MappingProxyType
+
+from .token import Token, TokenType as tt, tt_to_str, numeric_types
+from .stmt import VarStmt
+from .fluff_array import ArrayType
+from .fluff_callable import FluffCallable
+from .environment import Environment, UNDEFINED
+from .runtime_error import RuntimeError
+from .numeric import number_types
+from .rope import flatten
+from .compiler import Compiler
+from .resolver import Resolver
+from .type_checker import TypeChecker
+from .output import Output
+from .fluff_interpreter import FluffInterpreter, engines, recursion_limit
+from decimal import Decimal
+
+# Embedding API: a program is scanned, parsed and resolved once by
+# compile() and then run as often as needed, each run in globals of its
+# own seeded with the values given for its bindings:
+#
+#     rule = fluff.compile(source, bindings={"amount": "double", "country": "str"})
+#     rule.run(bindings={"amount": 12.5, "country": "NL"})["approved"]
+#
+# Bindings are declared with a type when compiling, so the resolver gives
+# them slots and --typecheck knows them, and their values are checked and
+# converted like those of a declared variable when running.
+#
+# A run keeps its variables in globals of its own, so one Program can be
+# shared by threads. Runs do write to the Program in one place: the tree
+# engine stores the specialized code of hot nodes (quick and warmup) on
+# the shared tree. That code checks what it assumed on every call and
+# falls back when it does not hold, so whichever run stored it, it is
+# right for all of them.
+
+# Engines whose compiled form does not depend on the globals it runs in.
+prepared_engines = ["tree", "vm"]
+
+binding_types = numeric_types | {tt.STR, tt.BOOL}
+
+class CompileError(Exception):
+    pass
+
+# The type named by text ('int', 'str', 'double[]', ...), as a declaration
+# holds it.
+def parse_type(text: str):
+    array      = text.endswith("[]")
+    token_type = tt_to_str.get(text[:-2] if array else text)
+    if token_type not in binding_types or array and token_type not in numeric_types:
+        raise ValueError(f"Bindings cannot have type '{text}'")
+    if array:
+        return ArrayType(token_type)
+    return Token(token_type, text, None, 0)
+
+class Program:
+    __slots__ = ('engine', 'numeric', 'checked', 'code', 'global_slots', 'declarations')
+
+    def __init__(self, engine: str, numeric: str, checked: bool, code, global_slots: dict, declarations: dict):
+        self.engine       = engine
+        self.numeric      = numeric
+        self.checked      = checked
+        self.code         = code
+        self.global_slots = MappingProxyType(global_slots)
+        self.declarations = MappingProxyType(declarations)
+
+    # Runs the program with bindings (name to value; every binding declared
+    # at compile() needs one) and returns its global variables when it
+    # ends. What it prints goes to output. A runtime error is raised as a
+    # fluff.RuntimeError.
+    def run(self, bindings: dict = None, output: Output = None) -> dict:
+        bindings = bindings if bindings is not None else dict()
+        for name in bindings:
+            if name not in self.declarations:
+                raise ValueError(f"'{name}' is not a binding of this program")
+
+        fluff_i = FluffInterpreter(output)
+        engine  = engines[self.engine](fluff_i, self.numeric, self.checked)
+        # The builtins got the same slots when compiling.
+        engine.global_slots = self.global_slots
+        environment = engine.globals
+        environment.grow(len(self.global_slots))
+
+        for name, declaration in self.declarations.items():
+            if name not in bindings:
+                raise ValueError(f"No value given for binding '{name}'")
+            value = bindings[name]
+            if value is None:
+                raise RuntimeError(declaration.name, f"Type error: expected {environment.getFluffNameFromToken(declaration.var_type)}, had nil")
+            if self.numeric == "decimal" and type(value) in number_types:
+                value = Decimal(str(value))
+            # Checked even in unchecked environments: the type checker took
+            # the declared type on trust, as it does for arguments.
+            Environment.define(environment, self.global_slots[name], declaration, value)
+
+        try:
+            if self.engine == "vm":
+                engine.run(self.code)
+            else:
+                for stmt in self.code:
+                    engine.execute(stmt)
+        finally:
+            engine.output.flush()
+            engine.files.close()
+
+        values = environment.values
+        return {name: flatten(values[slot]) for name, slot in self.global_slots.items()
+                if values[slot] is not UNDEFINED and not isinstance(values[slot], FluffCallable)}
+
+# Compiles source (str or bytes) for the engine given, 'tree' or 'vm'.
+# bindings maps the names of the values each run passes in to their type
+# names. Syntax errors, and type errors with typecheck, raise a
+# CompileError listing them.
+def compile(source, engine: str = "tree", numeric: str = "native", optimize: bool = False, typecheck: bool = False, bindings: dict = None) -> Program:
+    if engine not in prepared_engines:
+        raise ValueError(f"compile() supports the {' and '.join(prepared_engines)} engines, not '{engine}'")
+    if type(source) is str:
+        source = source.encode('utf-8')
+
+    declarations = dict()
+    for name, type_name in (bindings or dict()).items():
+        declarations[name] = VarStmt(Token(tt.IDENTIFIER, name, None, 0), parse_type(type_name), None)
+
+    errors  = io.StringIO()
+    fluff_i = FluffInterpreter(Output(errors, "exit"))
+    fluff_i.hadError = False
+    fluff_i.hadRuntimeError = False
+
+    statements = fluff_i.parse(source, numeric, optimize)
+    if statements is not None and typecheck:
+        checker = TypeChecker(fluff_i)
+        for name, declaration in declarations.items():
+            checker.defineGlobal(name, declaration.var_type)
+        checker.check(statements)
+
+    if statements is not None and not fluff_i.hadError:
+        interpreter = engines[engine](fluff_i, numeric, checked=not typecheck)
+        for name in declarations:
+            if name in interpreter.global_slots:
+                raise ValueError(f"Binding '{name}' would hide the builtin of that name")
+            interpreter.global_slots[name] = len(interpreter.global_slots)
+        Resolver(fluff_i, interpreter).resolve(statements)
+
+    fluff_i.output.flush()
+    if fluff_i.hadError:
+        raise CompileError(errors.getvalue().rstrip("\n"))
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), recursion_limit))
+
+    code = Compiler().compile(statements) if engine == "vm" else tuple(statements)
+    return Program(engine, numeric, not typecheck, code, dict(interpreter.global_slots), declarations)
@@ -0,0 +1,41 @@
+from .token import Token
+from .runtime_error import RuntimeError
+from .fluff_array import FluffArray, describe
+from .files import FileLines
+from decimal import Decimal
+
+# The value of 'start..end..step'. Ranges are only iterated over, never
+# stored, so they stay Python ranges; with --numeric=decimal the bounds
+# are integral Decimals and so are the values.
+def make_range(operator: Token, start, end, step):
+    bounds  = []
+    decimal = False
+    for value in [start, end, step]:
+        if type(value) is Decimal and value == value.to_integral_value():
+            decimal = True
+            value   = int(value)
+        if type(value) is not int:
+            raise RuntimeError(operator, f"Range bounds must be ints, had {describe(value)}")
+        bounds.append(value)
+
+    if bounds[2] == 0:
+        raise RuntimeError(operator, "Range step cannot be zero")
+    if decimal:
+        return [Decimal(value) for value in range(*bounds)]
+    return range(*bounds)
+
+# The values a loop over value takes, as a sequence that can be sliced or,
+# for the lines of a file, read once in order.
+def iterate(token: Token, value):
+    if type(value) is range or type(value) is list or type(value) is FileLines:
+        return value
+    if type(value) is FluffArray:
+        return value.values
+    raise RuntimeError(token, f"Can only iterate over ranges, arrays and lines, had {describe(value)}")
+
+# A value of the type all the values of a loop have, so the engines can
+# record the type of the loop variable once; None if there are none.
+def sample(values):
+    if type(values) is FileLines:
+        return ""
+    return values[0] if len(values) > 0 else None
@@ -0,0 +1,326 @@
+from .expr import *
+from .stmt import *
+from .token import Token, TokenType as tt
+from typing import List
+
+def declares_locally(node) -> bool:
+    # Whether running node can declare a name in the scope it runs in.
+    # Nested blocks declare into scopes of their own.
+    if type(node) in [VarStmt, FunctionStmt] or type(node) == AssignExpr and node.assign:
+        return True
+    if type(node) == BlockStmt:
+        return False
+    if type(node) in [ParallelExpr, ForStmt]:
+        return declares_locally(node.iterable)
+    if isinstance(node, (Expr, Stmt)):
+        return any(declares_locally(getattr(node, field)) for field in type(node).__slots__)
+    if type(node) == list:
+        return any(declares_locally(child) for child in node)
+    return False
+
+def walk(node):
+    # Every Expr and Stmt in the tree under node, node included.
+    if isinstance(node, (Expr, Stmt)):
+        yield node
+        for field in type(node).__slots__:
+            yield from walk(getattr(node, field))
+    elif type(node) == list:
+        for child in node:
+            yield from walk(child)
+
+def self_append(stmt: ExpressionStmt):
+    # The assignment of a statement 'name = name + x' in which evaluating x
+    # cannot change name, or None.
+    expr = stmt.expr
+    if type(expr) != AssignExpr or expr.assign or type(expr.value) != BinaryExpr:
+        return None
+    value = expr.value
+    if value.operator.type != tt.PLUS or type(value.left) != VarExpr or value.left.name.lexeme != expr.name.lexeme:
+        return None
+    if any(type(node) in [FunctionExpr, AssignExpr, AssignUpdateExpr, SetIndexExpr] for node in walk(value.right)):
+        return None
+    return expr
+
+def string_appends(statements: List[Stmt]) -> set:
+    # Names that '+=' or 'name = name + x' may grow as strings, i.e. the
+    # variables that can hold a Rope. A name none of whose declarations can
+    # hold a str is left out, so counters keep their plain reads; names
+    # never declared may be globals defined from Python.
+    targets = set()
+    strings = dict()
+    for node in walk(statements):
+        if type(node) == AssignUpdateExpr and node.operator.type == tt.PLUS_EQUAL:
+            targets.add(node.name.lexeme)
+        elif type(node) == ExpressionStmt and self_append(node) is not None:
+            targets.add(node.expr.name.lexeme)
+        elif type(node) == VarStmt:
+            name = node.name.lexeme
+            strings[name] = strings.get(name, False) or node.var_type in [tt.STR, "dynamic"]
+        elif type(node) == AssignExpr and node.assign:
+            # ':=' fixes the type of its first value.
+            name = node.name.lexeme
+            strings[name] = strings.get(name, False) or type(node.value) != LiteralExpr or type(node.value.value) == str
+    return {name for name in targets if strings.get(name, True)}
+
+# What running a 'parallel' body or a 'fn' does outside of itself: the
+# outer variables it assigns and the names it calls. Scopes from depth on
+# are its own.
+class Effects:
+    def __init__(self, depth: int):
+        self.depth  = depth
+        # Name tokens; None for a store into an array that is not named.
+        self.writes = []
+        # Callee name tokens; None for a callee that is not a plain name.
+        self.calls  = []
+
+class Resolver(Visitor, VisitorStmt):
+    def __init__(self, fluff_instance, interpreter):
+        self.fluff_instance = fluff_instance
+        self.interpreter = interpreter
+        self.scopes = [interpreter.global_slots]
+        # Functions resolved so far; a block that declares one has frames
+        # that may outlive it.
+        self.functions = 0
+        # Names of the variables whose reads flatten a Rope; found when the
+        # whole program is first resolved.
+        self.ropes = None
+        # Effects of the parallel bodies and functions being resolved,
+        # innermost last; of every parallel expression; and of the 'fn'
+        # declarations by name. Parallel bodies are checked once the whole
+        # program is resolved, when every function they may call is known.
+        self.effects   = []
+        self.parallels = []
+        self.declared  = dict()
+        self.builtins  = set(interpreter.global_slots)
+
+    def resolve(self, statements: List[Stmt]):
+        program = self.ropes is None
+        if program:
+            self.ropes = string_appends(statements)
+        for stmt in statements:
+            self.resolveStmt(stmt)
+
+        if program:
+            for expr, effects in self.parallels:
+                problem = self.sideEffect(effects, set())
+                if problem is not None:
+                    self.fluff_instance.error_t(expr.keyword, f"Parallel body {problem}")
+
+    def resolveStmt(self, stmt: Stmt):
+        stmt.accept(self)
+
+    def resolveExpr(self, expr: Expr):
+        expr.accept(self)
+
+    def declare(self, name: str) -> int:
+        scope = self.scopes[-1]
+        if name not in scope:
+            scope[name] = len(scope)
+        return scope[name]
+
+    def lookup(self, name: str):
+        for depth in range(len(self.scopes) - 1, -1, -1):
+            if name in self.scopes[depth]:
+                return depth, self.scopes[depth][name]
+
+        # Unknown names get a global slot that is never defined, so reading
+        # them still fails at runtime with "Undefined variable".
+        scope = self.scopes[0]
+        scope[name] = len(scope)
+        return 0, scope[name]
+
+    def wrote(self, name: Token, depth: int):
+        for effects in self.effects:
+            if depth < effects.depth:
+                effects.writes.append(name)
+
+    def sideEffect(self, effects: Effects, seen: set):
+        # What effects, or a function it calls, does that a worker process
+        # would do to its own copy of the program only; None if nothing.
+        for name in effects.writes:
+            if name is None:
+                return "stores into an array that may be shared"
+            return f"assigns outer variable '{name.lexeme}'"
+
+        for callee in effects.calls:
+            if callee is None:
+                return "calls a function that is not named"
+            name = callee.lexeme
+            if name in self.declared:
+                for function in self.declared[name]:
+                    if id(function) in seen:
+                        continue
+                    seen.add(id(function))
+                    problem = self.sideEffect(function, seen)
+                    if problem is not None:
+                        return f"calls '{name}', which {problem}"
+            elif name in ["print", "open"]:
+                return f"calls '{name}'"
+            elif name not in self.builtins:
+                return f"calls '{name}', which is not declared with 'fn'"
+        return None
+
+    def visitBinaryExpr(self, expr: BinaryExpr):
+        self.resolveExpr(expr.left)
+        self.resolveExpr(expr.right)
+
+    def visitGroupingExpr(self, expr: GroupingExpr):
+        self.resolveExpr(expr.expression)
+
+    def visitLiteralExpr(self, expr: LiteralExpr):
+        pass
+
+    def visitUnaryExpr(self, expr: UnaryExpr):
+        self.resolveExpr(expr.right)
+
+    def visitVarExpr(self, expr: VarExpr):
+        expr.depth, expr.slot = self.lookup(expr.name.lexeme)
+        expr.rope = expr.name.lexeme in self.ropes
+
+    def visitAssignExpr(self, expr: AssignExpr):
+        self.resolveExpr(expr.value)
+
+        if expr.assign:
+            expr.depth = len(self.scopes) - 1
+            expr.slot  = self.declare(expr.name.lexeme)
+        else:
+            expr.depth, expr.slot = self.lookup(expr.name.lexeme)
+            self.wrote(expr.name, expr.depth)
+
+    def visitAssignUpdateExpr(self, expr: AssignUpdateExpr):
+        self.resolveExpr(expr.value)
+        expr.depth, expr.slot = self.lookup(expr.name.lexeme)
+        self.wrote(expr.name, expr.depth)
+
+    def visitLogicalExpr(self, expr: LogicalExpr):
+        self.resolveExpr(expr.left)
+        self.resolveExpr(expr.right)
+
+    def visitFunctionExpr(self, expr: FunctionExpr):
+        self.resolveExpr(expr.callee)
+        for effects in self.effects:
+            effects.calls.append(expr.callee.name if type(expr.callee) == VarExpr else None)
+
+        for argument in expr.arguments:
+            self.resolveExpr(argument)
+
+    def visitArrayExpr(self, expr: ArrayExpr):
+        for element in expr.elements:
+            self.resolveExpr(element)
+
+    def visitIndexExpr(self, expr: IndexExpr):
+        self.resolveExpr(expr.object)
+        self.resolveExpr(expr.index)
+
+    def visitSetIndexExpr(self, expr: SetIndexExpr):
+        self.resolveExpr(expr.object)
+        self.resolveExpr(expr.index)
+        self.resolveExpr(expr.value)
+
+        # Arrays are shared, so storing into one held by an outer variable
+        # changes it outside as well.
+        if type(expr.object) == VarExpr:
+            self.wrote(expr.object.name, expr.object.depth)
+        else:
+            self.wrote(None, -1)
+
+    def visitRangeExpr(self, expr: RangeExpr):
+        self.resolveExpr(expr.start)
+        self.resolveExpr(expr.end)
+        if expr.step is not None:
+            self.resolveExpr(expr.step)
+
+    def visitParallelExpr(self, expr: ParallelExpr):
+        self.resolveExpr(expr.iterable)
+
+        self.scopes.append(dict())
+        effects = Effects(len(self.scopes) - 1)
+        self.effects.append(effects)
+        try:
+            expr.slot = self.declare(expr.name.lexeme)
+            self.resolveExpr(expr.body)
+        finally:
+            self.effects.pop()
+            expr.size = len(self.scopes.pop())
+        self.parallels.append((expr, effects))
+
+    def visitExpressionStmt(self, stmt: ExpressionStmt):
+        append = self_append(stmt)
+        if append is not None:
+            append.append = append.name.lexeme in self.ropes
+        self.resolveExpr(stmt.expr)
+
+    def visitVarStmt(self, stmt: VarStmt):
+        if stmt.initializer is not None:
+            self.resolveExpr(stmt.initializer)
+        stmt.slot = self.declare(stmt.name.lexeme)
+
+    def visitBlockStmt(self, stmt: BlockStmt):
+        # A block that declares nothing runs in the enclosing scope; size 0
+        # tells the engines not to create an environment for it.
+        if not any(declares_locally(statement) for statement in stmt.statements):
+            stmt.size = 0
+            self.resolve(stmt.statements)
+            return
+
+        functions = self.functions
+        self.scopes.append(dict())
+        try:
+            self.resolve(stmt.statements)
+        finally:
+            stmt.size = len(self.scopes.pop())
+        stmt.captured = self.functions != functions
+
+    def visitIfStmt(self, stmt: IfStmt):
+        self.resolveExpr(stmt.condition)
+        self.resolveStmt(stmt.thenBranch)
+        if stmt.elseBranch is not None:
+            self.resolveStmt(stmt.elseBranch)
+
+    def visitWhileStmt(self, stmt: WhileStmt):
+        self.resolveExpr(stmt.condition)
+        self.resolveStmt(stmt.body)
+
+    def visitForStmt(self, stmt: ForStmt):
+        self.resolveExpr(stmt.iterable)
+
+        functions = self.functions
+        self.scopes.append(dict())
+        try:
+            stmt.slot = self.declare(stmt.name.lexeme)
+            if type(stmt.body) == BlockStmt:
+                # The body's locals share the loop variable's scope, so the
+                # block runs inline in the loop's frame.
+                stmt.body.size = 0
+                self.resolve(stmt.body.statements)
+            else:
+                self.resolveStmt(stmt.body)
+        finally:
+            stmt.size = len(self.scopes.pop())
+        stmt.captured = self.functions != functions
+
+    def visitFunctionStmt(self, stmt: FunctionStmt):
+        # Declared before the body is resolved, so the function can call
+        # itself.
+        stmt.slot = self.declare(stmt.name.lexeme)
+        self.functions += 1
+
+        self.scopes.append(dict())
+        effects = Effects(len(self.scopes) - 1)
+        self.declared.setdefault(stmt.name.lexeme, []).append(effects)
+        self.effects.append(effects)
+        try:
+            for param in stmt.params:
+                param.slot = self.declare(param.name.lexeme)
+            if stmt.result is not None:
+                # 'return' is a keyword, so this slot cannot clash with a
+                # variable.
+                stmt.result.slot = self.declare("return")
+            self.resolve(stmt.body)
+        finally:
+            self.effects.pop()
+            stmt.size = len(self.scopes.pop())
+
+    def visitReturnStmt(self, stmt: ReturnStmt):
+        if stmt.value is not None:
+            self.resolveExpr(stmt.value)
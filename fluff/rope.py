@@ -0,0 +1,46 @@
+# String builder for variables that grow with '+=' (or 's = s + x').
+# Python strings are immutable, so appending to the one in a variable
+# slot copies everything built so far: building a report line by line is
+# quadratic. The slot holds a Rope instead, which collects the appended
+# pieces and joins them only when the variable is read; the resolver
+# marks the reads that have to flatten (VarExpr.rope). A Rope never
+# leaves its slot.
+
+# Pieces are joined in batches, so a long run of tiny appends does not
+# keep millions of separate strings alive.
+BATCH = 256
+
+class Rope:
+    __slots__ = ('chunks', 'pending')
+
+    def __init__(self, first: str, second: str):
+        self.chunks  = [first]
+        self.pending = [second]
+
+    def append(self, text: str):
+        pending = self.pending
+        pending.append(text)
+        if len(pending) == BATCH:
+            self.chunks.append("".join(pending))
+            pending.clear()
+
+    def flatten(self) -> str:
+        chunks = self.chunks
+        if self.pending:
+            chunks.append("".join(self.pending))
+            self.pending.clear()
+        if len(chunks) > 1:
+            chunks[:] = ["".join(chunks)]
+        return chunks[0]
+
+    def __str__(self):
+        return self.flatten()
+
+def concat(current, text: str):
+    if type(current) is Rope:
+        current.append(text)
+        return current
+    return Rope(current, text)
+
+def flatten(value):
+    return value.flatten() if type(value) is Rope else value
@@ -4,4 +4,8 @@ class RuntimeError(Exception):
     def __init__(self, token: Token, message: str):
         super().__init__(message)
         self.message = message
-        self.token = token
\ No newline at end of file
+        self.token = token
+
+    # Errors raised in a worker process (see parallel.py) are pickled back.
+    def __reduce__(self):
+        return RuntimeError, (self.token, self.message)
@@ -0,0 +1,137 @@
+import gc
+import io
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import tempfile
+import traceback
+
+from .fluff_interpreter import FluffInterpreter
+from . import batch
+
+# Every message from the daemon is a frame: a one-byte channel followed by
+# a big-endian length and that many bytes. A request is answered by any
+# number of STDOUT/STDERR frames and then a single EXIT frame carrying the
+# status code. client.py implements the other end.
+STDOUT = b'o'
+STDERR = b'e'
+EXIT   = b'x'
+
+frame_header = struct.Struct('!cI')
+exit_status  = struct.Struct('!i')
+
+def default_socket_path() -> str:
+    return os.environ.get("FLUFF_SOCKET") or os.path.join(tempfile.gettempdir(), f"fluff-{os.getuid()}.sock")
+
+class FrameWriter(io.RawIOBase):
+    def __init__(self, connection: socket.socket, channel: bytes):
+        self.connection = connection
+        self.channel = channel
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.connection.sendall(frame_header.pack(self.channel, len(data)) + bytes(data))
+        return len(data)
+
+def channel(connection: socket.socket, name: bytes):
+    return io.TextIOWrapper(io.BufferedWriter(FrameWriter(connection, name)), encoding='utf-8', errors='replace')
+
+def handle(connection: socket.socket):
+    reader  = connection.makefile('rb')
+    request = json.loads(reader.readline())
+    source  = reader.read(request["length"]) if request.get("path") is None else None
+    stdout  = channel(connection, STDOUT)
+    stderr  = channel(connection, STDERR)
+    status  = 0
+
+    saved = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        path = request.get("path")
+        if path is not None:
+            with open(path, 'rb') as f:
+                source = f.read()
+
+        fluff_i = FluffInterpreter()
+        fluff_i.run_file(source, request.get("engine", "tree"), None, request.get("numeric", "native"),
+                         request.get("optimize", False), None, path, request.get("use_cache", True),
+                         None, request.get("typecheck", False))
+        status = batch.exit_status(fluff_i)
+    except OSError as e:
+        print(f"can't open '{e.filename}': {e.strerror}", file=stderr)
+        status = 2
+    except Exception:
+        traceback.print_exc()
+        status = 1
+    finally:
+        sys.stdout, sys.stderr = saved
+        stdout.flush()
+        stderr.flush()
+
+    connection.sendall(frame_header.pack(EXIT, exit_status.size) + exit_status.pack(status))
+
+def work(listener: socket.socket):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    while True:
+        connection, _ = listener.accept()
+        with connection:
+            try:
+                handle(connection)
+            except (OSError, ValueError):
+                # The client went away or sent a malformed request; there
+                # is nobody left to report to.
+                pass
+
+def spawn(listener: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            work(listener)
+        finally:
+            os._exit(1)
+    return pid
+
+def serve(path: str, workers: int):
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(128)
+
+    # Everything imported so far is shared with the workers; keep the
+    # collector from touching it so the pages stay shared after fork.
+    gc.freeze()
+
+    def stop(signum, frame):
+        raise SystemExit(0)
+    signal.signal(signal.SIGTERM, stop)
+
+    children = set(spawn(listener) for _ in range(workers))
+    print(f"fluff: serving on {path} with {workers} worker(s)", file=sys.stderr)
+
+    try:
+        while True:
+            pid, _ = os.wait()
+            # A worker only exits if something went badly wrong; replace it.
+            children.discard(pid)
+            children.add(spawn(listener))
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        listener.close()
+        os.unlink(path)
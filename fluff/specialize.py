@@ -0,0 +1,160 @@
+from .expr import *
+from .token import TokenType as tt
+from .environment import UNDEFINED
+from .runtime_error import RuntimeError
+from .numeric import number_types, coercions, int_ranges
+from decimal import Decimal
+
+# Inline caches for the tree interpreter, in the spirit of CPython's
+# quickening. A BinaryExpr or AssignUpdateExpr that has run WARMUP times
+# gets a small function generated for it and stored in its `quick` slot:
+# operands that are variables or literals are read straight from their
+# frame (the resolver fixed the depth and slot) or inlined, and the
+# operation is specialized for the operand types seen so far. When a
+# guard fails the node falls back to the generic visitor and is retried
+# after BACKOFF more runs.
+
+BACKOFF = 64
+
+binary_operators = {
+    tt.PLUS: "+",
+    tt.MINUS: "-",
+    tt.STAR: "*",
+    tt.SLASH: "/",
+    tt.GREATER: ">",
+    tt.GREATER_EQUAL: ">=",
+    tt.LESS: "<",
+    tt.LESS_EQUAL: "<=",
+    tt.EQUAL_EQUAL: "==",
+    tt.NOT_EQUAL: "!=",
+}
+
+update_operators = {
+    tt.PLUS_EQUAL: "+",
+    tt.MINUS_EQUAL: "-",
+    tt.STAR_EQUAL: "*",
+    tt.SLASH_EQUAL: "/",
+    tt.PERCENT_EQUAL: "%",
+}
+
+exact_types = [int, float, Decimal, str]
+
+def undefined(name):
+    raise RuntimeError(name, f"Undefined variable '{name.lexeme}'")
+
+def binary_miss(interpreter, expr, left, right):
+    expr.quick  = None
+    expr.warmup = BACKOFF
+    return interpreter.binary(expr, left, right)
+
+def update_miss(interpreter, expr, value):
+    expr.quick  = None
+    expr.warmup = BACKOFF
+    interpreter.environment.update_in_place(expr.depth, expr.slot, expr.name, expr.operator, value)
+    return value
+
+class Builder:
+    def __init__(self, kind: str):
+        self.kind      = kind
+        self.lines     = []
+        self.namespace = {"UNDEFINED": UNDEFINED, "undefined": undefined, "number_types": number_types}
+
+    def constant(self, value) -> str:
+        name = f"k{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def emit(self, line: str):
+        self.lines.append("    " + line)
+
+    def load(self, expr: Expr, target: str) -> str:
+        while type(expr) == GroupingExpr:
+            expr = expr.expression
+
+        if type(expr) == LiteralExpr:
+            return self.constant(expr.value)
+
+        if type(expr) == VarExpr and not expr.rope:
+            self.emit(f"{target} = frames[{expr.depth}][{expr.slot}]")
+            self.emit(f"if {target} is UNDEFINED: undefined({self.constant(expr.name)})")
+        else:
+            self.emit(f"{target} = {self.constant(expr)}.accept(interpreter)")
+        return target
+
+    def guard(self, value: str, observed: type) -> str:
+        if observed in exact_types:
+            return f"type({value}) is {self.constant(observed)}"
+        return f"type({value}) in number_types"
+
+    def build(self, node: Expr):
+        self.namespace["node"] = node
+        source = "\n".join(["def quick(interpreter):", "    frames = interpreter.environment.frames"] + self.lines)
+        exec(compile(source, f"<fluff {self.kind}>", "exec"), self.namespace)
+        return self.namespace["quick"]
+
+def specialize_binary(expr: BinaryExpr, left, right):
+    operator = binary_operators.get(expr.operator.type)
+    if operator is None:
+        return None
+
+    builder = Builder("binary")
+    left_value  = builder.load(expr.left, "left")
+    right_value = builder.load(expr.right, "right")
+
+    if expr.operator.type == tt.PLUS:
+        # '+' is the only operator the generic path checks; guard on the
+        # operand types seen so far.
+        if type(left) == type(right) and type(left) in exact_types:
+            guards = [builder.guard(left_value, type(left)), builder.guard(right_value, type(right))]
+        elif type(left) in number_types and type(right) in number_types:
+            guards = [builder.guard(left_value, None), builder.guard(right_value, None)]
+        else:
+            return None
+        builder.emit(f"if {' and '.join(guards)}:")
+        builder.emit(f"    return {left_value} + {right_value}")
+        builder.emit(f"return binary_miss(interpreter, node, {left_value}, {right_value})")
+    else:
+        # Python raises TypeError for operands fluff has no meaning for
+        # (arrays of different lengths, say); the generic path reports it.
+        builder.emit("try:")
+        builder.emit(f"    return {left_value} {operator} {right_value}")
+        builder.emit("except TypeError:")
+        builder.emit(f"    return binary_miss(interpreter, node, {left_value}, {right_value})")
+    builder.namespace["binary_miss"] = binary_miss
+
+    return builder.build(expr)
+
+def specialize_update(expr: AssignUpdateExpr, current, value, og_type):
+    operator = update_operators.get(expr.operator.type)
+    coerce   = coercions.get(og_type)
+    if operator is None or type(value) not in exact_types or type(current) not in exact_types:
+        return None
+    if type(current) == str:
+        # Strings grow through a Rope in update_in_place.
+        return None
+    if coerce is None and type(current) != type(value):
+        return None
+
+    builder = Builder("update")
+    value_name = builder.load(expr.value, "value")
+
+    depth, slot = expr.depth, expr.slot
+    builder.emit(f"values  = frames[{depth}]")
+    builder.emit(f"current = values[{slot}]")
+    builder.emit(f"if {builder.guard(value_name, type(value))} and {builder.guard('current', type(current))} "
+                 f"and interpreter.environment.type_frames[{depth}][{slot}] is {builder.constant(og_type)}:")
+    builder.emit(f"    result = current {operator} {value_name}")
+
+    if og_type in int_ranges:
+        low, high = int_ranges[og_type]
+        builder.emit(f"    values[{slot}] = result if type(result) is int and {low} <= result <= {high} else {builder.constant(coerce)}(result, {builder.constant(expr.name)})")
+    elif coerce is not None:
+        builder.emit(f"    values[{slot}] = {builder.constant(coerce)}(result, {builder.constant(expr.name)})")
+    else:
+        builder.emit(f"    values[{slot}] = result")
+
+    builder.emit(f"    return {value_name}")
+    builder.emit(f"return update_miss(interpreter, node, {value_name})")
+    builder.namespace["update_miss"] = update_miss
+
+    return builder.build(expr)
@@ -1,9 +1,12 @@
 from abc import ABC, abstractmethod
 from .expr import Expr
 from .token import Token
+from .fluff_array import ArrayType
 from typing import List
 
 class Stmt(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def __init__(self):
         pass
@@ -14,8 +17,11 @@ class Stmt(ABC):
 
 
 class ExpressionStmt(Stmt):
-    def __init__(self, expr: Expr):
+    __slots__ = ('expr', 'line')
+
+    def __init__(self, expr: Expr, line: int = 0):
         self.expr = expr
+        self.line = line
     
     def accept(self, visitor):
         return visitor.visitExpressionStmt(self)
@@ -24,12 +30,18 @@ class ExpressionStmt(Stmt):
         return f"{self.expr}"
 
 class VarStmt(Stmt):
-    def __init__(self, name: Token, var_type, initializer: Expr):
+    __slots__ = ('name', 'var_type', 'initializer', 'slot', 'line')
+
+    def __init__(self, name: Token, var_type, initializer: Expr, line: int = 0):
         self.name = name
         self.initializer = initializer
+        self.slot = None
+        self.line = line
 
         if type(var_type) == Token:
             self.var_type = var_type.type
+        elif type(var_type) == ArrayType:
+            self.var_type = var_type
         else:
             self.var_type = "dynamic"
     
@@ -40,8 +52,13 @@ class VarStmt(Stmt):
         return f"{self.var_type} {self.name.lexeme} = {self.initializer}"
 
 class BlockStmt(Stmt):
-    def __init__(self, statements: List[Stmt]):
+    __slots__ = ('statements', 'size', 'captured', 'line')
+
+    def __init__(self, statements: List[Stmt], line: int = 0):
         self.statements = statements
+        self.size = 0
+        self.captured = False
+        self.line = line
     
     def accept(self, visitor):
         return visitor.visitBlockStmt(self)
@@ -50,10 +67,13 @@ class BlockStmt(Stmt):
         return f"{self.statements}"
 
 class IfStmt(Stmt):
-    def __init__(self, condition: Expr, thenBranch: Stmt, elseBranch: Stmt):
+    __slots__ = ('condition', 'thenBranch', 'elseBranch', 'line')
+
+    def __init__(self, condition: Expr, thenBranch: Stmt, elseBranch: Stmt, line: int = 0):
         self.condition  = condition
         self.thenBranch = thenBranch
         self.elseBranch = elseBranch
+        self.line       = line
     
     def accept(self, visitor):
         return visitor.visitIfStmt(self)
@@ -62,21 +82,63 @@ class IfStmt(Stmt):
         return f"{self.expr}"
 
 class WhileStmt(Stmt):
-    def __init__(self, condition: Expr, body: Stmt):
+    __slots__ = ('condition', 'body', 'line')
+
+    def __init__(self, condition: Expr, body: Stmt, line: int = 0):
         self.condition = condition
         self.body      = body
+        self.line      = line
     
     def accept(self, visitor):
         return visitor.visitWhileStmt(self)
 
+# 'for name in iterable: body'. The loop variable and the locals of a
+# block body share one scope of size 'size', set by the resolver, as do a
+# function's parameters and locals. captured is set when a function
+# declared in the body may outlive an iteration.
 class ForStmt(Stmt):
-    def __init__(self, expr: Expr, body: Stmt):
-        self.expr = expr
-        self.body = body
-    
+    __slots__ = ('keyword', 'name', 'iterable', 'body', 'slot', 'size', 'captured', 'line')
+
+    def __init__(self, keyword: Token, name: Token, iterable: Expr, body: Stmt, line: int = 0):
+        self.keyword  = keyword
+        self.name     = name
+        self.iterable = iterable
+        self.body     = body
+        self.slot     = None
+        self.size     = 0
+        self.captured = False
+        self.line     = line
+
     def accept(self, visitor):
         return visitor.visitForStmt(self)
 
+class FunctionStmt(Stmt):
+    __slots__ = ('name', 'params', 'result', 'body', 'memo', 'slot', 'size', 'line')
+
+    def __init__(self, name: Token, params: List[VarStmt], result: VarStmt, body: List[Stmt], memo=None, line: int = 0):
+        self.name   = name
+        self.params = params
+        self.result = result
+        self.body   = body
+        self.memo   = memo
+        self.slot   = None
+        self.size   = 0
+        self.line   = line
+
+    def accept(self, visitor):
+        return visitor.visitFunctionStmt(self)
+
+class ReturnStmt(Stmt):
+    __slots__ = ('keyword', 'value', 'line')
+
+    def __init__(self, keyword: Token, value: Expr, line: int = 0):
+        self.keyword = keyword
+        self.value   = value
+        self.line    = line
+
+    def accept(self, visitor):
+        return visitor.visitReturnStmt(self)
+
 class VisitorStmt(ABC):
     @abstractmethod
     def visitExpressionStmt(self, expr: ExpressionStmt):
@@ -101,4 +163,12 @@ class VisitorStmt(ABC):
     @abstractmethod
     def visitForStmt(self, expr: ForStmt):
         pass
+
+    @abstractmethod
+    def visitFunctionStmt(self, expr: FunctionStmt):
+        pass
+
+    @abstractmethod
+    def visitReturnStmt(self, expr: ReturnStmt):
+        pass
     
\ No newline at end of file
@@ -10,8 +10,10 @@ class TokenType(Enum):
   RIGHT_SQ_BRACKET = auto() 
   COMMA            = auto() 
   DOT              = auto()
+  DOT_DOT          = auto()
   SEMICOLON        = auto()
   COLON            = auto() 
+  AT               = auto()
   MINUS            = auto() 
   PLUS             = auto() 
   PERCENT          = auto()
@@ -48,9 +50,11 @@ class TokenType(Enum):
   FN        = auto()
   FOR       = auto() 
   IF        = auto()
+  IN        = auto()
   NIL       = auto()
   NOT       = auto()
   OR        = auto()  
+  PARALLEL  = auto()
   RETURN    = auto()
   SELF      = auto() 
   SUPER     = auto() 
@@ -77,10 +81,15 @@ class TokenType(Enum):
 
   EOF  = auto() 
 
-variable_tts  = [TokenType(i) for i in range(50, 65)]
-numeric_types = [TokenType(i) for i in range(50, 61)]
-sync_tts      = [TokenType(i) for i in range(32, 65)]
-binary_ops    = [TokenType(i) for i in range(11, 29)]
+def token_range(first: TokenType, last: TokenType) -> frozenset:
+  members = list(TokenType)
+  return frozenset(members[members.index(first):members.index(last) + 1])
+
+variable_tts  = token_range(TokenType.INT, TokenType.STR)
+numeric_types = token_range(TokenType.INT, TokenType.DOUBLE)
+# 'in' never starts a statement, so error recovery does not stop there.
+sync_tts      = (token_range(TokenType.AND, TokenType.STR) | {TokenType.AT}) - {TokenType.IN}
+binary_ops    = token_range(TokenType.MINUS, TokenType.LESS_EQUAL)
 
 tt_to_str = {
   "and": TokenType.AND,
@@ -92,9 +101,11 @@ tt_to_str = {
   "fn": TokenType.FN,
   "for": TokenType.FOR,
   "if": TokenType.IF,
+  "in": TokenType.IN,
   "nil": TokenType.NIL,
   "not": TokenType.NOT,
   "or": TokenType.OR,
+  "parallel": TokenType.PARALLEL,
   "return": TokenType.RETURN,
   "self": TokenType.SELF,
   "super": TokenType.SUPER,
@@ -120,6 +131,8 @@ tt_to_str = {
 
 
 class Token:
+    __slots__ = ('type', 'lexeme', 'literal', 'line')
+
     def __init__(self, token_type, lexeme, literal, line):
         self.type = token_type
         self.lexeme = lexeme
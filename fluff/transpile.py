@@ -0,0 +1,1050 @@
+from .expr import *
+from .stmt import *
+from .token import Token, TokenType as tt, numeric_types
+from .environment import Environment, UNDEFINED, tt_to_name
+from .runtime_error import RuntimeError
+from .output import stdout
+from .fluff_callable import FluffCallable, CallError, Clock, Print, Len, Range, Open, Lines, ReadBytes
+from .files import Files
+from .fluff_function import FluffFunction
+from .numeric import number_types, coercions, int_ranges
+from .fluff_array import ArrayType, FluffArray, convert, literal, get_index, set_index, binary as array_binary, update as update_array
+from .rope import Rope, concat, flatten
+from .ranges import make_range, iterate
+from .parallel import run_parallel
+from decimal import Decimal
+from typing import List
+import time
+
+# Helpers the generated module imports. They mirror the checks Environment
+# performs so transpiled programs fail with the same messages.
+
+runtime_names = [
+    "Decimal", "UNDEFINED", "RuntimeError", "rt_token", "rt_error", "rt_get", "rt_tag", "rt_add",
+    "rt_call", "rt_if", "rt_define", "rt_declare", "rt_check", "rt_check_tag",
+    "rt_inplace", "rt_monotonic", "rt_numbers", "rt_coercions", "rt_coerce", "rt_store",
+    "rt_operand", "rt_param", "rt_result", "rt_function", "rt_array", "rt_index", "rt_set_index",
+    "rt_binary", "rt_check_operand", "ArrayType", "rt_text", "rt_concat", "rt_strings",
+    "rt_range", "rt_parallel", "rt_iterate",
+]
+
+python_types = {tt.BOOL: bool, tt.STR: str}
+
+# What the generated prologue passes to the builtins that share state with
+# the rest of the program.
+builtin_arguments = {Print: "rt_output", Open: "rt_files", Lines: "rt_files", ReadBytes: "rt_files"}
+
+rt_numbers   = number_types
+rt_coercions = coercions
+rt_strings   = (str, Rope)
+
+# Static type of a numeric expression, whatever its width.
+NUMBER = "number"
+# Static type of an array expression, whatever its element type.
+ARRAY  = "array"
+
+rt_monotonic = time.monotonic
+
+def rt_token(line: int, lexeme: str) -> Token:
+    return Token(tt.IDENTIFIER, lexeme, None, line)
+
+def rt_error(line: int, lexeme: str, message: str):
+    raise RuntimeError(rt_token(line, lexeme), message)
+
+def rt_type_name(var_type) -> str:
+    return str(var_type) if type(var_type) is ArrayType else tt_to_name.get(var_type)
+
+def rt_tag(value):
+    name = type(value).__name__
+
+    if name == "bool":
+        return tt.BOOL
+    if name == "str":
+        return tt.STR
+    if name in ["int", "Decimal", "float"]:
+        return tt.NUMBER
+    if name == "FluffArray":
+        return value.type
+
+def rt_python_name(value):
+    name = type(value).__name__
+
+    if name in ["bool", "str", "int"]:
+        return name
+    if name in ["Decimal", "float"]:
+        return "double"
+    if name == "FluffArray":
+        return str(value.type)
+
+def rt_get(value, line: int, lexeme: str):
+    if value is UNDEFINED:
+        rt_error(line, lexeme, f"Undefined variable '{lexeme}'")
+    return value
+
+# Reads of variables that may hold a Rope (VarExpr.rope).
+def rt_text(value, line: int, lexeme: str):
+    if value is UNDEFINED:
+        rt_error(line, lexeme, f"Undefined variable '{lexeme}'")
+    return flatten(value)
+
+def rt_concat(current, value):
+    if type(current) is str or type(current) is Rope:
+        return concat(current, value)
+    current += value
+    return current
+
+def rt_add(left, right, line: int, lexeme: str):
+    if type(left) in number_types and type(right) in number_types or type(left) == str and type(right) == str:
+        return left + right
+    if type(left) is FluffArray or type(right) is FluffArray:
+        return array_binary(rt_token(line, lexeme), left, right)
+    rt_error(line, lexeme, "Operands must be two numbers or two strings")
+
+# Operators other than '+' on operands known to be arrays.
+def rt_binary(left, right, line: int, lexeme: str):
+    return array_binary(rt_token(line, lexeme), left, right)
+
+def rt_array(values, line: int):
+    return literal(rt_token(line, "["), values)
+
+def rt_index(target, index, line: int):
+    return get_index(rt_token(line, "["), target, index)
+
+def rt_set_index(target, index, value, line: int):
+    return set_index(rt_token(line, "["), target, index, value)
+
+def rt_call(callee, arguments, line: int):
+    if not isinstance(callee, FluffCallable):
+        rt_error(line, ")", "Can only call functions and classes")
+
+    if len(arguments) != callee.arity():
+        rt_error(line, ")", f"Expected {callee.arity()} arguments but got {len(arguments)}")
+
+    try:
+        return callee.call(None, arguments)
+    except CallError as error:
+        rt_error(line, ")", str(error))
+
+def rt_range(start, end, step, line: int):
+    return make_range(rt_token(line, ".."), start, end, step)
+
+def rt_iterate(value, line: int):
+    return iterate(rt_token(line, "for"), value)
+
+def rt_parallel(body, iterable, reduction: str, line: int):
+    values = iterate(rt_token(line, "parallel"), iterable)
+    return run_parallel(rt_token(line, reduction), values, body)
+
+def rt_if(value):
+    return value == 'true' or value and value != 'false'
+
+def rt_define(value, var_type, line: int, lexeme: str):
+    if value is None:
+        return value
+    if var_type in coercions:
+        if type(value) in number_types:
+            return coercions[var_type](value, rt_token(line, lexeme))
+        rt_error(line, lexeme, f"Type error: expected numeric, had {rt_python_name(value)}")
+    if type(var_type) is ArrayType:
+        if type(value) is FluffArray:
+            return convert(value, var_type.element, rt_token(line, lexeme))
+    elif type(value) is python_types[var_type]:
+        return value
+    rt_error(line, lexeme, f"Type error: expected {rt_type_name(var_type)}, had {rt_python_name(value)}")
+
+def rt_declare(current, value, line: int, lexeme: str):
+    if current is not UNDEFINED:
+        rt_error(line, lexeme, f"Declaring existing variable '{lexeme}'")
+    return value
+
+def rt_check(value, var_type, line: int, lexeme: str):
+    if var_type in coercions and type(value) in number_types:
+        return coercions[var_type](value, rt_token(line, lexeme))
+    if type(var_type) is ArrayType and type(value) is FluffArray:
+        return convert(value, var_type.element, rt_token(line, lexeme))
+    if rt_tag(value) != var_type:
+        rt_error(line, lexeme, f"Assigning '{rt_python_name(value)}' to variable with type '{rt_type_name(var_type)}'")
+    return value
+
+def rt_check_tag(current, current_tag, value, line: int, lexeme: str):
+    if current is UNDEFINED:
+        rt_error(line, lexeme, f"Assigning to undefined variable '{lexeme}'")
+    return rt_check(value, current_tag, line, lexeme)
+
+# The operand of an in-place update is checked but not converted:
+# rt_inplace converts the result, as Environment.update_in_place does.
+# Arrays take numbers as well as arrays, and rt_inplace checks those.
+def rt_check_operand(current, current_tag, value, line: int, lexeme: str):
+    if current is UNDEFINED:
+        rt_error(line, lexeme, f"Assigning to undefined variable '{lexeme}'")
+    if type(current_tag) is ArrayType:
+        return value
+    if type(value) in number_types if current_tag in coercions else rt_tag(value) == current_tag:
+        return value
+    rt_error(line, lexeme, f"Assigning '{rt_python_name(value)}' to variable with type '{rt_type_name(current_tag)}'")
+
+# Unchecked counterparts of rt_check and rt_check_tag, for programs the
+# TypeChecker accepted: only the numeric conversion is left.
+def rt_coerce(value, var_type, line: int, lexeme: str):
+    coerce = coercions.get(var_type)
+    if coerce is None or value is None:
+        if type(value) is FluffArray and type(var_type) is ArrayType:
+            return convert(value, var_type.element, rt_token(line, lexeme))
+        return value
+    return coerce(value, rt_token(line, lexeme))
+
+def rt_store(current, current_tag, value, line: int, lexeme: str):
+    if current is UNDEFINED:
+        rt_error(line, lexeme, f"Assigning to undefined variable '{lexeme}'")
+    return rt_coerce(value, current_tag, line, lexeme)
+
+def rt_operand(current, value, line: int, lexeme: str):
+    if current is UNDEFINED:
+        rt_error(line, lexeme, f"Assigning to undefined variable '{lexeme}'")
+    return value
+
+# Typed parameters and results are checked in unchecked programs too, as
+# the other engines do: a call through a variable is not checked statically.
+def rt_param(value, var_type, line: int, lexeme: str):
+    if value is None:
+        rt_error(line, lexeme, f"Type error: expected {rt_type_name(var_type)}, had nil")
+    return rt_define(value, var_type, line, lexeme)
+
+def rt_result(value, var_type, line: int, lexeme: str):
+    if value is None:
+        rt_error(line, lexeme, f"Type error: '{lexeme}' must return {rt_type_name(var_type)}, had nil")
+    return rt_define(value, var_type, line, lexeme)
+
+def rt_function(name: str, line: int, params: int, invoke, memo, memoized: list):
+    function = FluffFunction(Token(tt.IDENTIFIER, name, None, line), params, invoke, memo)
+    if memo is not None:
+        memoized.append(function)
+    return function
+
+def rt_inplace(current, operator: str, value, var_type, line: int, lexeme: str):
+    if type(var_type) is ArrayType or type(current) is FluffArray:
+        return update_array(rt_token(line, lexeme), rt_token(line, operator), current, value)
+
+    if operator == "+=":
+        if type(value) is str and (type(current) is str or type(current) is Rope):
+            return concat(current, value)
+        current += value
+    elif operator == "-=":
+        current -= value
+    elif operator == "*=":
+        current *= value
+    elif operator == "/=":
+        current /= value
+    elif operator == "%=":
+        current %= value
+
+    if var_type in coercions:
+        return coercions[var_type](current, rt_token(line, lexeme))
+    return current
+
+binary_operators = {
+    tt.MINUS: "-",
+    tt.STAR: "*",
+    tt.SLASH: "/",
+    tt.GREATER: ">",
+    tt.GREATER_EQUAL: ">=",
+    tt.LESS: "<",
+    tt.LESS_EQUAL: "<=",
+    tt.EQUAL_EQUAL: "==",
+    tt.NOT_EQUAL: "!=",
+}
+
+comparison_operators = [tt.GREATER, tt.GREATER_EQUAL, tt.LESS, tt.LESS_EQUAL, tt.EQUAL_EQUAL, tt.NOT_EQUAL]
+
+class Variable:
+    def __init__(self, name: str, tag=None, static=False, non_null=False):
+        self.name     = name
+        self.tag      = tag
+        self.static   = static
+        self.non_null = non_null
+
+# A 'fn' declaration being emitted as a nested def. Variables of enclosing
+# scopes it assigns are declared nonlocal.
+#
+# So is the body of a loop that declares a function capturing its locals:
+# a Python closure sees the variables of the def it is in, not their value
+# in one iteration, so such a body runs as a def called every iteration
+# (loop is set). A 'return' in it returns a 1-tuple for the loop to pass on.
+class Function:
+    def __init__(self, declaration: FunctionStmt, depth: int, loop: bool = False):
+        self.declaration = declaration
+        self.depth       = depth
+        self.nonlocals   = set()
+        self.loop        = loop
+        self.returns     = False
+
+class Transpiler(Visitor, VisitorStmt):
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.lines       = []
+        self.indent      = 1
+        self.constants   = dict()
+        self.variables   = dict()
+        self.resets      = []
+        self.depth       = 0
+        self.temps       = 0
+        self.builtins    = dict()
+        self.functions   = []
+        self.parallels   = 0
+        self.loops       = 0
+
+    def transpile(self, statements: List[Stmt]) -> str:
+        for name, slot in self.interpreter.global_slots.items():
+            value = self.interpreter.globals.values[slot]
+            if isinstance(value, FluffCallable):
+                self.variables[(0, slot, name)] = Variable(f"{name}_0_{slot}", tt.FN, static=True, non_null=True)
+                self.builtins[(0, slot, name)] = value
+
+        self.resets.append(set())
+        for stmt in statements:
+            self.emitStmt(stmt)
+        body = self.lines
+
+        header = [
+            "# Generated by fluff.transpile",
+            f"from fluff.transpile import {', '.join(runtime_names)}",
+            "from fluff.fluff_callable import Clock, Print, Len, Range, Open, Lines, ReadBytes",
+            "from fluff.files import Files",
+            "from fluff.output import Output",
+            "from fluff.token import TokenType",
+            "",
+            "rt_memoized = []",
+            "rt_output   = Output()",
+            "rt_files    = Files()",
+        ]
+        for literal, name in self.constants.items():
+            header.append(f"{name} = Decimal({literal!r})")
+
+        prologue = ["", "def main():"]
+        for key, variable in sorted(self.variables.items()):
+            if key[0] != 0:
+                continue
+            if key in self.builtins:
+                builtin   = self.builtins[key]
+                arguments = builtin_arguments.get(type(builtin), "")
+                if type(builtin) == Clock:
+                    arguments = repr(self.interpreter.numeric)
+                prologue.append(f"    {variable.name} = {type(builtin).__name__}({arguments})")
+                if not variable.static:
+                    # Redeclared later in the program.
+                    prologue.append(f"    {variable.name}__t = TokenType.FN")
+            else:
+                prologue.append(f"    {variable.name} = UNDEFINED")
+                prologue.append(f"    {variable.name}__t = None")
+        if len(body) == 0:
+            body = ["    pass"]
+
+        footer = [
+            "",
+            "if __name__ == '__main__':",
+            "    try:",
+            "        main()",
+            "    except RuntimeError as e:",
+            "        rt_output.write(f'[line {e.token.line}]: {e.message}\\n')",
+            "    finally:",
+            "        rt_output.flush()",
+            "        rt_files.close()",
+            "",
+        ]
+        return "\n".join(header + prologue + body + footer)
+
+    def emit(self, line: str):
+        self.lines.append("    " * self.indent + line)
+
+    def emitStmt(self, stmt: Stmt):
+        stmt.accept(self)
+
+    def expression(self, expr: Expr) -> str:
+        return expr.accept(self)
+
+    def temp(self) -> str:
+        self.temps += 1
+        return f"_t{self.temps}"
+
+    def variable(self, depth: int, slot: int, name: Token) -> Variable:
+        key = (depth, slot, name.lexeme)
+        if key not in self.variables:
+            # Slots first seen outside a typed declaration may be read
+            # before they are defined, so blocks reset them on entry.
+            self.variables[key] = Variable(f"{name.lexeme}_{depth}_{slot}")
+            if depth == self.depth:
+                self.resets[-1].add(key)
+        return self.variables[key]
+
+    def staticVariable(self, depth: int, slot: int, name: Token) -> Variable:
+        key = (depth, slot, name.lexeme)
+        if key not in self.variables:
+            self.variables[key] = Variable(f"{name.lexeme}_{depth}_{slot}")
+        return self.variables[key]
+
+    def assigned(self, depth: int, variable: Variable) -> Variable:
+        for function in self.functions:
+            if depth < function.depth:
+                function.nonlocals.add(variable.name)
+        return variable
+
+    def family(self, tag):
+        if type(tag) == ArrayType:
+            return ARRAY
+        return NUMBER if tag in coercions or tag == tt.NUMBER else tag
+
+    def staticType(self, expr: Expr):
+        if type(expr) == LiteralExpr:
+            return self.family(rt_tag(expr.value))
+        elif type(expr) == GroupingExpr:
+            return self.staticType(expr.expression)
+        elif type(expr) == VarExpr:
+            variable = self.variable(expr.depth, expr.slot, expr.name)
+            if variable.static and variable.non_null:
+                return self.family(variable.tag)
+        elif type(expr) == UnaryExpr:
+            if expr.operator.type == tt.NOT:
+                return tt.BOOL
+            if self.staticType(expr.right) in (NUMBER, ARRAY):
+                return self.staticType(expr.right)
+        elif type(expr) == BinaryExpr:
+            if expr.operator.type in comparison_operators:
+                return tt.BOOL
+            left  = self.staticType(expr.left)
+            right = self.staticType(expr.right)
+            if left == right == NUMBER:
+                return NUMBER
+            if ARRAY in (left, right) and left in (NUMBER, ARRAY) and right in (NUMBER, ARRAY):
+                return ARRAY
+            if expr.operator.type == tt.PLUS and left == right == tt.STR:
+                return tt.STR
+        elif type(expr) == ArrayExpr:
+            return ARRAY
+        elif type(expr) == IndexExpr:
+            # Indexing either produces a number or fails.
+            return NUMBER
+        return None
+
+    def visitLiteralExpr(self, expr: LiteralExpr):
+        if type(expr.value) == Decimal:
+            literal = str(expr.value)
+            if literal not in self.constants:
+                self.constants[literal] = f"_c{len(self.constants)}"
+            return self.constants[literal]
+        return repr(expr.value)
+
+    def visitGroupingExpr(self, expr: GroupingExpr):
+        return self.expression(expr.expression)
+
+    def visitUnaryExpr(self, expr: UnaryExpr):
+        right = self.expression(expr.right)
+
+        if expr.operator.type == tt.MINUS:
+            return f"(-{right})"
+        elif expr.operator.type == tt.NOT:
+            return f"(not {right})"
+
+    def visitBinaryExpr(self, expr: BinaryExpr):
+        left  = self.expression(expr.left)
+        right = self.expression(expr.right)
+
+        if expr.operator.type == tt.PLUS:
+            if self.staticType(expr.left) == self.staticType(expr.right) and self.staticType(expr.left) in (NUMBER, tt.STR):
+                return f"({left} + {right})"
+            return f"rt_add({left}, {right}, {expr.operator.line}, '+')"
+
+        # Python operators work on arrays too, but only rt_binary turns the
+        # ones arrays reject into fluff errors. Operands not known to be
+        # arrays keep the plain operator.
+        if ARRAY in (self.staticType(expr.left), self.staticType(expr.right)):
+            return f"rt_binary({left}, {right}, {expr.operator.line}, {expr.operator.lexeme!r})"
+
+        return f"({left} {binary_operators[expr.operator.type]} {right})"
+
+    def visitLogicalExpr(self, expr: LogicalExpr):
+        left  = self.expression(expr.left)
+        right = self.expression(expr.right)
+
+        if expr.operator.type == tt.OR:
+            return f"({left} or {right})"
+        else:
+            return f"({left} and {right})"
+
+    def visitVarExpr(self, expr: VarExpr):
+        variable = self.variable(expr.depth, expr.slot, expr.name)
+
+        if expr.rope:
+            return f"rt_text({variable.name}, {expr.name.line}, {expr.name.lexeme!r})"
+        if variable.static:
+            return variable.name
+        return f"rt_get({variable.name}, {expr.name.line}, {expr.name.lexeme!r})"
+
+    def tagName(self, tag) -> str:
+        if type(tag) == ArrayType:
+            return f"ArrayType(TokenType.{tag.element.name})"
+        return f"TokenType.{tag.name}" if tag is not None else "None"
+
+    def checkedValue(self, variable: Variable, value: str, name: Token) -> str:
+        if not self.interpreter.checked:
+            if not variable.static:
+                return f"rt_store({variable.name}, {variable.name}__t, {value}, {name.line}, {name.lexeme!r})"
+            if variable.tag in coercions or type(variable.tag) == ArrayType:
+                return f"rt_coerce({value}, {self.tagName(variable.tag)}, {name.line}, {name.lexeme!r})"
+            return value
+        if variable.static:
+            return f"rt_check({value}, {self.tagName(variable.tag)}, {name.line}, {name.lexeme!r})"
+        return f"rt_check_tag({variable.name}, {variable.name}__t, {value}, {name.line}, {name.lexeme!r})"
+
+    # The operand of an in-place update, which rt_inplace applies and then
+    # converts to the variable's type.
+    def checkedOperand(self, variable: Variable, value: str, name: Token) -> str:
+        if not self.interpreter.checked:
+            if variable.static:
+                return value
+            return f"rt_operand({variable.name}, {value}, {name.line}, {name.lexeme!r})"
+        if variable.static:
+            if type(variable.tag) == ArrayType:
+                return value
+            tag = self.tagName(variable.tag)
+        else:
+            tag = f"{variable.name}__t"
+        return f"rt_check_operand({variable.name}, {tag}, {value}, {name.line}, {name.lexeme!r})"
+
+    def declareDynamic(self, expr: AssignExpr) -> Variable:
+        variable = self.variable(expr.depth, expr.slot, expr.name)
+        variable.static   = False
+        variable.non_null = False
+        variable.tag      = None
+        self.resets[-1].add((expr.depth, expr.slot, expr.name.lexeme))
+        return variable
+
+    def visitAssignExpr(self, expr: AssignExpr):
+        value = self.expression(expr.value)
+        name  = expr.name
+
+        if expr.assign:
+            variable = self.declareDynamic(expr)
+            declared = f"rt_declare({variable.name}, {value}, {name.line}, {name.lexeme!r})"
+            return f"(({variable.name}__t := rt_tag({variable.name} := {declared})), {variable.name})[1]"
+
+        variable = self.assigned(expr.depth, self.variable(expr.depth, expr.slot, name))
+        temp     = self.temp()
+        return f"(({temp} := {value}), ({variable.name} := {self.checkedValue(variable, temp, name)}))[0]"
+
+    def visitAssignUpdateExpr(self, expr: AssignUpdateExpr):
+        value    = self.expression(expr.value)
+        variable = self.assigned(expr.depth, self.variable(expr.depth, expr.slot, expr.name))
+        temp     = self.temp()
+        checked  = self.checkedOperand(variable, temp, expr.name)
+
+        if variable.static:
+            tag = self.tagName(variable.tag)
+        else:
+            tag = f"{variable.name}__t"
+
+        return f"(({temp} := {value}), ({variable.name} := rt_inplace({variable.name}, {expr.operator.lexeme!r}, {checked}, {tag}, {expr.name.line}, {expr.name.lexeme!r})))[0]"
+
+    def visitFunctionExpr(self, expr: FunctionExpr):
+        arguments = [self.expression(argument) for argument in expr.arguments]
+
+        if type(expr.callee) == VarExpr:
+            variable = self.variable(expr.callee.depth, expr.callee.slot, expr.callee.name)
+            if variable.tag == tt.FN and expr.callee.depth == 0:
+                if expr.callee.name.lexeme == "print" and len(arguments) == 1:
+                    return f"rt_output.print({arguments[0]})"
+                if expr.callee.name.lexeme == "clock" and len(arguments) == 0:
+                    if self.interpreter.numeric == "decimal":
+                        return "Decimal(rt_monotonic())"
+                    return "rt_monotonic()"
+
+        callee = self.expression(expr.callee)
+        return f"rt_call({callee}, [{', '.join(arguments)}], {expr.paren.line})"
+
+    def visitArrayExpr(self, expr: ArrayExpr):
+        elements = [self.expression(element) for element in expr.elements]
+        return f"rt_array([{', '.join(elements)}], {expr.bracket.line})"
+
+    def visitIndexExpr(self, expr: IndexExpr):
+        return f"rt_index({self.expression(expr.object)}, {self.expression(expr.index)}, {expr.bracket.line})"
+
+    def visitSetIndexExpr(self, expr: SetIndexExpr):
+        target = self.expression(expr.object)
+        index  = self.expression(expr.index)
+        return f"rt_set_index({target}, {index}, {self.expression(expr.value)}, {expr.bracket.line})"
+
+    def visitRangeExpr(self, expr: RangeExpr):
+        step = self.expression(expr.step) if expr.step is not None else "1"
+        return f"rt_range({self.expression(expr.start)}, {self.expression(expr.end)}, {step}, {expr.operator.line})"
+
+    def visitParallelExpr(self, expr: ParallelExpr):
+        # The body becomes a def emitted ahead of the statement, taking the
+        # loop variable as its parameter.
+        iterable = self.expression(expr.iterable)
+        self.parallels += 1
+        name = f"_p{self.parallels}"
+
+        outer_lines = self.lines
+        self.lines  = []
+        self.depth += 1
+        self.indent += 1
+        self.resets.append(set())
+
+        try:
+            key      = (self.depth, expr.slot, expr.name.lexeme)
+            variable = Variable(f"{expr.name.lexeme}_{self.depth}_{expr.slot}")
+            self.variables[key] = variable
+            self.emit(f"{variable.name}__t = rt_tag({variable.name})")
+            self.emit(f"return {self.expression(expr.body)}")
+        finally:
+            resets     = self.resets.pop()
+            body_lines = self.lines
+            self.lines = outer_lines
+            self.indent -= 1
+            self.depth -= 1
+
+        self.emit(f"def {name}({variable.name}):")
+        # A ':=' of the loop variable fails as a redeclaration instead.
+        resets.discard(key)
+        for key in sorted(resets):
+            self.emit(f"    {self.variables[key].name} = UNDEFINED")
+            self.emit(f"    {self.variables[key].name}__t = None")
+        self.lines.extend(body_lines)
+
+        for key in [key for key in self.variables if key[0] > self.depth]:
+            del self.variables[key]
+
+        return f"rt_parallel({name}, {iterable}, {expr.reduction.lexeme!r}, {expr.keyword.line})"
+
+    def emitValueCheck(self, variable: Variable, value: Expr, temp: str, name: Token):
+        if self.staticType(value) == self.family(variable.tag) or not self.interpreter.checked:
+            return
+
+        if variable.tag in coercions:
+            self.emit(f"if type({temp}) not in rt_numbers: rt_check({temp}, {self.tagName(variable.tag)}, {name.line}, {name.lexeme!r})")
+        else:
+            self.emit(f"if type({temp}) is not {python_types[variable.tag].__name__}: rt_check({temp}, {self.tagName(variable.tag)}, {name.line}, {name.lexeme!r})")
+
+    def emitCoercion(self, variable: Variable, name: Token):
+        token = f"rt_token({name.line}, {name.lexeme!r})"
+        if variable.tag in int_ranges:
+            low, high = int_ranges[variable.tag]
+            self.emit(f"if type({variable.name}) is not int or not {low} <= {variable.name} <= {high}: {variable.name} = rt_coercions[{self.tagName(variable.tag)}]({variable.name}, {token})")
+        elif variable.tag in coercions:
+            self.emit(f"if type({variable.name}) is not float: {variable.name} = rt_coercions[{self.tagName(variable.tag)}]({variable.name}, {token})")
+
+    def visitExpressionStmt(self, stmt: ExpressionStmt):
+        expr = stmt.expr
+
+        if type(expr) == AssignExpr and expr.append:
+            self.emitAppend(expr)
+
+        elif type(expr) == AssignExpr and not expr.assign:
+            value    = self.expression(expr.value)
+            variable = self.assigned(expr.depth, self.variable(expr.depth, expr.slot, expr.name))
+
+            if variable.static and (variable.tag in python_types or variable.tag in coercions):
+                temp = self.temp()
+                self.emit(f"{temp} = {value}")
+                self.emitValueCheck(variable, expr.value, temp, expr.name)
+                self.emit(f"{variable.name} = {temp}")
+                self.emitCoercion(variable, expr.name)
+            else:
+                self.emit(f"{variable.name} = {self.checkedValue(variable, value, expr.name)}")
+
+        elif type(expr) == AssignUpdateExpr:
+            value    = self.expression(expr.value)
+            variable = self.assigned(expr.depth, self.variable(expr.depth, expr.slot, expr.name))
+            operator = expr.operator.lexeme
+
+            if variable.static and (variable.tag in python_types or variable.tag in coercions):
+                temp = self.temp()
+                self.emit(f"{temp} = {value}")
+                self.emitValueCheck(variable, expr.value, temp, expr.name)
+                if variable.tag == tt.STR and operator == "+=":
+                    self.emit(f"{variable.name} = rt_concat({variable.name}, {temp})")
+                else:
+                    self.emit(f"{variable.name} {operator} {temp}")
+                self.emitCoercion(variable, expr.name)
+            else:
+                if variable.static:
+                    tag = self.tagName(variable.tag)
+                else:
+                    tag = f"{variable.name}__t"
+                checked = self.checkedOperand(variable, value, expr.name)
+                self.emit(f"{variable.name} = rt_inplace({variable.name}, {operator!r}, {checked}, {tag}, {expr.name.line}, {expr.name.lexeme!r})")
+
+        else:
+            self.emit(self.expression(expr))
+
+    def emitAppend(self, expr: AssignExpr):
+        left     = expr.value.left
+        operator = expr.value.operator
+        variable = self.assigned(expr.depth, self.variable(expr.depth, expr.slot, expr.name))
+        temp     = self.temp()
+
+        if not (variable.static and variable.non_null):
+            self.emit(f"rt_get({variable.name}, {left.name.line}, {left.name.lexeme!r})")
+        self.emit(f"{temp} = {self.expression(expr.value.right)}")
+        self.emit(f"if type({temp}) is str and type({variable.name}) in rt_strings:")
+        self.emit(f"    {variable.name} = rt_concat({variable.name}, {temp})")
+        self.emit("else:")
+        added = f"rt_add({self.expression(left)}, {temp}, {operator.line}, '+')"
+        self.emit(f"    {variable.name} = {self.checkedValue(variable, added, expr.name)}")
+
+    def visitVarStmt(self, stmt: VarStmt):
+        if type(stmt.var_type) == ArrayType:
+            self.declareArray(stmt)
+            return
+        if stmt.var_type in coercions or stmt.var_type in python_types:
+            var_type = stmt.var_type
+        else:
+            # Environment.define ignores other types, so neither do we.
+            if stmt.initializer is not None:
+                self.emit(self.expression(stmt.initializer))
+            self.variable(self.depth, stmt.slot, stmt.name)
+            return
+
+        name     = stmt.name
+        variable = self.staticVariable(self.depth, stmt.slot, name)
+        static   = stmt.initializer is not None and self.staticType(stmt.initializer) == self.family(var_type)
+
+        variable.tag    = var_type
+        variable.static = True
+
+        if stmt.initializer is None:
+            self.emit(f"{variable.name} = None")
+        elif static:
+            self.emit(f"{variable.name} = {self.expression(stmt.initializer)}")
+            self.emitCoercion(variable, name)
+        elif not self.interpreter.checked:
+            value = self.expression(stmt.initializer)
+            self.emit(f"{variable.name} = rt_coerce({value}, {self.tagName(var_type)}, {name.line}, {name.lexeme!r})")
+        else:
+            value = self.expression(stmt.initializer)
+            self.emit(f"{variable.name} = rt_define({value}, {self.tagName(var_type)}, {name.line}, {name.lexeme!r})")
+
+        variable.non_null = static
+
+    def declareArray(self, stmt: VarStmt):
+        # The initializer may hold another element type, so it always goes
+        # through the conversion.
+        name     = stmt.name
+        variable = self.staticVariable(self.depth, stmt.slot, name)
+        tag      = self.tagName(stmt.var_type)
+
+        variable.tag    = stmt.var_type
+        variable.static = True
+
+        if stmt.initializer is None:
+            self.emit(f"{variable.name} = None")
+        elif not self.interpreter.checked:
+            self.emit(f"{variable.name} = rt_coerce({self.expression(stmt.initializer)}, {tag}, {name.line}, {name.lexeme!r})")
+        else:
+            self.emit(f"{variable.name} = rt_define({self.expression(stmt.initializer)}, {tag}, {name.line}, {name.lexeme!r})")
+
+        variable.non_null = stmt.initializer is not None and self.staticType(stmt.initializer) == ARRAY
+
+    def visitBlockStmt(self, stmt: BlockStmt):
+        if stmt.size == 0:
+            for statement in stmt.statements:
+                self.emitStmt(statement)
+            return
+
+        outer_lines = self.lines
+        self.lines  = []
+        self.depth += 1
+        self.resets.append(set())
+
+        try:
+            for statement in stmt.statements:
+                self.emitStmt(statement)
+        finally:
+            resets      = self.resets.pop()
+            block_lines = self.lines
+            self.lines  = outer_lines
+            self.depth -= 1
+
+        for key in sorted(resets):
+            variable = self.variables[key]
+            self.emit(f"{variable.name} = UNDEFINED")
+            self.emit(f"{variable.name}__t = None")
+            # Later blocks reusing this depth and slot start over.
+            del self.variables[key]
+
+        for key in [key for key in self.variables if key[0] > self.depth]:
+            del self.variables[key]
+
+        self.lines.extend(block_lines)
+        if len(block_lines) == 0 and len(resets) == 0:
+            self.emit("pass")
+
+    def visitIfStmt(self, stmt: IfStmt):
+        condition = self.expression(stmt.condition)
+
+        if self.staticType(stmt.condition) == tt.BOOL:
+            self.emit(f"if {condition}:")
+        else:
+            self.emit(f"if rt_if({condition}):")
+        self.emitBranch(stmt.thenBranch)
+
+        if stmt.elseBranch is not None:
+            self.emit("else:")
+            self.emitBranch(stmt.elseBranch)
+
+    def emitBranch(self, stmt: Stmt):
+        self.indent += 1
+        count = len(self.lines)
+        self.emitStmt(stmt)
+        if len(self.lines) == count:
+            self.emit("pass")
+        self.indent -= 1
+
+    def visitWhileStmt(self, stmt: WhileStmt):
+        self.emitLoop(stmt.condition, stmt.body)
+
+    def visitForStmt(self, stmt: ForStmt):
+        iterable = self.expression(stmt.iterable)
+
+        if stmt.captured:
+            self.emitCapturedFor(stmt, iterable)
+            return
+
+        outer_lines = self.lines
+        self.lines  = []
+        self.depth += 1
+        self.indent += 1
+        self.resets.append(set())
+
+        try:
+            # Range values are numbers, which the loop variable keeps as
+            # they are; array elements have the type of the array.
+            key = (self.depth, stmt.slot, stmt.name.lexeme)
+            if type(stmt.iterable) == RangeExpr and self.interpreter.numeric != "decimal":
+                variable = Variable(f"{stmt.name.lexeme}_{self.depth}_{stmt.slot}", tt.NUMBER, static=True, non_null=True)
+            else:
+                variable = Variable(f"{stmt.name.lexeme}_{self.depth}_{stmt.slot}")
+                self.emit(f"{variable.name}__t = rt_tag({variable.name})")
+            self.variables[key] = variable
+            self.emitStmt(stmt.body)
+        finally:
+            resets     = self.resets.pop()
+            body_lines = self.lines
+            self.lines = outer_lines
+            self.indent -= 1
+            self.depth -= 1
+
+        self.emit(f"for {variable.name} in rt_iterate({iterable}, {stmt.keyword.line}):")
+        # Variables the body declares start over in every iteration; a ':='
+        # of the loop variable fails as a redeclaration instead.
+        resets.discard(key)
+        for key in sorted(resets):
+            self.emit(f"    {self.variables[key].name} = UNDEFINED")
+            self.emit(f"    {self.variables[key].name}__t = None")
+        self.lines.extend(body_lines)
+        if len(body_lines) == 0 and len(resets) == 0:
+            self.emit("    pass")
+
+        for key in [key for key in self.variables if key[0] > self.depth]:
+            del self.variables[key]
+
+    # A for loop whose body runs as a def per iteration, taking the loop
+    # variable (see Function).
+    def emitCapturedFor(self, stmt: ForStmt, iterable: str):
+        name = f"{stmt.name.lexeme}_{self.depth + 1}_{stmt.slot}"
+        if type(stmt.iterable) == RangeExpr and self.interpreter.numeric != "decimal":
+            variable = Variable(name, tt.NUMBER, static=True, non_null=True)
+        else:
+            variable = Variable(name)
+        self.emit(f"for {variable.name} in rt_iterate({iterable}, {stmt.keyword.line}):")
+
+        def emit_body():
+            self.depth += 1
+            self.resets.append(set())
+            try:
+                key = (self.depth, stmt.slot, stmt.name.lexeme)
+                self.variables[key] = variable
+                if not variable.static:
+                    self.emit(f"{variable.name}__t = rt_tag({variable.name})")
+                count = len(self.lines)
+                self.emitStmt(stmt.body)
+            finally:
+                resets = self.resets.pop()
+                self.depth -= 1
+
+            # Variables the body declares start over in every iteration.
+            resets.discard(key)
+            self.lines[count:count] = ["    " * self.indent + line for key in sorted(resets)
+                                       for line in [f"{self.variables[key].name} = UNDEFINED", f"{self.variables[key].name}__t = None"]]
+
+        self.indent += 1
+        self.emitIteration(emit_body, [variable.name])
+        self.indent -= 1
+
+        for key in [key for key in self.variables if key[0] > self.depth]:
+            del self.variables[key]
+
+    def emitLoop(self, condition: Expr, body: Stmt):
+        self.emit(f"while {self.expression(condition)}:")
+        if type(body) == BlockStmt and body.size > 0 and body.captured:
+            self.indent += 1
+            self.emitIteration(lambda: self.emitStmt(body), [])
+            self.indent -= 1
+        else:
+            self.emitBranch(body)
+
+    # Emits a loop body, which emit_body emits, as a def called once per
+    # iteration with params (see Function).
+    def emitIteration(self, emit_body, params: List[str]):
+        enclosing = self.functions[-1].declaration if len(self.functions) > 0 else None
+        function  = Function(enclosing, self.depth + 1, loop=True)
+        name      = f"_l{self.loops}"
+        self.loops += 1
+
+        outer_lines = self.lines
+        self.lines  = []
+        self.indent += 1
+        self.functions.append(function)
+        try:
+            emit_body()
+        finally:
+            self.functions.pop()
+            body_lines = self.lines
+            self.lines = outer_lines
+            self.indent -= 1
+
+        self.emit(f"def {name}({', '.join(params)}):")
+        if len(function.nonlocals) > 0:
+            self.emit(f"    nonlocal {', '.join(sorted(function.nonlocals))}")
+        self.lines.extend(body_lines)
+        if len(body_lines) == 0 and len(function.nonlocals) == 0:
+            self.emit("    pass")
+
+        call = f"{name}({', '.join(params)})"
+        if not function.returns:
+            self.emit(call)
+            return
+        result = self.temp()
+        self.emit(f"{result} = {call}")
+        if self.functions[-1].loop:
+            self.functions[-1].returns = True
+            self.emit(f"if {result} is not None: return {result}")
+        else:
+            self.emit(f"if {result} is not None: return {result}[0]")
+
+    def visitFunctionStmt(self, stmt: FunctionStmt):
+        name     = stmt.name
+        variable = self.staticVariable(self.depth, stmt.slot, name)
+        # A function variable holds whatever the last declaration that ran
+        # stored, so it is read like a ':=' variable.
+        variable.tag      = None
+        variable.static   = False
+        variable.non_null = False
+
+        function    = Function(stmt, self.depth + 1)
+        outer_lines = self.lines
+        self.lines  = []
+        self.depth += 1
+        self.indent += 1
+        self.resets.append(set())
+        self.functions.append(function)
+
+        try:
+            for param in stmt.params:
+                key = (self.depth, param.slot, param.name.lexeme)
+                if param.var_type == "dynamic":
+                    self.variables[key] = Variable(f"{param.name.lexeme}_{self.depth}_{param.slot}")
+                    self.emit(f"{self.variables[key].name}__t = rt_tag({self.variables[key].name})")
+                else:
+                    self.variables[key] = Variable(f"{param.name.lexeme}_{self.depth}_{param.slot}", param.var_type, static=True, non_null=True)
+                    self.emit(f"{self.variables[key].name} = rt_param({self.variables[key].name}, {self.tagName(param.var_type)}, {param.name.line}, {param.name.lexeme!r})")
+            params = [self.variables[(self.depth, param.slot, param.name.lexeme)].name for param in stmt.params]
+
+            for statement in stmt.body:
+                self.emitStmt(statement)
+            if stmt.result is not None and not (len(stmt.body) > 0 and type(stmt.body[-1]) == ReturnStmt):
+                self.emit(f"return rt_result(None, {self.tagName(stmt.result.var_type)}, {name.line}, {name.lexeme!r})")
+        finally:
+            self.functions.pop()
+            resets     = self.resets.pop()
+            body_lines = self.lines
+            self.lines = outer_lines
+            self.indent -= 1
+            self.depth -= 1
+
+        self.emit(f"def {variable.name}__fn({', '.join(params)}):")
+        self.indent += 1
+        if len(function.nonlocals) > 0:
+            self.emit(f"nonlocal {', '.join(sorted(function.nonlocals))}")
+        for key in sorted(resets):
+            self.emit(f"{self.variables[key].name} = UNDEFINED")
+            self.emit(f"{self.variables[key].name}__t = None")
+        self.indent -= 1
+
+        for key in [key for key in self.variables if key[0] > self.depth]:
+            del self.variables[key]
+
+        self.lines.extend(body_lines)
+        if len(body_lines) == 0 and len(resets) == 0 and len(function.nonlocals) == 0:
+            self.emit("    pass")
+
+        self.emit(f"{variable.name} = rt_function({name.lexeme!r}, {name.line}, {len(stmt.params)}, {variable.name}__fn, {stmt.memo!r}, rt_memoized)")
+        self.emit(f"{variable.name}__t = TokenType.FN")
+
+    def visitReturnStmt(self, stmt: ReturnStmt):
+        value    = self.expression(stmt.value) if stmt.value is not None else "None"
+        function = self.functions[-1]
+        result   = function.declaration.result
+
+        if result is not None:
+            name  = function.declaration.name
+            value = f"rt_result({value}, {self.tagName(result.var_type)}, {name.line}, {name.lexeme!r})"
+        if function.loop:
+            function.returns = True
+            value = f"({value},)"
+        self.emit(f"return {value}")
+
+class PythonInterpreter:
+    def __init__(self, fluff_instance, numeric: str = "native", dump_file=None, checked: bool = True):
+        self.fluff_instance = fluff_instance
+        self.numeric = numeric
+        self.dump_file = dump_file
+        self.checked = checked
+        self.global_slots = dict()
+        self.globals = Environment()
+        self.environment = self.globals
+        self.memoized = []
+        self.files = Files()
+        self.output = getattr(fluff_instance, "output", stdout)
+        self.defineGlobal("clock", Clock(numeric))
+        self.defineGlobal("print", Print(self.output))
+        self.defineGlobal("len", Len())
+        self.defineGlobal("range", Range())
+        self.defineGlobal("open", Open(self.files))
+        self.defineGlobal("lines", Lines(self.files))
+        self.defineGlobal("read_bytes", ReadBytes(self.files))
+
+    def defineGlobal(self, name: str, value):
+        slot = self.global_slots.setdefault(name, len(self.global_slots))
+        self.globals.grow(len(self.global_slots))
+        self.globals.define(slot, name, value)
+
+    def interpret(self, statements: List[Stmt]):
+        self.globals.grow(len(self.global_slots))
+        source = Transpiler(self).transpile(statements)
+
+        if self.dump_file is not None:
+            self.dump_file.write(source)
+            self.dump_file.flush()
+
+        namespace = {"__name__": "__fluff__"}
+        exec(compile(source, "<fluff>", "exec"), namespace)
+        self.memoized = namespace["rt_memoized"]
+        namespace["rt_output"] = self.output
+        namespace["rt_files"]  = self.files
+        try:
+            namespace["main"]()
+        except RuntimeError as e:
+            self.fluff_instance.runtimeError(e)
+        finally:
+            self.output.flush()
+            self.files.close()
@@ -0,0 +1,502 @@
+from .expr import *
+from .stmt import *
+from .token import Token, TokenType as tt
+from .numeric import coercions
+from .fluff_array import ArrayType
+from decimal import Decimal
+from typing import List
+
+# Static types are sets of value families; a variable that may still be
+# nil has NIL in its set. The empty set is the type of an expression that
+# already produced an error, and is accepted everywhere so one mistake is
+# reported once.
+NUMBER   = "number"
+STRING   = "str"
+BOOLEAN  = "bool"
+FUNCTION = "fn"
+NIL      = "nil"
+ARRAY    = "array"
+# 'start..end', which is only ever iterated over, so no variable holds one.
+RANGE    = "range"
+# lines(file), iterated over like a range.
+LINES    = "lines"
+
+ANY = frozenset([NUMBER, STRING, BOOLEAN, FUNCTION, NIL, ARRAY])
+
+family_names = {NUMBER: "numeric", STRING: "str", BOOLEAN: "bool", FUNCTION: "fn", NIL: "nil", ARRAY: "array", RANGE: "range", LINES: "lines"}
+
+# Parameter and return types of the builtins every engine defines.
+builtins = {
+    "clock": ([], frozenset([NUMBER])),
+    "print": ([ANY], frozenset([NIL])),
+    "len": ([frozenset([ARRAY, STRING])], frozenset([NUMBER])),
+    "range": ([frozenset([NUMBER])], frozenset([ARRAY])),
+    "open": ([frozenset([STRING])], frozenset([NUMBER])),
+    "lines": ([frozenset([NUMBER])], frozenset([LINES])),
+    "read_bytes": ([frozenset([NUMBER])] * 3, frozenset([ARRAY])),
+}
+
+# Operators that work elementwise on arrays.
+array_operators = [tt.PLUS, tt.MINUS, tt.STAR, tt.SLASH]
+array_updates   = [tt.PLUS_EQUAL, tt.MINUS_EQUAL, tt.STAR_EQUAL, tt.SLASH_EQUAL]
+
+def describe(types) -> str:
+    return " or ".join(family_names[family] for family in sorted(types)) or "nothing"
+
+def declared_families(var_type):
+    if var_type in coercions:
+        return frozenset([NUMBER])
+    elif var_type == tt.STR:
+        return frozenset([STRING])
+    elif var_type == tt.BOOL:
+        return frozenset([BOOLEAN])
+    elif type(var_type) == ArrayType:
+        return frozenset([ARRAY])
+    return None
+
+# Parameter types (None for untyped ones) and return type of a 'fn'.
+class Signature:
+    def __init__(self, params, returns):
+        self.params  = params
+        self.returns = returns
+
+class Symbol:
+    def __init__(self, name: str, families, accepts, builtin=None, signature=None, kind=None):
+        self.name      = name
+        self.families  = frozenset(families)
+        self.accepts   = frozenset(accepts)
+        self.builtin   = builtin
+        self.signature = signature
+        # Set for names that cannot be assigned to.
+        self.kind      = kind
+
+class TypeChecker(Visitor, VisitorStmt):
+    def __init__(self, fluff_instance):
+        self.fluff_instance = fluff_instance
+        self.had_error = False
+        self.scopes = [dict()]
+        # Symbols that hold a non-nil value on every path to the current
+        # point. Values never become nil again once assigned, so loop
+        # bodies can start from the state before the loop.
+        self.non_null = set()
+        # The declarations of the functions being checked, innermost last,
+        # and whether every path so far has returned.
+        self.functions = []
+        self.returned  = False
+
+        for name in builtins:
+            symbol = Symbol(name, [FUNCTION], [], builtin=name, kind="builtin")
+            self.scopes[0][name] = symbol
+            self.non_null.add(symbol)
+
+    # A global the program finds defined, with a value of var_type, when it
+    # starts (see program.py).
+    def defineGlobal(self, name: str, var_type):
+        families = declared_families(var_type)
+        symbol   = Symbol(name, families, families)
+        self.scopes[0][name] = symbol
+        self.non_null.add(symbol)
+
+    def check(self, statements: List[Stmt]) -> bool:
+        for stmt in statements:
+            self.checkStmt(stmt)
+        return not self.had_error
+
+    def checkStmt(self, stmt: Stmt):
+        stmt.accept(self)
+
+    def checkExpr(self, expr: Expr):
+        return expr.accept(self)
+
+    def error(self, line: int, message: str):
+        self.had_error = True
+        self.fluff_instance.error(line, message)
+        return frozenset()
+
+    def lookup(self, name: Token):
+        for scope in reversed(self.scopes):
+            if name.lexeme in scope:
+                return scope[name.lexeme]
+        return None
+
+    def declare(self, name: Token, symbol: Symbol):
+        scope = self.scopes[-1]
+        if name.lexeme in scope:
+            self.error(name.line, f"Variable '{name.lexeme}' is already declared in this scope")
+        scope[name.lexeme] = symbol
+
+    def typeOf(self, symbol: Symbol):
+        if symbol in self.non_null:
+            return symbol.families
+        return symbol.families | {NIL}
+
+    def visitLiteralExpr(self, expr: LiteralExpr):
+        value = expr.value
+        if value is None:
+            return frozenset([NIL])
+        elif type(value) == bool:
+            return frozenset([BOOLEAN])
+        elif type(value) == str:
+            return frozenset([STRING])
+        elif type(value) in [int, float, Decimal]:
+            return frozenset([NUMBER])
+        return ANY
+
+    def visitGroupingExpr(self, expr: GroupingExpr):
+        return self.checkExpr(expr.expression)
+
+    def visitUnaryExpr(self, expr: UnaryExpr):
+        right = self.checkExpr(expr.right)
+
+        if expr.operator.type == tt.NOT:
+            return frozenset([BOOLEAN])
+        if right <= {ARRAY} and len(right) > 0:
+            return frozenset([ARRAY])
+        if not right <= {NUMBER}:
+            return self.error(expr.operator.line, f"Type error: operand of '-' must be numeric, had {describe(right)}")
+        return frozenset([NUMBER])
+
+    def visitBinaryExpr(self, expr: BinaryExpr):
+        left     = self.checkExpr(expr.left)
+        right    = self.checkExpr(expr.right)
+        operator = expr.operator
+
+        if operator.type in [tt.EQUAL_EQUAL, tt.NOT_EQUAL]:
+            return frozenset([BOOLEAN])
+
+        if ARRAY in left | right and left | right <= {NUMBER, ARRAY}:
+            if operator.type not in array_operators:
+                return self.error(operator.line, f"Type error: '{operator.lexeme}' is not supported on arrays")
+            return frozenset([ARRAY])
+
+        if operator.type in [tt.PLUS, tt.GREATER, tt.GREATER_EQUAL, tt.LESS, tt.LESS_EQUAL]:
+            if not (left | right <= {NUMBER} or left | right <= {STRING}):
+                return self.error(operator.line, f"Type error: operands of '{operator.lexeme}' must be two numbers or two strings, had {describe(left)} and {describe(right)}")
+            return left | right if operator.type == tt.PLUS else frozenset([BOOLEAN])
+
+        if not left | right <= {NUMBER}:
+            return self.error(operator.line, f"Type error: operands of '{operator.lexeme}' must be numeric, had {describe(left)} and {describe(right)}")
+        return frozenset([NUMBER])
+
+    def visitLogicalExpr(self, expr: LogicalExpr):
+        left = self.checkExpr(expr.left)
+
+        # The right operand may not run, so nothing it assigns counts.
+        before = set(self.non_null)
+        right  = self.checkExpr(expr.right)
+        self.non_null = before
+
+        return left | right
+
+    def visitVarExpr(self, expr: VarExpr):
+        symbol = self.lookup(expr.name)
+        if symbol is None:
+            return self.error(expr.name.line, f"Undefined variable '{expr.name.lexeme}'")
+        return self.typeOf(symbol)
+
+    def visitAssignExpr(self, expr: AssignExpr):
+        value = self.checkExpr(expr.value)
+        name  = expr.name
+
+        if expr.assign:
+            self.declareInferred(name, value)
+            return value
+
+        symbol = self.lookup(name)
+        if symbol is None:
+            self.error(name.line, f"Assigning to undefined variable '{name.lexeme}'")
+        elif symbol.kind is not None:
+            self.error(name.line, f"Type error: cannot assign to {symbol.kind} '{name.lexeme}'")
+        elif not value <= symbol.accepts:
+            self.error(name.line, f"Type error: assigning {describe(value)} to '{name.lexeme}', which holds {describe(symbol.accepts)}")
+        elif NIL not in value:
+            self.non_null.add(symbol)
+        return value
+
+    def declareInferred(self, name: Token, value):
+        # ':=' fixes the variable's type from the first value stored in it.
+        for families in [{NUMBER}, {STRING}, {BOOLEAN}, {ARRAY}]:
+            if value <= families:
+                symbol = Symbol(name.lexeme, families, families)
+                self.declare(name, symbol)
+                self.non_null.add(symbol)
+                return
+
+        if value <= {NIL, FUNCTION}:
+            self.declare(name, Symbol(name.lexeme, [NIL, FUNCTION], [NIL, FUNCTION]))
+        else:
+            self.error(name.line, f"Type error: cannot infer a type for '{name.lexeme}' from {describe(value)}; declare it with an explicit type")
+            self.declareUnknown(name)
+
+    def declareUnknown(self, name: Token):
+        # Declared, but already reported; reads and writes are not checked.
+        symbol = Symbol(name.lexeme, [], ANY)
+        self.declare(name, symbol)
+        self.non_null.add(symbol)
+
+    def visitAssignUpdateExpr(self, expr: AssignUpdateExpr):
+        value    = self.checkExpr(expr.value)
+        name     = expr.name
+        operator = expr.operator
+        symbol   = self.lookup(name)
+
+        if symbol is None:
+            return self.error(name.line, f"Assigning to undefined variable '{name.lexeme}'")
+        if symbol.kind is not None:
+            return self.error(name.line, f"Type error: cannot assign to {symbol.kind} '{name.lexeme}'")
+
+        if symbol.families == {NUMBER}:
+            expected = frozenset([NUMBER])
+        elif symbol.families == {STRING} and operator.type == tt.PLUS_EQUAL:
+            expected = frozenset([STRING])
+        elif symbol.families == {ARRAY} and operator.type in array_updates:
+            expected = frozenset([NUMBER, ARRAY])
+        else:
+            return self.error(operator.line, f"Type error: '{operator.lexeme}' is not supported on '{name.lexeme}', which holds {describe(symbol.families)}")
+
+        if symbol not in self.non_null:
+            self.error(name.line, f"Type error: '{name.lexeme}' may be nil here")
+        elif not value <= expected:
+            self.error(operator.line, f"Type error: '{operator.lexeme}' with {describe(value)} on '{name.lexeme}', which holds {describe(symbol.families)}")
+        return value
+
+    def visitFunctionExpr(self, expr: FunctionExpr):
+        callee    = self.checkExpr(expr.callee)
+        arguments = [self.checkExpr(argument) for argument in expr.arguments]
+
+        # Calls keep their runtime check in every engine, so a variable
+        # that may still be nil is allowed here.
+        if not callee <= {FUNCTION, NIL}:
+            return self.error(expr.paren.line, f"Can only call functions and classes, had {describe(callee)}")
+
+        if type(expr.callee) == VarExpr:
+            symbol = self.lookup(expr.callee.name)
+            if symbol is not None and symbol.builtin is not None:
+                params, returns = builtins[symbol.builtin]
+                if len(arguments) != len(params):
+                    return self.error(expr.paren.line, f"Expected {len(params)} arguments but got {len(arguments)}")
+                for index, (families, argument) in enumerate(zip(params, arguments)):
+                    if not argument <= families:
+                        self.error(expr.paren.line, f"Type error: argument {index + 1} of '{symbol.name}' must be {describe(families)}, had {describe(argument)}")
+                return returns
+            if symbol is not None and symbol.signature is not None:
+                return self.checkCall(expr, symbol, arguments)
+        return ANY
+
+    def checkCall(self, expr: FunctionExpr, symbol: Symbol, arguments):
+        params = symbol.signature.params
+        if len(arguments) != len(params):
+            return self.error(expr.paren.line, f"Expected {len(params)} arguments but got {len(arguments)}")
+
+        for index, (families, argument) in enumerate(zip(params, arguments)):
+            if families is not None and not argument <= families:
+                self.error(expr.paren.line, f"Type error: argument {index + 1} of '{symbol.name}' must be {describe(families)}, had {describe(argument)}")
+        return symbol.signature.returns
+
+    def visitArrayExpr(self, expr: ArrayExpr):
+        for element in expr.elements:
+            value = self.checkExpr(element)
+            if not value <= {NUMBER}:
+                self.error(expr.bracket.line, f"Type error: array elements must be numeric, had {describe(value)}")
+        return frozenset([ARRAY])
+
+    def checkIndex(self, expr):
+        # Indexing keeps its runtime check in every engine, so an array
+        # variable that may still be nil is allowed, as calls are.
+        target = self.checkExpr(expr.object)
+        index  = self.checkExpr(expr.index)
+
+        if not target <= {ARRAY, NIL}:
+            self.error(expr.bracket.line, f"Type error: only arrays can be indexed, had {describe(target)}")
+        if not index <= {NUMBER}:
+            self.error(expr.bracket.line, f"Type error: array index must be numeric, had {describe(index)}")
+
+    def visitIndexExpr(self, expr: IndexExpr):
+        self.checkIndex(expr)
+        return frozenset([NUMBER])
+
+    def visitSetIndexExpr(self, expr: SetIndexExpr):
+        self.checkIndex(expr)
+        value = self.checkExpr(expr.value)
+
+        if not value <= {NUMBER}:
+            self.error(expr.bracket.line, f"Type error: array elements must be numeric, had {describe(value)}")
+        return value
+
+    def visitRangeExpr(self, expr: RangeExpr):
+        bounds = [expr.start, expr.end] + ([expr.step] if expr.step is not None else [])
+        for bound in bounds:
+            value = self.checkExpr(bound)
+            if not value <= {NUMBER}:
+                self.error(expr.operator.line, f"Type error: range bounds must be numeric, had {describe(value)}")
+        return frozenset([RANGE])
+
+    # The types of the values a loop over expr takes.
+    def checkIterable(self, keyword: Token, expr: Expr):
+        # Iterating keeps its runtime check, as indexing does.
+        iterable = self.checkExpr(expr)
+        if not iterable <= {RANGE, ARRAY, LINES, NIL}:
+            self.error(keyword.line, f"Type error: can only iterate over ranges, arrays and lines, had {describe(iterable)}")
+            return frozenset()
+
+        values = set()
+        if iterable & {RANGE, ARRAY}:
+            values.add(NUMBER)
+        if LINES in iterable:
+            values.add(STRING)
+        return frozenset(values)
+
+    def visitParallelExpr(self, expr: ParallelExpr):
+        if STRING in self.checkIterable(expr.keyword, expr.iterable):
+            self.error(expr.keyword.line, "Type error: parallel cannot split the lines of a file")
+
+        # The body may run zero times, and what it assigns is its own.
+        before = set(self.non_null)
+        self.scopes.append(dict())
+        try:
+            symbol = Symbol(expr.name.lexeme, [NUMBER], [NUMBER])
+            self.declare(expr.name, symbol)
+            self.non_null.add(symbol)
+            body = self.checkExpr(expr.body)
+        finally:
+            self.scopes.pop()
+            self.non_null = before
+
+        reduction = expr.reduction.lexeme
+        if not body <= {NUMBER}:
+            return self.error(expr.reduction.line, f"Type error: parallel {reduction} needs numbers, had {describe(body)}")
+        if reduction == "collect":
+            return frozenset([ARRAY])
+        if reduction == "sum":
+            return frozenset([NUMBER])
+        # No iterations have no minimum or maximum.
+        return frozenset([NUMBER, NIL])
+
+    def visitExpressionStmt(self, stmt: ExpressionStmt):
+        self.checkExpr(stmt.expr)
+
+    def visitVarStmt(self, stmt: VarStmt):
+        value = self.checkExpr(stmt.initializer) if stmt.initializer is not None else frozenset([NIL])
+        name  = stmt.name
+
+        families = declared_families(stmt.var_type)
+        if families is None:
+            self.error(name.line, f"Type error: variables of type '{stmt.var_type.name.lower()}' are not supported")
+            self.declareUnknown(name)
+            return
+
+        symbol = Symbol(name.lexeme, families, families)
+        if not value <= families | {NIL}:
+            self.error(name.line, f"Type error: expected {describe(families)}, had {describe(value)}")
+        self.declare(name, symbol)
+
+        if NIL not in value:
+            self.non_null.add(symbol)
+        else:
+            self.non_null.discard(symbol)
+
+    def visitBlockStmt(self, stmt: BlockStmt):
+        self.scopes.append(dict())
+        try:
+            for statement in stmt.statements:
+                self.checkStmt(statement)
+        finally:
+            self.scopes.pop()
+
+    def visitIfStmt(self, stmt: IfStmt):
+        self.checkExpr(stmt.condition)
+
+        before   = set(self.non_null)
+        returned = self.returned
+        self.checkStmt(stmt.thenBranch)
+        after_then, then_returned = self.non_null, self.returned
+
+        self.non_null = set(before)
+        self.returned = returned
+        if stmt.elseBranch is not None:
+            self.checkStmt(stmt.elseBranch)
+
+        # A branch that returned does not reach the code after the if.
+        if self.returned:
+            self.non_null = after_then
+        elif not then_returned:
+            self.non_null &= after_then
+        self.returned = self.returned and then_returned
+
+    def visitWhileStmt(self, stmt: WhileStmt):
+        self.checkLoop(stmt.condition, stmt.body)
+
+    def visitForStmt(self, stmt: ForStmt):
+        values = self.checkIterable(stmt.keyword, stmt.iterable)
+
+        # The body may run zero times. Its locals share the loop
+        # variable's scope, as the resolver has them.
+        before   = set(self.non_null)
+        returned = self.returned
+        self.scopes.append(dict())
+        try:
+            symbol = Symbol(stmt.name.lexeme, values, values)
+            self.declare(stmt.name, symbol)
+            self.non_null.add(symbol)
+            statements = stmt.body.statements if type(stmt.body) == BlockStmt else [stmt.body]
+            for statement in statements:
+                self.checkStmt(statement)
+        finally:
+            self.scopes.pop()
+            self.non_null = before
+            self.returned = returned
+
+    def checkLoop(self, condition: Expr, body: Stmt):
+        self.checkExpr(condition)
+
+        # The body may run zero times.
+        before   = set(self.non_null)
+        returned = self.returned
+        self.checkStmt(body)
+        self.non_null = before
+        self.returned = returned
+
+    def visitFunctionStmt(self, stmt: FunctionStmt):
+        params  = [declared_families(param.var_type) for param in stmt.params]
+        returns = declared_families(stmt.result.var_type) if stmt.result is not None else ANY
+
+        symbol = Symbol(stmt.name.lexeme, [FUNCTION], [], signature=Signature(params, returns), kind="function")
+        self.declare(stmt.name, symbol)
+        self.non_null.add(symbol)
+
+        # The body runs later, if at all: nothing it assigns counts here.
+        before   = set(self.non_null)
+        returned = self.returned
+        self.scopes.append(dict())
+        self.functions.append(stmt)
+        self.returned = False
+        try:
+            for param, families in zip(stmt.params, params):
+                if families is None:
+                    # Untyped parameters take any value and are not checked.
+                    param_symbol = Symbol(param.name.lexeme, [], ANY, kind="untyped parameter")
+                else:
+                    param_symbol = Symbol(param.name.lexeme, families, families)
+                self.declare(param.name, param_symbol)
+                self.non_null.add(param_symbol)
+
+            for statement in stmt.body:
+                self.checkStmt(statement)
+
+            if stmt.result is not None and not self.returned:
+                self.error(stmt.name.line, f"Type error: '{stmt.name.lexeme}' may end without returning {describe(returns)}")
+        finally:
+            self.functions.pop()
+            self.scopes.pop()
+            self.non_null = before
+            self.returned = returned
+
+    def visitReturnStmt(self, stmt: ReturnStmt):
+        value    = self.checkExpr(stmt.value) if stmt.value is not None else frozenset([NIL])
+        function = self.functions[-1]
+
+        if function.result is not None:
+            expected = declared_families(function.result.var_type)
+            if not value <= expected:
+                self.error(stmt.keyword.line, f"Type error: '{function.name.lexeme}' must return {describe(expected)}, had {describe(value)}")
+        self.returned = True
@@ -0,0 +1,387 @@
+from .compiler import Compiler, Chunk, OpCode, FunctionCode, ParallelCode
+from .environment import Environment, UncheckedEnvironment, UNDEFINED
+from .runtime_error import RuntimeError
+from .output import stdout
+from .fluff_callable import FluffCallable, CallError, Clock, Print, Len, Range, Open, Lines, ReadBytes
+from .files import Files
+from .fluff_function import FluffFunction, bind_arguments, convert_result
+from .stmt import Stmt
+from .numeric import number_types
+from .fluff_array import FluffArray, literal, get_index, set_index, binary as array_binary
+from .rope import flatten
+from .ranges import make_range, iterate
+from .parallel import run_parallel
+from typing import List
+
+LOAD_CONST  = int(OpCode.LOAD_CONST)
+LOAD_VAR    = int(OpCode.LOAD_VAR)
+STORE_VAR   = int(OpCode.STORE_VAR)
+DEFINE_VAR  = int(OpCode.DEFINE_VAR)
+ASSIGN_VAR  = int(OpCode.ASSIGN_VAR)
+UPDATE_VAR  = int(OpCode.UPDATE_VAR)
+POP         = int(OpCode.POP)
+ADD         = int(OpCode.ADD)
+SUB         = int(OpCode.SUB)
+MUL         = int(OpCode.MUL)
+DIV         = int(OpCode.DIV)
+GT          = int(OpCode.GT)
+GE          = int(OpCode.GE)
+LT          = int(OpCode.LT)
+LE          = int(OpCode.LE)
+EQ          = int(OpCode.EQ)
+NE          = int(OpCode.NE)
+NEG         = int(OpCode.NEG)
+NOT         = int(OpCode.NOT)
+JUMP                 = int(OpCode.JUMP)
+JUMP_IF_FALSE        = int(OpCode.JUMP_IF_FALSE)
+JUMP_IF_NOT_TRUE     = int(OpCode.JUMP_IF_NOT_TRUE)
+JUMP_IF_FALSE_OR_POP = int(OpCode.JUMP_IF_FALSE_OR_POP)
+JUMP_IF_TRUE_OR_POP  = int(OpCode.JUMP_IF_TRUE_OR_POP)
+CALL        = int(OpCode.CALL)
+PUSH_SCOPE  = int(OpCode.PUSH_SCOPE)
+POP_SCOPE   = int(OpCode.POP_SCOPE)
+HALT        = int(OpCode.HALT)
+RESET_SCOPE = int(OpCode.RESET_SCOPE)
+DEFINE_FUNCTION = int(OpCode.DEFINE_FUNCTION)
+RETURN          = int(OpCode.RETURN)
+BUILD_ARRAY = int(OpCode.BUILD_ARRAY)
+INDEX       = int(OpCode.INDEX)
+SET_INDEX   = int(OpCode.SET_INDEX)
+LOAD_ROPE   = int(OpCode.LOAD_ROPE)
+APPEND_VAR  = int(OpCode.APPEND_VAR)
+BUILD_RANGE = int(OpCode.BUILD_RANGE)
+PARALLEL    = int(OpCode.PARALLEL)
+GET_ITER    = int(OpCode.GET_ITER)
+FOR_ITER    = int(OpCode.FOR_ITER)
+FOR_NEXT    = int(OpCode.FOR_NEXT)
+
+class VM:
+    def __init__(self, fluff_instance, numeric: str = "native", checked: bool = True):
+        self.fluff_instance = fluff_instance
+        self.global_slots = dict()
+        self.globals = Environment() if checked else UncheckedEnvironment()
+        self.environment = self.globals
+        self.memoized = []
+        self.files = Files()
+        self.output = getattr(fluff_instance, "output", stdout)
+        self.defineGlobal("clock", Clock(numeric))
+        self.defineGlobal("print", Print(self.output))
+        self.defineGlobal("len", Len())
+        self.defineGlobal("range", Range())
+        self.defineGlobal("open", Open(self.files))
+        self.defineGlobal("lines", Lines(self.files))
+        self.defineGlobal("read_bytes", ReadBytes(self.files))
+
+    def defineGlobal(self, name: str, value):
+        slot = self.global_slots.setdefault(name, len(self.global_slots))
+        self.globals.grow(len(self.global_slots))
+        self.globals.define(slot, name, value)
+
+    def interpret(self, statements: List[Stmt]):
+        chunk = Compiler().compile(statements)
+        self.globals.grow(len(self.global_slots))
+        try:
+            self.run(chunk)
+        except RuntimeError as e:
+            self.fluff_instance.runtimeError(e)
+        finally:
+            self.environment = self.globals
+            self.output.flush()
+            self.files.close()
+
+    def function(self, code: FunctionCode, closure: Environment):
+        declaration = code.declaration
+        chunk       = code.chunk
+
+        def invoke(*arguments):
+            environment = type(closure)(closure, declaration.size)
+            bind_arguments(declaration, environment, arguments)
+
+            previous = self.environment
+            self.environment = environment
+            try:
+                value = self.run(chunk)
+            finally:
+                self.environment = previous
+            return convert_result(declaration, environment, value)
+
+        function = FluffFunction(declaration.name, len(declaration.params), invoke, declaration.memo)
+        if declaration.memo is not None:
+            self.memoized.append(function)
+        return function
+
+    def parallel(self, code: ParallelCode, closure: Environment, iterable):
+        expr  = code.expression
+        chunk = code.chunk
+
+        def body(value):
+            environment = type(closure)(closure, expr.size)
+            environment.assign(expr.slot, expr.name, value)
+
+            previous = self.environment
+            self.environment = environment
+            try:
+                return self.run(chunk)
+            finally:
+                self.environment = previous
+
+        return run_parallel(expr.reduction, iterate(expr.keyword, iterable), body)
+
+    def run(self, chunk: Chunk):
+        code      = chunk.code
+        constants = chunk.constants
+        env       = self.environment
+        frames    = env.frames
+        stack     = []
+        push      = stack.append
+        pop       = stack.pop
+        ip        = 0
+
+        while True:
+            op = code[ip]
+
+            if op == LOAD_VAR:
+                value = frames[code[ip + 1]][code[ip + 2]]
+                if value is UNDEFINED:
+                    name = constants[code[ip + 3]]
+                    raise RuntimeError(name, f"Undefined variable '{name.lexeme}'")
+                push(value)
+                ip += 4
+            elif op == LOAD_CONST:
+                push(constants[code[ip + 1]])
+                ip += 2
+            elif op == JUMP_IF_FALSE:
+                if pop():
+                    ip += 2
+                else:
+                    ip = code[ip + 1]
+            elif op == JUMP:
+                ip = code[ip + 1]
+            elif op == FOR_ITER:
+                value = next(stack[-1], UNDEFINED)
+                if value is UNDEFINED:
+                    pop()
+                    ip = code[ip + 2]
+                else:
+                    values = env.values
+                    slot   = code[ip + 1]
+                    values[:] = constants[code[ip + 3]]
+                    values[slot] = value
+                    if env.og_types[slot] is None:
+                        # Values of a range or an array share one type.
+                        env.og_types[slot] = env.getTokenType(value)
+                    ip += 4
+            elif op == UPDATE_VAR:
+                env.update_in_place(code[ip + 1], code[ip + 2], constants[code[ip + 3]], constants[code[ip + 4]], stack[-1])
+                ip += 5
+            elif op == POP:
+                pop()
+                ip += 1
+            elif op == ADD:
+                right = pop()
+                left  = pop()
+                if type(left) in number_types and type(right) in number_types or type(left) == str and type(right) == str:
+                    push(left + right)
+                elif type(left) is FluffArray or type(right) is FluffArray:
+                    push(array_binary(constants[code[ip + 1]], left, right))
+                else:
+                    raise RuntimeError(constants[code[ip + 1]], "Operands must be two numbers or two strings")
+                ip += 2
+            elif op == SUB:
+                right = pop()
+                left  = pop()
+                try:
+                    push(left - right)
+                except TypeError:
+                    # Array operands Python rejects (lengths that differ,
+                    # ordering) become errors at the operator.
+                    if type(left) is not FluffArray and type(right) is not FluffArray:
+                        raise
+                    push(array_binary(constants[code[ip + 1]], left, right))
+                ip += 2
+            elif op == MUL:
+                right = pop()
+                left  = pop()
+                try:
+                    push(left * right)
+                except TypeError:
+                    if type(left) is not FluffArray and type(right) is not FluffArray:
+                        raise
+                    push(array_binary(constants[code[ip + 1]], left, right))
+                ip += 2
+            elif op == DIV:
+                right = pop()
+                left  = pop()
+                try:
+                    push(left / right)
+                except TypeError:
+                    if type(left) is not FluffArray and type(right) is not FluffArray:
+                        raise
+                    push(array_binary(constants[code[ip + 1]], left, right))
+                ip += 2
+            elif op == LT:
+                right = pop()
+                left  = pop()
+                try:
+                    push(left < right)
+                except TypeError:
+                    if type(left) is not FluffArray and type(right) is not FluffArray:
+                        raise
+                    push(array_binary(constants[code[ip + 1]], left, right))
+                ip += 2
+            elif op == LE:
+                right = pop()
+                left  = pop()
+                try:
+                    push(left <= right)
+                except TypeError:
+                    if type(left) is not FluffArray and type(right) is not FluffArray:
+                        raise
+                    push(array_binary(constants[code[ip + 1]], left, right))
+                ip += 2
+            elif op == GT:
+                right = pop()
+                left  = pop()
+                try:
+                    push(left > right)
+                except TypeError:
+                    if type(left) is not FluffArray and type(right) is not FluffArray:
+                        raise
+                    push(array_binary(constants[code[ip + 1]], left, right))
+                ip += 2
+            elif op == GE:
+                right = pop()
+                left  = pop()
+                try:
+                    push(left >= right)
+                except TypeError:
+                    if type(left) is not FluffArray and type(right) is not FluffArray:
+                        raise
+                    push(array_binary(constants[code[ip + 1]], left, right))
+                ip += 2
+            elif op == EQ:
+                right = pop()
+                push(pop() == right)
+                ip += 2
+            elif op == NE:
+                right = pop()
+                push(pop() != right)
+                ip += 2
+            elif op == STORE_VAR:
+                env.update(code[ip + 1], code[ip + 2], constants[code[ip + 3]], stack[-1])
+                ip += 4
+            elif op == PUSH_SCOPE:
+                env    = type(env)(env, code[ip + 1])
+                frames = env.frames
+                self.environment = env
+                ip += 2
+            elif op == RESET_SCOPE:
+                env.values[:] = constants[code[ip + 1]]
+                ip += 2
+            elif op == POP_SCOPE:
+                env    = env.enclosing
+                frames = env.frames
+                self.environment = env
+                ip += 1
+            elif op == JUMP_IF_NOT_TRUE:
+                value = pop()
+                if value == 'true' or value and value != 'false':
+                    ip += 2
+                else:
+                    ip = code[ip + 1]
+            elif op == JUMP_IF_FALSE_OR_POP:
+                if stack[-1]:
+                    pop()
+                    ip += 2
+                else:
+                    ip = code[ip + 1]
+            elif op == JUMP_IF_TRUE_OR_POP:
+                if stack[-1]:
+                    ip = code[ip + 1]
+                else:
+                    pop()
+                    ip += 2
+            elif op == CALL:
+                argc      = code[ip + 1]
+                arguments = stack[len(stack) - argc:]
+                del stack[len(stack) - argc:]
+                callee    = pop()
+                paren     = constants[code[ip + 2]]
+
+                if not isinstance(callee, FluffCallable):
+                    raise RuntimeError(paren, "Can only call functions and classes")
+
+                if argc != callee.arity():
+                    raise RuntimeError(paren, f"Expected {callee.arity()} arguments but got {argc}")
+
+                try:
+                    push(callee.call(self, arguments))
+                except CallError as error:
+                    raise RuntimeError(paren, str(error))
+                ip += 3
+            elif op == DEFINE_VAR:
+                env.define(code[ip + 1], constants[code[ip + 2]], pop())
+                ip += 3
+            elif op == ASSIGN_VAR:
+                env.assign(code[ip + 1], constants[code[ip + 2]], stack[-1])
+                ip += 3
+            elif op == NEG:
+                push(-pop())
+                ip += 1
+            elif op == NOT:
+                push(not pop())
+                ip += 1
+            elif op == RETURN:
+                return pop()
+            elif op == DEFINE_FUNCTION:
+                code_object = constants[code[ip + 2]]
+                env.define(code[ip + 1], code_object.declaration, self.function(code_object, env))
+                ip += 3
+            elif op == BUILD_ARRAY:
+                count    = code[ip + 1]
+                elements = stack[len(stack) - count:]
+                del stack[len(stack) - count:]
+                push(literal(constants[code[ip + 2]], elements))
+                ip += 3
+            elif op == INDEX:
+                index = pop()
+                push(get_index(constants[code[ip + 1]], pop(), index))
+                ip += 2
+            elif op == SET_INDEX:
+                value = pop()
+                index = pop()
+                push(set_index(constants[code[ip + 1]], pop(), index, value))
+                ip += 2
+            elif op == LOAD_ROPE:
+                value = frames[code[ip + 1]][code[ip + 2]]
+                if value is UNDEFINED:
+                    name = constants[code[ip + 3]]
+                    raise RuntimeError(name, f"Undefined variable '{name.lexeme}'")
+                push(flatten(value))
+                ip += 4
+            elif op == APPEND_VAR:
+                env.append(code[ip + 1], code[ip + 2], constants[code[ip + 3]], constants[code[ip + 4]], stack[-1])
+                ip += 5
+            elif op == BUILD_RANGE:
+                step = pop()
+                end  = pop()
+                push(make_range(constants[code[ip + 1]], pop(), end, step))
+                ip += 2
+            elif op == PARALLEL:
+                push(self.parallel(constants[code[ip + 1]], env, pop()))
+                ip += 2
+            elif op == GET_ITER:
+                push(iter(iterate(constants[code[ip + 1]], pop())))
+                ip += 2
+            elif op == FOR_NEXT:
+                value = next(stack[-1], UNDEFINED)
+                if value is UNDEFINED:
+                    pop()
+                    ip = code[ip + 1]
+                else:
+                    push(value)
+                    ip += 2
+            elif op == HALT:
+                return
+            else:
+                raise ValueError(f"Unknown opcode {op} at {ip}")
@@ -1,49 +1,80 @@
 import argparse
+import json
+import os
+import sys
 import fluff
-from fluff import TokenType as tt
-
-
-class FluffInterpreter:
-    def run_file(self, file_bytes: bytes):
-        self.hadError = False
-        self.hadRuntimeError = False
-        scanner     = fluff.Scanner(file_bytes, self)
-        tokens      = scanner.scanTokens()
-        parser      = fluff.Parser(self, tokens)
-        statements  = parser.parse()
-        interpreter = fluff.Interpreter(self)
-
-        if self.hadError:
-            return
-        else:
-            #print([str(statement) for statement in tokens])
-            interpreter.interpret(statements)
-            #print(interpreter.environment.values)
-    
-    def error(self, line, message):
-        self.report(line, "", message)
-    
-    def runtimeError(self, error: fluff.runtime_error.RuntimeError):
-        self.hadRuntimeError = True
-        print(f"[line {error.token.line}]: {error.message}")
-    
-    def error_t(self, token: fluff.Token, message: str):
-        if token.type == tt.EOF:
-            self.report(token.line, " at end", message)
-        else:
-            self.report(token.line, f"at '{token.lexeme}'", message)
-
-    def report(self, line, where, message):
-        print(f"[line {line}] Error {where}: {message}")
-        self.hadError = True
+from fluff.fluff_interpreter import FluffInterpreter, engines
+from fluff.output import Output, policies
+from fluff import server, batch
 
 
+if sys.argv[1:2] == ['serve']:
+    parser = argparse.ArgumentParser(prog='main.py serve', description='Keep a warm interpreter running and execute programs sent by client.py')
+    parser.add_argument('--socket', help='Unix socket to listen on (default: $FLUFF_SOCKET or a per-user path in the temp directory)', default=server.default_socket_path())
+    parser.add_argument('--workers', help='Number of pre-forked worker processes', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(sys.argv[2:])
+
+    server.serve(args.socket, args.workers)
+    sys.exit(0)
 
 parser = argparse.ArgumentParser(description='Interpreter for the Fluff programming language')
-parser.add_argument('file', help='File to execute', type=argparse.FileType('rb'))
+parser.add_argument('files', help='File to execute; several files run as a batch (see -j)', nargs='*', metavar='file')
+parser.add_argument('--manifest', help='Run the scripts listed in FILE, one path per line relative to it, as a batch', metavar='FILE')
+parser.add_argument('-j', dest='jobs', help='Worker processes to run a batch on (default: one per CPU)', type=int, default=os.cpu_count() or 1, metavar='N')
+parser.add_argument('--summary', help="Write the JSON summary of a batch (every script's output, time and exit status) to FILE instead of stdout", type=argparse.FileType('w'), metavar='FILE')
+parser.add_argument('--engine', help='Execution engine to run the program with', choices=engines.keys(), default='tree')
+parser.add_argument('--dump-python', help='Write the Python source generated by the python engine to a file (implies --engine=python)', type=argparse.FileType('w'), metavar='FILE')
+parser.add_argument('--numeric', help='Runtime representation of numbers: machine-width int/float, or arbitrary-precision Decimal as in older releases', choices=['native', 'decimal'], default='native')
+parser.add_argument('-O', dest='optimize', help='Fold constants and remove dead branches before running', action='store_true')
+parser.add_argument('--dump-ast', help='Write the (optimized, with -O) syntax tree to a file', type=argparse.FileType('w'), metavar='FILE')
+parser.add_argument('--no-cache', dest='use_cache', help=f"Always re-parse instead of reusing the tree cached in {fluff.cache.CACHE_DIR}", action='store_false')
+parser.add_argument('--profile', help='Sample the running program; write collapsed stacks (for flame graph tools) to FILE and print the hottest lines to stderr', type=argparse.FileType('w'), metavar='FILE')
+parser.add_argument('--typecheck', help='Check types before running and report every mismatch; programs that pass run without runtime type checks', action='store_true')
+parser.add_argument('--parallel-workers', help='Processes to run parallel expressions on (default: one per CPU; 1 runs them in the interpreter process)', type=int, default=fluff.parallel.workers, metavar='N')
+parser.add_argument('--output', help='Write what the program prints to FILE instead of stdout', type=argparse.FileType('w'), metavar='FILE')
+parser.add_argument('--flush', help='When printed output is written out: after every line, once the buffer fills, or only when the program ends (default: line on a terminal, size otherwise)', choices=policies)
+parser.add_argument('--memo-stats', help='Print hits, misses and cache size of every @memo function to stderr after the run', action='store_true')
 args = parser.parse_args()
 
-fluff_i = FluffInterpreter()
+if args.profile is not None and (args.engine not in ['tree', 'vm'] or args.dump_python is not None):
+    parser.error("--profile is only supported by the tree and vm engines")
+
+fluff.parallel.workers = args.parallel_workers
+
+if args.manifest is not None or len(args.files) > 1:
+    for flag, value in [('--dump-python', args.dump_python), ('--dump-ast', args.dump_ast), ('--profile', args.profile),
+                        ('--output', args.output), ('--flush', args.flush), ('--memo-stats', args.memo_stats)]:
+        if value:
+            parser.error(f"{flag} only applies to a single file")
+
+    paths = list(args.files)
+    if args.manifest is not None:
+        try:
+            paths += batch.read_manifest(args.manifest)
+        except OSError as e:
+            parser.error(f"argument --manifest: can't open '{args.manifest}': {e}")
+
+    options = {"engine": args.engine, "numeric": args.numeric, "optimize": args.optimize, "use_cache": args.use_cache, "typecheck": args.typecheck}
+    summary = batch.run_batch(paths, args.jobs, options)
+
+    out = args.summary if args.summary is not None else sys.stdout
+    json.dump(summary, out, indent=2)
+    out.write("\n")
+    out.flush()
+    sys.exit(1 if summary["failed"] else 0)
+
+if len(args.files) == 0:
+    parser.error("the following arguments are required: file")
+
+try:
+    file = sys.stdin.buffer if args.files[0] == '-' else open(args.files[0], 'rb')
+except OSError as e:
+    parser.error(f"argument file: can't open '{args.files[0]}': {e}")
+
+fluff_i = FluffInterpreter(Output(args.output, args.flush))
+
+path    = file.name if file is not sys.stdin.buffer else None
 
-fluff_i.run_file(args.file.read())
+fluff_i.run_file(file.read(), args.engine, args.dump_python, args.numeric, args.optimize, args.dump_ast, path, args.use_cache, args.profile, args.typecheck, sys.stderr if args.memo_stats else None)
+sys.exit(batch.exit_status(fluff_i))
 
@@ -0,0 +1,59 @@
+import io
+import os
+import sys
+import unittest
+
+# The repository, where main.py and client.py are.
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, root)
+
+import fluff
+from fluff.fluff_interpreter import FluffInterpreter, engines
+from fluff.output import Output
+from fluff.type_checker import TypeChecker
+
+# What source (str or bytes) prints on engine, error reports included.
+# options are passed on to run_file (optimize, typecheck, numeric, ...).
+def run(source, engine: str = "tree", **options) -> str:
+    if type(source) is str:
+        source = source.encode('utf-8')
+    output = io.StringIO()
+    FluffInterpreter(Output(output, "exit")).run_file(source, engine, **options)
+    return output.getvalue()
+
+# A FluffInterpreter for driving the scanner, parser or checker directly.
+# What it reported is reports(fluff_i).
+def reporter() -> FluffInterpreter:
+    fluff_i = FluffInterpreter(Output(io.StringIO(), "exit"))
+    fluff_i.hadError = False
+    return fluff_i
+
+def reports(fluff_i: FluffInterpreter) -> str:
+    fluff_i.output.flush()
+    return fluff_i.output.stream.getvalue()
+
+# Whether source parses and passes the TypeChecker.
+def typechecks(source) -> bool:
+    if type(source) is str:
+        source = source.encode('utf-8')
+    fluff_i = reporter()
+    statements = fluff_i.parse(source)
+    return statements is not None and TypeChecker(fluff_i).check(statements)
+
+# Tests that run the same program on every engine.
+class EngineTestCase(unittest.TestCase):
+    # Every engine prints expected.
+    def assertOutput(self, source, expected: str, **options):
+        for engine in engines:
+            with self.subTest(engine=engine, **options):
+                self.assertEqual(run(source, engine, **options), expected)
+
+    # Every engine prints the same with options as the tree engine does
+    # without them, or as expected if given.
+    def assertSameOutput(self, source, expected: str = None, **options):
+        if expected is None:
+            expected = run(source)
+        for engine in engines:
+            with self.subTest(engine=engine, **options):
+                self.assertEqual(run(source, engine, **options), expected)
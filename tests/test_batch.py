@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from helpers import root
+from fluff import batch
+
+scripts = {
+    "first.ff": "int32 total = 0\nfor i in 0..5: total += i\nprint(total)\n",
+    "fails.ff": "print(\"before\")\nprint(missing)\nprint(\"after\")\n",
+    "last.ff": "x := parallel sum for i in 0..10: i\nprint(x)\n",
+}
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.paths = []
+        for name, source in scripts.items():
+            path = os.path.join(self.directory, name)
+            with open(path, 'w') as f:
+                f.write(source)
+            self.paths.append(path)
+
+    def assertSummary(self, summary: dict):
+        self.assertEqual(summary["total"], 3)
+        self.assertEqual(summary["failed"], 1)
+        # Scripts are reported in the order given, each with its own output.
+        self.assertEqual([(script["file"], script["status"], script["stdout"], script["stderr"]) for script in summary["scripts"]], [
+            (self.paths[0], batch.OK, "10\n", ""),
+            (self.paths[1], batch.RUNTIME_ERROR, "before\n[line 2]: Undefined variable 'missing'\n", ""),
+            (self.paths[2], batch.OK, "45\n", ""),
+        ])
+
+    def test_one_failing_script(self):
+        for jobs in [1, 2]:
+            with self.subTest(jobs=jobs):
+                self.assertSummary(batch.run_batch(self.paths, jobs, {"use_cache": False}))
+
+    def test_missing_script(self):
+        missing = os.path.join(self.directory, "missing.ff")
+        summary = batch.run_batch([missing, self.paths[0]], 1, {})
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(summary["scripts"][0]["status"], batch.CANT_OPEN)
+        self.assertEqual(summary["scripts"][0]["stderr"], f"can't open '{missing}': No such file or directory\n")
+        self.assertEqual(summary["scripts"][1]["stdout"], "10\n")
+
+    def test_manifest(self):
+        manifest = os.path.join(self.directory, "scripts.txt")
+        with open(manifest, 'w') as f:
+            f.write("# every script\nfirst.ff\n\nfails.ff\nlast.ff\n")
+        self.assertEqual(batch.read_manifest(manifest), self.paths)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "batch workers are forked")
+    def test_command_line(self):
+        # One failing script fails the whole run, but every script runs.
+        result = subprocess.run([sys.executable, os.path.join(root, "main.py"), "-j", "2", "--no-cache", *self.paths],
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stderr, "")
+        self.assertSummary(json.loads(result.stdout))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+from helpers import fluff, reporter, reports
+from fluff import cache
+from fluff.ast_printer import AstPrinter
+
+source = b"int32 x = 1\nfor i in 0..10..2: { x += i }\nfn int f(int n): { return n * 2 }\nprint(f(x))"
+
+# Unpickling one of these calls record(), so a test can tell whether an
+# entry was unpickled at all.
+unpickled = []
+
+def record():
+    unpickled.append(True)
+    return []
+
+class Recorder:
+    def __reduce__(self):
+        return (record, ())
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, cache.CACHE_DIR, "script.ff.pickle")
+        self.key  = cache.cache_key(source, fluff.__version__, "native", False)
+        unpickled.clear()
+
+    def statements(self):
+        return reporter().parse(source)
+
+    def test_hit(self):
+        statements = self.statements()
+        self.assertTrue(cache.store(self.path, self.key, statements))
+        loaded = cache.load(self.path, self.key)
+        self.assertEqual(AstPrinter().printProgram(loaded), AstPrinter().printProgram(statements))
+
+    def test_miss(self):
+        self.assertIsNone(cache.load(self.path, self.key))
+        self.assertTrue(cache.store(self.path, self.key, self.statements()))
+        for changed in [cache.cache_key(source + b"\n", fluff.__version__, "native", False),
+                        cache.cache_key(source, fluff.__version__, "decimal", False),
+                        cache.cache_key(source, fluff.__version__, "native", True),
+                        cache.cache_key(source, "0.0.0", "native", False)]:
+            self.assertIsNone(cache.load(self.path, changed))
+
+    def test_stale_magic(self):
+        with mock.patch.object(cache, 'MAGIC', cache.MAGIC - 1):
+            stale = cache.cache_key(source, fluff.__version__, "native", False)
+        self.assertNotEqual(stale, self.key)
+        self.assertTrue(cache.store(self.path, stale, self.statements()))
+        self.assertIsNone(cache.load(self.path, self.key))
+
+    def test_key_is_checked_before_unpickling(self):
+        other = cache.cache_key(b"print(1)", fluff.__version__, "native", False)
+        self.assertTrue(cache.store(self.path, other, Recorder()))
+        self.assertIsNone(cache.load(self.path, self.key))
+        self.assertEqual(unpickled, [])
+        # The same entry is unpickled under its own key.
+        self.assertEqual(cache.load(self.path, other), [])
+        self.assertEqual(unpickled, [True])
+
+    def test_corrupt_entries(self):
+        pickled = pickle.dumps(self.statements(), protocol=pickle.HIGHEST_PROTOCOL)
+        header  = self.key.encode('ascii')
+        os.makedirs(os.path.dirname(self.path))
+        for contents in [b"", header[:10], header, header + pickled[:len(pickled) // 2],
+                         header + b"\x00" * 64, header + bytes(range(256)), pickled]:
+            with self.subTest(contents=contents[:80]):
+                with open(self.path, 'wb') as f:
+                    f.write(contents)
+                self.assertIsNone(cache.load(self.path, self.key))
+
+    @unittest.skipUnless(hasattr(os, 'getuid'), "needs POSIX file owners")
+    def test_other_users_entries_are_refused(self):
+        self.assertTrue(cache.store(self.path, self.key, Recorder()))
+        with mock.patch.object(cache.os, 'getuid', return_value=os.getuid() + 1):
+            self.assertIsNone(cache.load(self.path, self.key))
+            self.assertFalse(cache.store(self.path, self.key, self.statements()))
+        self.assertEqual(unpickled, [])
+
+    def test_run_file_reuses_the_tree(self):
+        script = os.path.join(os.path.dirname(os.path.dirname(self.path)), "script.ff")
+        with open(script, 'wb') as f:
+            f.write(source)
+        for _ in range(2):
+            fluff_i = reporter()
+            fluff_i.run_file(source, path=script)
+            self.assertEqual(reports(fluff_i), "42\n")
+        cache_file = cache.cache_path(script, fluff.__version__, "native", False)
+        self.assertIsNotNone(cache.load(cache_file, self.key))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from helpers import EngineTestCase
+
+# A function declared in a loop body keeps the locals of the iteration
+# that declared it.
+class LoopClosureTest(EngineTestCase):
+    def test_while_body(self):
+        self.assertOutput("""
+saved := nil
+int32 i = 0
+while i < 3: {
+  int32 k = i * 10
+  fn int32 get(): { return k }
+  if i == 0: saved = get
+  i += 1
+}
+print(saved())
+print(i)
+""", "0\n3\n")
+
+    def test_for_body(self):
+        self.assertOutput("""
+saved := nil
+for j in 0..3: {
+  int32 m = j * 7
+  fn int32 g(): { return m + j }
+  if j == 1: saved = g
+}
+print(saved())
+""", "8\n")
+
+    def test_return_from_loop_body(self):
+        self.assertOutput("""
+fn int find(int target): {
+  for i in 0..10: {
+    int sq = i * i
+    fn int get(): { return sq }
+    if get() == target: return i
+  }
+  return -1
+}
+print(find(49))
+print(find(5))
+""", "7\n-1\n")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import glob
+import os
+import unittest
+
+from helpers import EngineTestCase, run, typechecks
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# The sample programs in tests/programs and the benchmark programs.
+programs = {
+    "programs": sorted(glob.glob(os.path.join(here, 'programs', '*.ff'))),
+    "benchmark": sorted(glob.glob(os.path.join(here, '..', 'benchmarks', 'programs', '*.ff'))),
+}
+
+# Every engine prints what the tree engine prints, with and without -O.
+# With --typecheck, a program the checker accepts prints the same as it
+# does without; one it rejects is reported the same way by every engine.
+class ConformanceTest(EngineTestCase):
+    def checkProgram(self, path: str):
+        with open(path, 'rb') as f:
+            source = f.read()
+
+        expected = run(source)
+        self.assertSameOutput(source, expected)
+        self.assertSameOutput(source, expected, optimize=True)
+        if typechecks(source):
+            self.assertSameOutput(source, expected, typecheck=True)
+        else:
+            self.assertSameOutput(source, run(source, typecheck=True), typecheck=True)
+
+def make_test(path: str):
+    return lambda self: self.checkProgram(path)
+
+for kind, paths in programs.items():
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        setattr(ConformanceTest, f"test_{kind}_{name}", make_test(path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from helpers import EngineTestCase
+
+class InPlaceUpdateTest(EngineTestCase):
+    # The result of an in-place update is converted to the variable's
+    # type, never its operand.
+    def test_result_is_converted(self):
+        source = """
+x := 5
+x *= 1.5
+print(x)
+int32 y = 10
+y -= 0.5
+print(y)
+int8 z = 100
+print(z += 28.5)
+print(z)
+"""
+        for typecheck in [False, True]:
+            self.assertOutput(source, "7.5\n9\n28.5\n-128\n", typecheck=typecheck)
+
+# ':=' gives a number no type of its own: it holds any number, as a number
+# did before declared types picked int or float.
+class InferredNumberTest(EngineTestCase):
+    def test_fractional_update_is_kept(self):
+        source = """
+acc := 0
+for i in 0..10: { acc += 0.5 }
+print(acc)
+n := 4
+n = 2.9
+print(n)
+for i in 0..2: {
+  i += 0.5
+  print(i)
+}
+"""
+        for typecheck in [False, True]:
+            self.assertOutput(source, "5.0\n2.9\n0.5\n1.5\n", typecheck=typecheck)
+
+    def test_whole_numbers_stay_ints(self):
+        self.assertOutput("n := 0\nn += 3\nn *= 2\nprint(n)", "6\n")
+
+    def test_other_types_are_rejected(self):
+        self.assertOutput("n := 1\nn = \"a\"", "[line 2]: Assigning 'str' to variable with type 'numeric'\n")
+
+# Values a type cannot hold are runtime errors at the variable they are
+# stored in.
+class ConversionErrorTest(EngineTestCase):
+    infinity = "double big = 1.0\nfor i in 0..400: big *= 10.0\n"
+
+    def test_infinity_in_an_int(self):
+        for typecheck in [False, True]:
+            self.assertOutput(self.infinity + "int x = 0\nx += big", "[line 4]: Cannot convert inf to int\n", typecheck=typecheck)
+
+    def test_nan_in_an_int(self):
+        self.assertOutput(self.infinity + "int32 y = big - big", "[line 3]: Cannot convert nan to int32\n")
+
+    def test_infinity_in_an_int_array(self):
+        self.assertOutput(self.infinity + "int[] a = [1, 2]\na[0] = big", "[line 4]: Cannot convert inf to int\n")
+
+    def test_int_too_large_for_a_double(self):
+        self.assertOutput("n := 1\nfor i in 0..400: n *= 10\ndouble d = n", "[line 3]: Cannot convert an int of 1329 bits to double\n")
+
+if __name__ == '__main__':
+    unittest.main()
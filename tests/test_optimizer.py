@@ -0,0 +1,14 @@
+import unittest
+
+from helpers import EngineTestCase
+
+# -O may only make a program faster, never change what it prints.
+class OptimizerTest(EngineTestCase):
+    def test_int_division_by_one(self):
+        self.assertSameOutput("int32 x = 5\nprint(x / 1)\nint y = 7\nprint(y / 1 + 1)", optimize=True)
+
+    def test_multiplication_by_one(self):
+        self.assertSameOutput("int32 x = 5\nprint(x * 1)\nprint(1 * x)\ndouble d = 2.5\nprint(d * 1)\nprint(d / 1)", optimize=True)
+
+if __name__ == '__main__':
+    unittest.main()
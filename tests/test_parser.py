@@ -0,0 +1,110 @@
+import unittest
+
+from helpers import reporter, reports
+from fluff.ast_printer import AstPrinter
+from fluff.parser import Parser
+from fluff.scanner import Scanner
+
+# The parsed program as AstPrinter prints it, and what the parser reported.
+def parse(source: str):
+    fluff_i    = reporter()
+    statements = Parser(fluff_i, Scanner(source.encode('utf-8'), fluff_i).iterTokens()).parse()
+    if fluff_i.hadError:
+        return None, reports(fluff_i)
+    return AstPrinter().printProgram(statements), reports(fluff_i)
+
+class ParserTest(unittest.TestCase):
+    def assertParses(self, source: str, expected: str):
+        tree, errors = parse(source)
+        self.assertEqual(errors, "")
+        self.assertEqual(tree, expected)
+
+    def assertErrors(self, source: str, expected: str):
+        self.assertEqual(parse(source)[1], expected)
+
+    def test_precedence(self):
+        self.assertParses("1 + 2 * 3 - 4 / 5", "(- (+ 1 (* 2 3)) (/ 4 5))")
+        self.assertParses("a < b == c > d", "(== (< a b) (> c d))")
+        self.assertParses("not a and b or c == d < e", "(or (and (not a) b) (== c (< d e)))")
+        self.assertParses("x := a or b", "(:= x (or a b))")
+        self.assertParses("(1 + 2) * 3", "(* (group (+ 1 2)) 3)")
+
+    def test_unary(self):
+        self.assertParses("-a * -b", "(* (- a) (- b))")
+        self.assertParses("1 - -2", "(- 1 (- 2))")
+        self.assertParses("not not a", "(not (not a))")
+        # Calls and indexing bind tighter than a prefix operator.
+        self.assertParses("-f(1)[0]", "(- (index (call f 1) 0))")
+
+    def test_left_associative(self):
+        self.assertParses("a - b - c", "(- (- a b) c)")
+        self.assertParses("a / b * c", "(* (/ a b) c)")
+        self.assertParses("a or b or c", "(or (or a b) c)")
+        self.assertParses("f(1)(2)[3]", "(index (call (call f 1) 2) 3)")
+
+    def test_assignment_is_right_associative(self):
+        self.assertParses("a = b = c", "(= a (= b c))")
+        self.assertParses("x += y = 2", "(+= x (= y 2))")
+        self.assertParses("a[0] = b[1] + 2", "(set-index a 0 (+ (index b 1) 2))")
+
+    def test_ranges(self):
+        self.assertParses("for i in 0..10: i", "(for i (range 0 10) i)")
+        self.assertParses("for i in 10..0..-3: print(i)", "(for i (range 10 0 (- 3)) (call print i))")
+        # Each bound is a whole expression.
+        self.assertParses("for i in 0..n + 1..k * 2: i", "(for i (range 0 (+ n 1) (* k 2)) i)")
+        self.assertParses("x := parallel sum for i in 0..10..2: i * i", "(:= x (parallel sum i (range 0 10 2) (* i i)))")
+        self.assertParses("for x in xs: x", "(for x xs x)")
+
+    def test_statements(self):
+        self.assertParses("int32[] a = [1, 2]", "(var int32[] a (array 1 2))")
+        self.assertParses("if a: b else { c }", "(if a b (block c))")
+        self.assertParses("@memo(8) fn int f(int n): n", "(memo 8 fn int f ((var int n)) n)")
+        # 'return' only takes a value that starts on its own line.
+        self.assertParses("fn f(): {\n  return\n  1\n}", "(fn f () (return) 1)")
+
+    def test_errors(self):
+        self.assertErrors("a + b = 3", "[line 1] Error at '=': Invalid assignment target\n")
+        self.assertErrors("x = * 2", "[line 1] Error at '*': Expected left-hand operand\n")
+        self.assertErrors("print(1", "[line 1] Error at end: Expected ')' after arguments\n")
+        self.assertErrors("(1 + 2", "[line 1] Error at end: Expected ')' after expression\n")
+        self.assertErrors("return 1", "[line 1] Error at 'return': Cannot return from top-level code\n")
+        self.assertErrors("fn f(a, a): a", "[line 1] Error at 'a': Duplicate parameter name\n")
+        self.assertErrors("byte[] a", "[line 1] Error at 'byte': Arrays can only hold numbers\n")
+        self.assertErrors("@memo(0) fn f(): 1", "[line 1] Error at '0': Cache size must be a positive integer\n")
+        self.assertErrors("x := parallel avg for i in 0..3: i",
+                          "[line 1] Error at 'avg': Unknown reduction 'avg', expected sum, min, max or collect\n")
+
+    def test_error_recovery(self):
+        # After an error the parser skips to the next keyword that can
+        # start a statement, so one run reports every broken statement.
+        source = """int = 1
+int32 y = 2
+for : 3
+fn f(): { return }
+if x print(1)
+while true: {
+  str = 1
+  int z = 4
+}
+"""
+        self.assertErrors(source, "[line 1] Error at '=': Expected variable name\n"
+                                  "[line 3] Error at ':': Expected loop variable name after 'for'\n"
+                                  "[line 5] Error at 'print': Expect ':' after if condition.\n"
+                                  "[line 7] Error at '=': Expected variable name\n")
+
+    def test_recovery_keeps_parsing(self):
+        fluff_i    = reporter()
+        source     = b"int = 1\nint32 y = 2\nfn g(): 3"
+        statements = Parser(fluff_i, Scanner(source, fluff_i).iterTokens()).parse()
+        self.assertEqual(reports(fluff_i), "[line 1] Error at '=': Expected variable name\n")
+        self.assertIsNone(statements[0])
+        self.assertEqual(AstPrinter().printProgram(statements[1:]), "(var int32 y 2)\n(fn g () 3)")
+
+    def test_token_list(self):
+        # The parser also takes a list, as Scanner.scanTokens() returns.
+        fluff_i = reporter()
+        tokens  = Scanner(b"a = b + 1 * c", fluff_i).scanTokens()
+        self.assertEqual(AstPrinter().printProgram(Parser(fluff_i, tokens).parse()), "(= a (+ b (* 1 c)))")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from helpers import fluff
+
+# Bindings are checked and converted like a declared variable's, whether
+# or not the program was type checked.
+class BindingTest(unittest.TestCase):
+    def test_mismatched_binding_is_rejected(self):
+        for typecheck in [False, True]:
+            with self.subTest(typecheck=typecheck):
+                program = fluff.compile("bool z = flag\nprint(z)", bindings={"flag": "bool"}, typecheck=typecheck)
+                with self.assertRaises(fluff.RuntimeError):
+                    program.run(bindings={"flag": 1})
+                with self.assertRaises(fluff.RuntimeError):
+                    program.run(bindings={"flag": None})
+
+    def test_binding_is_converted(self):
+        for typecheck in [False, True]:
+            with self.subTest(typecheck=typecheck):
+                program = fluff.compile("int8 y = a", bindings={"a": "int8", "d": "double"}, typecheck=typecheck)
+                result  = program.run(bindings={"a": 300, "d": 2})
+                self.assertEqual(result["y"], 44)
+                self.assertIs(type(result["d"]), float)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+from decimal import Decimal
+
+from helpers import reporter, reports
+from fluff.scanner import Scanner
+from fluff.token import TokenType as tt
+
+# (type, lexeme, literal, line) for every token of source but the EOF,
+# and what the scanner reported.
+def scan(source: str, numeric: str = "native"):
+    fluff_i = reporter()
+    tokens  = Scanner(source.encode('utf-8'), fluff_i, numeric).scanTokens()
+    assert tokens[-1].type == tt.EOF
+    return [(token.type, token.lexeme, token.literal, token.line) for token in tokens[:-1]], reports(fluff_i)
+
+class ScannerTest(unittest.TestCase):
+    def assertTokens(self, source: str, expected, numeric: str = "native"):
+        tokens, errors = scan(source, numeric)
+        self.assertEqual(errors, "")
+        self.assertEqual(tokens, expected)
+
+    def test_comments(self):
+        self.assertTokens("x // a comment\n// a whole line\ny", [
+            (tt.IDENTIFIER, "x", None, 1),
+            (tt.IDENTIFIER, "y", None, 3),
+        ])
+        # '//' wins over '/' and '/=', even right after them.
+        self.assertTokens("a/b /= c //= d", [
+            (tt.IDENTIFIER, "a", None, 1),
+            (tt.SLASH, "/", None, 1),
+            (tt.IDENTIFIER, "b", None, 1),
+            (tt.SLASH_EQUAL, "/=", None, 1),
+            (tt.IDENTIFIER, "c", None, 1),
+        ])
+        self.assertTokens("// only a comment", [])
+
+    def test_strings(self):
+        self.assertTokens(r'"a\nb" ' + r"'c\t\\d' " + '"it\'s" \'say "hi"\'', [
+            (tt.STRING, r'"a\nb"', "a\nb", 1),
+            (tt.STRING, r"'c\t\\d'", "c\t\\d", 1),
+            (tt.STRING, '"it\'s"', "it's", 1),
+            (tt.STRING, '\'say "hi"\'', 'say "hi"', 1),
+        ])
+        self.assertTokens('""', [(tt.STRING, '""', "", 1)])
+
+    def test_multiline_string(self):
+        # A string's token is on the line it ends on.
+        self.assertTokens('"a\nb"\nx', [
+            (tt.STRING, '"a\nb"', "a\nb", 2),
+            (tt.IDENTIFIER, "x", None, 3),
+        ])
+
+    def test_numbers(self):
+        self.assertTokens("12 3.25 007", [
+            (tt.NUMBER, "12", 12, 1),
+            (tt.NUMBER, "3.25", 3.25, 1),
+            (tt.NUMBER, "007", 7, 1),
+        ])
+        # A '.' needs digits after it to be part of a number.
+        self.assertTokens("1. 0..10", [
+            (tt.NUMBER, "1", 1, 1),
+            (tt.DOT, ".", None, 1),
+            (tt.NUMBER, "0", 0, 1),
+            (tt.DOT_DOT, "..", None, 1),
+            (tt.NUMBER, "10", 10, 1),
+        ])
+        self.assertTokens("-4", [(tt.MINUS, "-", None, 1), (tt.NUMBER, "4", 4, 1)])
+
+    def test_number_types(self):
+        tokens, _ = scan("1 2.5")
+        self.assertEqual([type(token[2]) for token in tokens], [int, float])
+        tokens, _ = scan("1 2.5", numeric="decimal")
+        self.assertEqual([token[2] for token in tokens], [1, Decimal("2.5")])
+        self.assertEqual(type(tokens[1][2]), Decimal)
+
+    def test_keywords_and_identifiers(self):
+        self.assertTokens("if iff int int8 int8x _x x1 true café", [
+            (tt.IF, "if", None, 1),
+            (tt.IDENTIFIER, "iff", None, 1),
+            (tt.INT, "int", None, 1),
+            (tt.INT8, "int8", None, 1),
+            (tt.IDENTIFIER, "int8x", None, 1),
+            (tt.IDENTIFIER, "_x", None, 1),
+            (tt.IDENTIFIER, "x1", None, 1),
+            (tt.TRUE, "true", None, 1),
+            (tt.IDENTIFIER, "café", None, 1),
+        ])
+        # Digits cannot start an identifier.
+        self.assertTokens("1x", [(tt.NUMBER, "1", 1, 1), (tt.IDENTIFIER, "x", None, 1)])
+
+    def test_operators(self):
+        source   = ":= == != <= >= -= += *= /= %= = < > ( ) { } [ ] , ; : @"
+        expected = [tt.ASSIGN, tt.EQUAL_EQUAL, tt.NOT_EQUAL, tt.LESS_EQUAL, tt.GREATER_EQUAL,
+                    tt.MINUS_EQUAL, tt.PLUS_EQUAL, tt.STAR_EQUAL, tt.SLASH_EQUAL, tt.PERCENT_EQUAL,
+                    tt.EQUAL, tt.LESS, tt.GREATER, tt.LEFT_PAREN, tt.RIGHT_PAREN,
+                    tt.LEFT_BRACE, tt.RIGHT_BRACE, tt.LEFT_SQ_BRACKET, tt.RIGHT_SQ_BRACKET,
+                    tt.COMMA, tt.SEMICOLON, tt.COLON, tt.AT]
+        tokens, errors = scan(source)
+        self.assertEqual(errors, "")
+        self.assertEqual([token[0] for token in tokens], expected)
+        # Two-character operators need no space between them.
+        tokens, _ = scan("x:=y==z")
+        self.assertEqual([token[0] for token in tokens], [tt.IDENTIFIER, tt.ASSIGN, tt.IDENTIFIER, tt.EQUAL_EQUAL, tt.IDENTIFIER])
+        # Negation is 'not'; '!' only starts '!='.
+        tokens, errors = scan("!x")
+        self.assertEqual(errors, "[line 1] Error : Unexpected character\n")
+        self.assertEqual(tokens, [(tt.IDENTIFIER, "x", None, 1)])
+
+    def test_line_numbers(self):
+        tokens, _ = scan("a\n\n  b\r\n\tc // x\nd")
+        self.assertEqual([token[3] for token in tokens], [1, 3, 4, 5])
+
+    def test_unexpected_character(self):
+        # Scanning goes on after the error.
+        tokens, errors = scan("x\n$ y\nz")
+        self.assertEqual(errors, "[line 2] Error : Unexpected character\n")
+        self.assertEqual([(token[1], token[3]) for token in tokens], [("x", 1), ("y", 2), ("z", 3)])
+
+    def test_unterminated_string(self):
+        # Reported at the end of the file, where the string would end.
+        tokens, errors = scan('x\n"ab\ny\n')
+        self.assertEqual(errors, "[line 4] Error : Unterminated string\n")
+        self.assertEqual(tokens, [(tt.IDENTIFIER, "x", None, 1)])
+
+    def test_invalid_escape(self):
+        _, errors = scan('x\n"a\\"')
+        self.assertEqual(errors, "[line 2] Error : Invalid escape sequence in string\n")
+
+if __name__ == '__main__':
+    unittest.main()
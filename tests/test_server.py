@@ -0,0 +1,74 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from helpers import root
+
+# Runs 'main.py serve' on a socket of its own and programs on it through
+# client.py, as a user would.
+@unittest.skipUnless(hasattr(os, 'fork'), "the daemon forks its workers")
+class ServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.socket    = os.path.join(cls.directory.name, "fluff.sock")
+        # One worker, so every request lands on the same process and
+        # anything one program leaves behind would be seen by the next.
+        cls.daemon    = subprocess.Popen([sys.executable, os.path.join(root, "main.py"), "serve", "--socket", cls.socket, "--workers", "1"],
+                                         stderr=subprocess.PIPE)
+        deadline = time.monotonic() + 30
+        while not os.path.exists(cls.socket):
+            if cls.daemon.poll() is not None or time.monotonic() > deadline:
+                cls.tearDownClass()
+                raise RuntimeError("fluff daemon did not start")
+            time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.daemon.poll() is None:
+            cls.daemon.send_signal(signal.SIGTERM)
+        cls.daemon.wait(timeout=30)
+        cls.daemon.stderr.close()
+        cls.directory.cleanup()
+
+    def script(self, name: str, source: str) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+    # The client's exit status, stdout and stderr for running file.
+    def client(self, file: str, *options, stdin: str = None):
+        result = subprocess.run([sys.executable, os.path.join(root, "client.py"), "--socket", self.socket, *options, file],
+                                input=stdin, capture_output=True, text=True, timeout=60)
+        return result.returncode, result.stdout, result.stderr
+
+    def test_runs_a_script(self):
+        path = self.script("sum.ff", "int32 total = 0\nfor i in 0..5: total += i\nprint(total)\nprint(\"done\")\n")
+        self.assertEqual(self.client(path), (0, "10\ndone\n", ""))
+        for engine in ["vm", "closure", "python"]:
+            self.assertEqual(self.client(path, "--engine", engine, "-O"), (0, "10\ndone\n", ""))
+
+    def test_standard_input(self):
+        self.assertEqual(self.client("-", stdin="print(6 * 7)\n"), (0, "42\n", ""))
+
+    def test_exit_statuses(self):
+        self.assertEqual(self.client("-", stdin="print(1)\nx ="), (65, "[line 2] Error at end: Expected expression\n", ""))
+        self.assertEqual(self.client("-", stdin="print(1)\nprint(missing)\n"), (70, "1\n[line 2]: Undefined variable 'missing'\n", ""))
+        missing = os.path.join(self.directory.name, "missing.ff")
+        self.assertEqual(self.client(missing), (2, "", f"can't open '{missing}': No such file or directory\n"))
+
+    def test_no_state_between_requests(self):
+        first = "leak := 1\n@memo fn int twice(int n): { return n * 2 }\nprint(twice(leak))\n"
+        self.assertEqual(self.client("-", stdin=first), (0, "2\n", ""))
+        self.assertEqual(self.client("-", stdin="print(leak)\n"), (70, "[line 1]: Undefined variable 'leak'\n", ""))
+        self.assertEqual(self.client("-", stdin="print(twice(1))\n"), (70, "[line 1]: Undefined variable 'twice'\n", ""))
+        # A request after a failed one runs as if it were the first.
+        self.assertEqual(self.client("-", stdin=first), (0, "2\n", ""))
+
+if __name__ == '__main__':
+    unittest.main()
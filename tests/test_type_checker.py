@@ -0,0 +1,73 @@
+import unittest
+
+from helpers import EngineTestCase, run, typechecks
+
+# Programs the checker accepts. Each runs unchecked (UncheckedEnvironment,
+# rt_store) with --typecheck and must print what it prints checked.
+accepted = [
+    "int32 x = 1\nx = 2.5\nx += 1\nprint(x)",
+    "double d = 1\nd /= 4\nprint(d)",
+    "uint8 u = 0\nu -= 1\nprint(u)",
+    # ':=' numbers hold any number, so this is not a narrowing.
+    "acc := 0\nfor i in 0..10: acc += 0.5\nprint(acc)",
+    "n := 4\nn = 2.9\nprint(n)",
+    "str s = \"a\"\ns += \"b\"\ns = s + \"c\"\nprint(s)",
+    "bool b = 1 < 2\nprint(b and not false)",
+    "int[] a = [1, 2, 3]\na *= 2\na[0] = 7.5\nprint(a)",
+    "double[] d = [1, 2]\nd = d / 2\nprint(d)",
+    "int32 x\nx = 3\nx += 1\nprint(x)",
+    "f := nil\nfn int one(): { return 1 }\nf = one\nprint(f())",
+    "fn int32 add(int32 a, int32 b): { return a + b }\nprint(add(2.5, 3))",
+    "fn double half(int n): {\n  if n > 0: return n / 2\n  return 0\n}\nprint(half(3))",
+    "fn show(a): { print(a) }\nshow(\"any\")\nshow(1)",
+    "for i in 0..3: { x := i * 2\nprint(x) }",
+    "int64 t = parallel sum for i in 0..10: i\nprint(t)",
+    "int32 k = 0\nwhile k < 3: {\n  int32 j = k\n  k += 1\n}\nprint(k)",
+]
+
+# Programs the checker rejects, and what it reports.
+rejected = [
+    ("int32 x = 1\nx = \"a\"", "[line 2] Error : Type error: assigning str to 'x', which holds numeric\n"),
+    ("str s = 5", "[line 1] Error : Type error: expected str, had numeric\n"),
+    ("print(\"a\" - 1)", "[line 1] Error : Type error: operands of '-' must be numeric, had str and numeric\n"),
+    ("x := 1\nprint(x + \"a\")", "[line 2] Error : Type error: operands of '+' must be two numbers or two strings, had numeric and str\n"),
+    ("print(-\"a\")", "[line 1] Error : Type error: operand of '-' must be numeric, had str\n"),
+    ("x := 1\nx += \"a\"", "[line 2] Error : Type error: '+=' with str on 'x', which holds numeric\n"),
+    ("bool b = true\nb += 1", "[line 2] Error : Type error: '+=' is not supported on 'b', which holds bool\n"),
+    ("print(undefined)", "[line 1] Error : Undefined variable 'undefined'\n"),
+    ("y = 3", "[line 1] Error : Assigning to undefined variable 'y'\n"),
+    ("int x = 1\nif x > 0: { int y = 2 }\nprint(y)", "[line 3] Error : Undefined variable 'y'\n"),
+    ("{\n  a := 1\n  a := 2\n}", "[line 3] Error : Variable 'a' is already declared in this scope\n"),
+    ("int32 x\nx += 1", "[line 2] Error : Type error: 'x' may be nil here\n"),
+    ("f := nil\nf = 3", "[line 2] Error : Type error: assigning numeric to 'f', which holds fn or nil\n"),
+    ("fn int f(): {\n  print(1)\n}", "[line 1] Error : Type error: 'f' may end without returning numeric\n"),
+    ("fn int f(): { return \"a\" }", "[line 1] Error : Type error: 'f' must return numeric, had str\n"),
+    ("fn int f(int a): { return a }\nprint(f(\"x\"))", "[line 2] Error : Type error: argument 1 of 'f' must be numeric, had str\n"),
+    ("fn f(a): { a = 1 }", "[line 1] Error : Type error: cannot assign to untyped parameter 'a'\n"),
+    ("print(len(1))", "[line 1] Error : Type error: argument 1 of 'len' must be array or str, had numeric\n"),
+    ("int[] a = [1, \"b\"]", "[line 1] Error : Type error: array elements must be numeric, had str\n"),
+    ("for c in \"abc\": print(c)", "[line 1] Error : Type error: can only iterate over ranges, arrays and lines, had str\n"),
+    ("byte b = 1", "[line 1] Error : Type error: variables of type 'byte' are not supported\n"),
+]
+
+class TypeCheckerTest(EngineTestCase):
+    def test_accepted(self):
+        for source in accepted:
+            with self.subTest(source=source):
+                self.assertTrue(typechecks(source))
+                self.assertSameOutput(source, run(source), typecheck=True)
+
+    def test_rejected(self):
+        for source, expected in rejected:
+            with self.subTest(source=source):
+                self.assertFalse(typechecks(source))
+                # A rejected program does not run at all.
+                self.assertOutput(source, expected, typecheck=True)
+
+    def test_unchecked_runtime_errors(self):
+        # The checks the checker cannot make are kept in unchecked programs.
+        self.assertOutput("int[] a = [1]\nprint(a[3])", "[line 2]: Index 3 out of range for array of length 1\n", typecheck=True)
+        self.assertOutput("f := nil\nf()", "[line 2]: Can only call functions and classes\n", typecheck=True)
+
+if __name__ == '__main__':
+    unittest.main()